@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DoctorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Doctor'
+
+    def ready(self):
+        # Connect the signal handlers that invalidate cached token authentications
+        from . import signals  # noqa: F401
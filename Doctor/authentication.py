@@ -1,14 +1,31 @@
 """
 A custom token authentication system for Doctor users in the project.
+Authenticated (doctor, token) pairs are cached by access token for a short TTL in the shared cache named by
+AUTH_TOKEN_SHARED_CACHE, so repeated requests with the same token need no queries; Doctor/signals.py drops
+entries on logout, refresh and password changes, for every process at once. Without a shared cache, tokens
+are not cached, as a revoked token would stay valid in the other processes until it expired.
 """
 
 # Import necessary modules and classes
+import copy
+
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
 from rest_framework.authentication import TokenAuthentication
 from Doctor.models import CustomToken
 from Doctor.models import Doctor
 from rest_framework.authentication import BaseAuthentication, get_authorization_header
 from rest_framework.exceptions import AuthenticationFailed
+from PharmaLink.caching import TieredCache
+
+# Cache of access token -> (doctor, custom token) for authenticated doctors
+token_cache = TieredCache(
+    'auth.doctor',
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 30),
+    shared_alias=getattr(settings, 'AUTH_TOKEN_SHARED_CACHE', None),
+    # Tokens are revocable: keep them only where a logout or refresh in any process can drop them
+    shared_only=True,
+)
 
 # Custom token authentication class for Doctor users
 class DoctorCustomTokenAuthentication(BaseAuthentication):
@@ -18,6 +35,7 @@ class DoctorCustomTokenAuthentication(BaseAuthentication):
     - Inherits from BaseAuthentication provided by Django REST Framework.
     - Defines a keyword for identifying the authentication method in the request header.
     - Implements the authenticate method to authenticate users based on the provided custom token.
+    - Serves repeated authentications of the same token from a short-TTL cache without querying the database.
     - Raises AuthenticationFailed exceptions for various error scenarios.
     - Implements the authenticate_header method to specify the authentication header keyword.
     """
@@ -32,6 +50,7 @@ class DoctorCustomTokenAuthentication(BaseAuthentication):
         - Validates the format of the authorization header.
         - Retrieves the custom token from the header and verifies its validity.
         - Retrieves the associated Doctor instance based on the token's email.
+        - Serves recently authenticated tokens from the token cache.
         - Returns a tuple containing the authenticated Doctor instance and the custom token.
 
         Raises:
@@ -47,8 +66,22 @@ class DoctorCustomTokenAuthentication(BaseAuthentication):
         elif len(auth_header) > 2:
             msg = 'Invalid token header. Token string should not contain spaces.'
             raise AuthenticationFailed(msg)
+        token = auth_header[1].decode()
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, token):
+        """
+        Method to resolve an access token to its Doctor, e.g. from a request header or a socket handshake.
+
+        Raises:
+            AuthenticationFailed: If the token is invalid or associated Doctor does not exist.
+        """
+        cached = token_cache.get(token)
+        if cached is not None:
+            # Hand out copies so requests never share instances
+            doctor, custom_token = cached
+            return (copy.copy(doctor), copy.copy(custom_token))
         try:
-            token = auth_header[1].decode()
             custom_token = CustomToken.objects.get(access_token=token)
         except CustomToken.DoesNotExist:
             raise AuthenticationFailed('Invalid token')
@@ -57,7 +90,9 @@ class DoctorCustomTokenAuthentication(BaseAuthentication):
             doctor = Doctor.objects.get(email=doctor_email)
         except Doctor.DoesNotExist:
             raise AuthenticationFailed('Invalid doctor')
+        token_cache.set(token, (copy.copy(doctor), copy.copy(custom_token)))
         return (doctor, custom_token)
+
     def authenticate_header(self, request):
         """
         Method to specify the authentication header keyword.
@@ -0,0 +1,84 @@
+"""
+This file resolves doctor summary cards (id, name, username and image URL) for prescription listings.
+Cards are served from a per-process LRU cache and the missing ones are fetched with a single
+`id__in` query loading only the card fields, so listing N prescriptions never costs N doctor queries.
+Payloads cached in a shared cache (the patient home page) bypass the per-process cache, which only the
+process that changed a doctor's profile invalidates.
+"""
+
+# Import necessary modules and classes
+from django.conf import settings
+
+from PharmaLink.caching import TTLCache
+
+from .models import Doctor
+
+# Doctor fields loaded to build a card
+DOCTOR_CARD_FIELDS = ('id', 'fname', 'lname', 'username', 'image')
+
+# Per-process LRU of doctor cards keyed by doctor ID; the TTL bounds staleness across processes
+doctor_card_cache = TTLCache(
+    maxsize=getattr(settings, 'DOCTOR_CARD_CACHE_SIZE', 1000),
+    ttl=getattr(settings, 'DOCTOR_CARD_CACHE_TTL', 300),
+)
+
+
+def doctor_card(doctor):
+    """
+    Build the summary card of a doctor.
+
+    Parameters:
+        - doctor (Doctor): The doctor, with at least the card fields loaded.
+
+    Returns:
+        - dict: The doctor's id, fname, lname, username and image URL (or None).
+    """
+    return {
+        'id': doctor.id,
+        'fname': doctor.fname,
+        'lname': doctor.lname,
+        'username': doctor.username,
+        'image': doctor.image.url if doctor.image else None,
+    }
+
+
+def resolve_doctor_cards(doctor_ids, use_cache=True):
+    """
+    Resolve the summary cards of several doctors with at most one query.
+
+    - Serves cached cards from the per-process LRU, unless `use_cache` is False.
+    - Fetches every missing card with one `id__in` query loading only the card fields, and caches it.
+
+    Parameters:
+        - doctor_ids (iterable): Doctor IDs, possibly repeated or None.
+        - use_cache (bool): Whether cached cards may be served; pass False when the result is stored in a
+          cache shared with other processes, so it never holds a card invalidated elsewhere.
+
+    Returns:
+        - dict: Cards keyed by doctor ID; doctors that do not exist are left out.
+    """
+    cards = {}
+    missing = []
+    for doctor_id in {doctor_id for doctor_id in doctor_ids if doctor_id}:
+        card = doctor_card_cache.get(doctor_id) if use_cache else None
+        if card is None:
+            missing.append(doctor_id)
+        else:
+            cards[doctor_id] = card
+
+    if missing:
+        for doctor in Doctor.objects.filter(id__in=missing).only(*DOCTOR_CARD_FIELDS):
+            card = doctor_card(doctor)
+            doctor_card_cache.set(doctor.id, card)
+            cards[doctor.id] = card
+    return cards
+
+
+def invalidate_doctor_card(doctor_id):
+    """
+    Drop the cached card of a doctor whose profile changed.
+
+    Parameters:
+        - doctor_id (int): The ID of the doctor.
+    """
+    doctor_card_cache.delete(doctor_id)
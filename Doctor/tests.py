@@ -1,3 +1,63 @@
+"""
+Tests of the cached doctor token authentication: cached tokens must stop authenticating as soon as they
+are revoked, and nothing is cached without a shared cache.
+"""
+
+from datetime import date
+from unittest import mock
+
+from django.core.cache import caches
 from django.test import TestCase
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import DoctorCustomTokenAuthentication, token_cache
+from .models import CustomToken, Doctor
+
+
+class TokenCacheTests(TestCase):
+    """
+    Logout and token refresh must drop cached authentications.
+    """
+
+    def setUp(self):
+        self.doctor = Doctor.objects.create(
+            fname='Test', lname='Doctor', username='doctor', password='x', birthdate=date(1980, 1, 1),
+            email='doctor@example.com', phone='1', gender='M', license_number='1', specialization='GP',
+            degree='MD', graduation_date=date(2005, 1, 1), university='Cairo',
+        )
+        self.token = CustomToken.objects.create(doctor=self.doctor, email=self.doctor.email, access_token='access-1')
+        self.authentication = DoctorCustomTokenAuthentication()
+
+        # The default cache stands in for the shared cache every process would see
+        caches['default'].clear()
+        patcher = mock.patch.object(token_cache, 'shared_alias', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_rejected(self, access_token):
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(access_token)
+
+    def test_repeated_authentication_is_served_from_the_cache(self):
+        self.authentication.authenticate_credentials('access-1')
+        with self.assertNumQueries(0):
+            doctor, token = self.authentication.authenticate_credentials('access-1')
+        self.assertEqual((doctor, token), (self.doctor, self.token))
+
+    def test_logout_revokes_cached_token(self):
+        self.authentication.authenticate_credentials('access-1')
+        self.token.delete()
+        self.assert_rejected('access-1')
+
+    def test_refresh_revokes_previous_cached_token(self):
+        self.authentication.authenticate_credentials('access-1')
+        self.token.access_token = 'access-2'
+        self.token.save()
+        self.assert_rejected('access-1')
+        self.assertEqual(self.authentication.authenticate_credentials('access-2')[1], self.token)
 
-# Create your tests here.
+    def test_nothing_is_cached_without_a_shared_cache(self):
+        with mock.patch.object(token_cache, 'shared_alias', None):
+            self.authentication.authenticate_credentials('access-1')
+            self.token.delete()
+            self.assert_rejected('access-1')
@@ -10,6 +10,8 @@ from rest_framework.response import Response
 from Doctor.models import *
 from Doctor.serializers import *
 from Doctor.authentication import DoctorCustomTokenAuthentication
+from Doctor.profiles import invalidate_doctor_card
+from Prescription.homepage import invalidate_doctor_home_pages
 from rest_framework.views import APIView
 from django.utils.translation import gettext as _
 from django.shortcuts import get_object_or_404
@@ -446,7 +448,11 @@ class DoctorUpdateView(generics.UpdateAPIView):
         """
         Perform the update operation on the doctor object.
         """
-        serializer.save()
+        doctor = serializer.save()
+
+        # Drop the cached summary card and home pages so prescription listings show the new profile
+        invalidate_doctor_card(doctor.id)
+        invalidate_doctor_home_pages(doctor.id)
 
 # View for handling password reset requests for doctors
 class DoctorPasswordResetRequestView(GenericAPIView):
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DrugsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Drugs'
+
+    def ready(self):
+        # Connect the signal handlers that invalidate the interaction index
+        from . import signals  # noqa: F401
@@ -0,0 +1,491 @@
+"""
+This file contains the drug-drug interaction engine used by the interaction views.
+The DDI dataset is either compiled per process into an in-memory graph over integer ingredient IDs, holding
+the interaction types of each (ingredient ID, ingredient ID) pair and a neighbour bitset per ingredient, and
+recompiled whenever the 'ddi' version stored in CatalogVersion moves, or queried with a single batched
+statement per request, so interaction checks never issue one query per component pair. Components are resolved to ingredient IDs once per request, and checking a set of ingredients
+intersects bitsets instead of looking up every pair. Drug pairs are enumerated once per unordered pair and
+results are deduplicated by (drugA, drugB, interaction).
+"""
+
+# Import necessary modules and classes
+import threading
+import time
+from itertools import combinations
+
+from django.conf import settings
+
+from Prescription.catalog import current_catalog_version, stamp_catalog_change
+from Prescription.models import Ingredient
+
+from .models import DDIInteraction, canonical_pair, normalize_component
+
+# Name of the DDI dataset in CatalogVersion
+DDI_CATALOG_NAME = 'ddi'
+
+
+def _build_pairs(rows):
+    """
+    Group (drug1_key, drug2_key, interaction_type) rows by canonical component pair.
+
+    - Interaction types recorded in both directions of a pair are kept once.
+
+    Parameters:
+        - rows (iterable): Tuples of (drug1_key, drug2_key, interaction_type).
+
+    Returns:
+        - dict: Interaction types keyed by canonical (component1, component2) pairs.
+    """
+    pairs = {}
+    for drug1_key, drug2_key, interaction_type in rows:
+        interaction_types = pairs.setdefault(canonical_pair(drug1_key, drug2_key), [])
+        if interaction_type not in interaction_types:
+            interaction_types.append(interaction_type)
+    return pairs
+
+
+def fetch_interactions(components):
+    """
+    Fetch every interaction among a set of components with a single SQL statement.
+
+    - Normalizes the given components.
+    - Issues one query with an IN (...) lookup on both indexed drug keys.
+
+    Parameters:
+        - components (iterable): ScName components, in any case.
+
+    Returns:
+        - dict: Interaction types keyed by canonical (component1, component2) pairs found among the components.
+    """
+    components = {normalize_component(component) for component in components}
+    if not components:
+        return {}
+
+    rows = DDIInteraction.objects.filter(
+        drug1_key__in=components,
+        drug2_key__in=components,
+    ).values_list('drug1_key', 'drug2_key', 'interaction_type')
+    return _build_pairs(rows)
+
+
+# Compiled drug-drug interaction graph over integer ingredient IDs
+class InteractionGraph:
+    """
+    Immutable, compiled drug-drug interaction graph over integer ingredient IDs.
+
+    - Maps normalized ingredient names to their IDs.
+    - Keys interaction types by canonical (ingredient ID, ingredient ID) pairs.
+    - Gives every ingredient taking part in an interaction a bit position, and stores its neighbours
+      as a bitset, so the partners of an ingredient within a set are one bitwise AND away.
+    - Records the DDI version it was compiled at.
+    """
+
+    __slots__ = ('version', 'ingredient_ids', 'pairs', 'bits', 'ingredients_by_bit', 'adjacency')
+
+    def __init__(self, ingredient_ids, pairs, version=0):
+        """
+        Compile the graph.
+
+        Parameters:
+            - ingredient_ids (dict): Ingredient IDs keyed by normalized name.
+            - pairs (dict): Interaction types keyed by canonical (ingredient ID, ingredient ID) pairs.
+            - version (int): The DDI version the pairs were read at.
+        """
+        self.version = version
+        self.ingredient_ids = ingredient_ids
+        self.pairs = pairs
+        self.ingredients_by_bit = sorted({ingredient_id for pair in pairs for ingredient_id in pair})
+        self.bits = {ingredient_id: bit for bit, ingredient_id in enumerate(self.ingredients_by_bit)}
+
+        # Set the neighbour bits in byte buffers, then turn each buffer into an int bitset in one step
+        width = (len(self.ingredients_by_bit) + 7) // 8
+        buffers = [bytearray(width) for _ in self.ingredients_by_bit]
+        for id1, id2 in pairs:
+            bit1, bit2 = self.bits[id1], self.bits[id2]
+            buffers[bit1][bit2 >> 3] |= 1 << (bit2 & 7)
+            buffers[bit2][bit1 >> 3] |= 1 << (bit1 & 7)
+        self.adjacency = [int.from_bytes(buffer, 'little') for buffer in buffers]
+
+    def mask(self, ingredient_ids):
+        """
+        Return the bitset of a set of ingredient IDs; ingredients without interactions are left out.
+        """
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            bit = self.bits.get(ingredient_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def neighbours(self, ingredient_ids):
+        """
+        Return the bitset of every ingredient interacting with at least one of the given ingredients.
+        """
+        mask = 0
+        for ingredient_id in ingredient_ids:
+            bit = self.bits.get(ingredient_id)
+            if bit is not None:
+                mask |= self.adjacency[bit]
+        return mask
+
+    def partners(self, ingredient_id, mask):
+        """
+        Yield the IDs of the ingredients in the bitset `mask` that interact with an ingredient.
+
+        Parameters:
+            - ingredient_id (int): The ingredient to check.
+            - mask (int): The bitset of the candidate partners, as returned by mask().
+        """
+        bit = self.bits.get(ingredient_id)
+        if bit is None:
+            return
+        hits = self.adjacency[bit] & mask
+        while hits:
+            lowest = hits & -hits
+            yield self.ingredients_by_bit[lowest.bit_length() - 1]
+            hits ^= lowest
+
+    def between(self, components1, components2):
+        """
+        Return the interactions between two sets of normalized components.
+
+        - Intersects the neighbours of each component of the first set with the bitset of the second set,
+          so only interacting pairs are visited.
+
+        Parameters:
+            - components1 (iterable): Normalized components of the first set.
+            - components2 (iterable): Normalized components of the second set.
+
+        Returns:
+            - dict: Interaction types keyed by canonical (component1, component2) pairs crossing the two sets.
+        """
+        names2 = {
+            self.ingredient_ids[component]: component
+            for component in components2 if component in self.ingredient_ids
+        }
+        mask2 = self.mask(names2)
+        found = {}
+        for component1 in components1:
+            id1 = self.ingredient_ids.get(component1)
+            if id1 is None:
+                continue
+            for id2 in self.partners(id1, mask2):
+                found[canonical_pair(component1, names2[id2])] = list(self.pairs[canonical_pair(id1, id2)])
+        return found
+
+
+# Process-wide index of drug-drug interactions
+class InteractionIndex:
+    """
+    Process-wide, in-memory index of drug-drug interactions.
+
+    - Loads every DDIInteraction row once and compiles it into an InteractionGraph over the IDs of
+      the Ingredient table; DDI names missing from it get negative placeholder IDs.
+    - Resolves pair lookups and set intersections from memory, so interaction checks issue no per-pair SQL.
+    - Compares the stored DDI version with the graph's at most once per CATALOG_VERSION_CHECK_INTERVAL
+      seconds, and reloads only when it changed, so changes made by any process reach every worker.
+    - Is invalidated locally when this process changes the DDIInteraction table.
+    """
+
+    def __init__(self):
+        self._graph = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self, version):
+        """
+        Build the interaction graph from the database.
+
+        Parameters:
+            - version (int): The DDI version read before the rows.
+
+        Returns:
+            - InteractionGraph: The compiled graph.
+        """
+        ingredient_ids = dict(Ingredient.objects.values_list('name', 'id').iterator())
+
+        def ingredient_id(name):
+            if name not in ingredient_ids:
+                ingredient_ids[name] = -len(ingredient_ids) - 1
+            return ingredient_ids[name]
+
+        rows = DDIInteraction.objects.values_list('drug1_key', 'drug2_key', 'interaction_type')
+        pairs = _build_pairs(
+            (ingredient_id(drug1_key), ingredient_id(drug2_key), interaction_type)
+            for drug1_key, drug2_key, interaction_type in rows.iterator()
+        )
+        return InteractionGraph(ingredient_ids, pairs, version)
+
+    def snapshot(self):
+        """
+        Return the loaded interaction graph, loading or reloading it if needed.
+
+        Returns:
+            - InteractionGraph: The graph, read consistently from one load.
+        """
+        graph = self._graph
+        interval = getattr(settings, 'CATALOG_VERSION_CHECK_INTERVAL', 30)
+        if graph is not None and time.monotonic() - self._checked_at < interval:
+            return graph
+
+        # Check and load under the lock so concurrent requests share a single load
+        with self._lock:
+            if self._graph is not None and time.monotonic() - self._checked_at < interval:
+                return self._graph
+            version = current_catalog_version(DDI_CATALOG_NAME)
+            if self._graph is None or self._graph.version != version:
+                self._graph = self._load(version)
+            self._checked_at = time.monotonic()
+            return self._graph
+
+    def lookup(self, component1, component2):
+        """
+        Return the interaction types recorded between two components.
+
+        Parameters:
+            - component1 (str): The first drug component.
+            - component2 (str): The second drug component.
+
+        Returns:
+            - list: A list of interaction types found between the two components.
+        """
+        graph = self.snapshot()
+        id1 = graph.ingredient_ids.get(normalize_component(component1))
+        id2 = graph.ingredient_ids.get(normalize_component(component2))
+        if id1 is None or id2 is None:
+            return []
+        return list(graph.pairs.get(canonical_pair(id1, id2), ()))
+
+    def among(self, components):
+        """
+        Return the slice of the index restricted to pairs of the given components.
+
+        - Intersects the neighbours of each component with the bitset of the whole set.
+
+        Parameters:
+            - components (iterable): Normalized drug components.
+
+        Returns:
+            - dict: Interaction types keyed by canonical (component1, component2) pairs found among the components.
+        """
+        components = set(components)
+        return self.snapshot().between(components, components)
+
+    def invalidate(self):
+        """
+        Drop the loaded index so that the next lookup reloads it from the database.
+        """
+        with self._lock:
+            self._graph = None
+
+
+# Shared index instance used by every interaction view in this process
+interaction_index = InteractionIndex()
+
+
+def bump_interaction_version():
+    """
+    Record that the DDI dataset changed, so every worker reloads its interaction graph, and drop this process's copy.
+    """
+    stamp_catalog_change(DDI_CATALOG_NAME)
+    interaction_index.invalidate()
+
+
+def interaction_version():
+    """
+    Return the DDI version interaction checks in this process resolve against: the version of the loaded
+    graph when DDI_INTERACTION_INDEX is enabled (the default), the stored version otherwise.
+    """
+    if getattr(settings, 'DDI_INTERACTION_INDEX', True):
+        return interaction_index.snapshot().version
+    return current_catalog_version(DDI_CATALOG_NAME)
+
+
+def interactions_among(components):
+    """
+    Resolve every interaction among a set of components with at most one query.
+
+    - Uses the process-wide interaction index when DDI_INTERACTION_INDEX is enabled (the default).
+    - Falls back to a single batched query otherwise.
+
+    Parameters:
+        - components (iterable): ScName components, in any case.
+
+    Returns:
+        - dict: Interaction types keyed by canonical (component1, component2) pairs found among the components.
+    """
+    components = {normalize_component(component) for component in components}
+    if getattr(settings, 'DDI_INTERACTION_INDEX', True):
+        return interaction_index.among(components)
+    return fetch_interactions(components)
+
+
+def interactions_between(components1, components2):
+    """
+    Resolve the interactions between two sets of components with at most one query.
+
+    - Uses the process-wide interaction index when DDI_INTERACTION_INDEX is enabled (the default),
+      intersecting the neighbours of the first set with the bitset of the second one.
+    - Falls back to a single batched query otherwise.
+
+    Parameters:
+        - components1 (iterable): ScName components of the first set, in any case.
+        - components2 (iterable): ScName components of the second set, in any case.
+
+    Returns:
+        - dict: Interaction types keyed by canonical (component1, component2) pairs crossing the two sets.
+    """
+    components1 = {normalize_component(component) for component in components1}
+    components2 = {normalize_component(component) for component in components2}
+    if not getattr(settings, 'DDI_INTERACTION_INDEX', True):
+        return fetch_interactions(components1 | components2)
+    return interaction_index.snapshot().between(components1, components2)
+
+
+def components_interactions(interaction_map, components1, components2):
+    """
+    Collect the interaction types between the components of two drugs.
+
+    Parameters:
+        - interaction_map (dict): Interactions keyed by canonical component pair, as returned by interactions_among(),
+          or by canonical ingredient ID pair, as held by the interaction index.
+        - components1 (iterable): Normalized components, or ingredient IDs, of the first drug.
+        - components2 (iterable): Normalized components, or ingredient IDs, of the second drug.
+
+    Returns:
+        - list: The distinct interaction types found, in discovery order.
+    """
+    interaction_types = []
+    for component1 in components1:
+        for component2 in components2:
+            for interaction_type in interaction_map.get(canonical_pair(component1, component2), ()):
+                if interaction_type not in interaction_types:
+                    interaction_types.append(interaction_type)
+    return interaction_types
+
+
+def drug_eye_interactions(drug_eye1, drug_eye2):
+    """
+    Collect the interaction types between two DrugEye catalog entries.
+
+    - Compares the precomputed ingredient IDs of the entries when DDI_INTERACTION_INDEX is enabled (the default).
+    - Falls back to a single batched query on their normalized ingredient names otherwise.
+
+    Parameters:
+        - drug_eye1 (DrugRecord): The first catalog entry.
+        - drug_eye2 (DrugRecord): The second catalog entry.
+
+    Returns:
+        - list: The distinct interaction types found, in discovery order.
+    """
+    if getattr(settings, 'DDI_INTERACTION_INDEX', True):
+        graph = interaction_index.snapshot()
+        return components_interactions(graph.pairs, drug_eye1.ingredient_ids, drug_eye2.ingredient_ids)
+
+    interaction_map = fetch_interactions(drug_eye1.ingredients + drug_eye2.ingredients)
+    return components_interactions(interaction_map, drug_eye1.ingredients, drug_eye2.ingredients)
+
+
+def _pair_interactions(drugs, interaction_map, graph=None):
+    """
+    Find the interactions among a list of drugs whose components are already normalized or resolved to IDs.
+
+    Parameters:
+        - drugs (list): (drug_name, components) tuples, with normalized components or ingredient IDs.
+        - interaction_map (dict): Interactions keyed by canonical pairs of the same kind of components.
+        - graph (InteractionGraph): The graph the ingredient IDs come from, used to skip drug pairs whose
+          bitsets do not intersect, or None.
+
+    Returns:
+        - list: (index1, index2, interaction_types) tuples, where the indexes point into `drugs`.
+    """
+    masks = neighbours = None
+    if graph is not None:
+        # Bitsets of each drug's ingredients and of their neighbours, so a drug pair without interactions
+        # is ruled out by a single AND
+        masks = [graph.mask(components) for _, components in drugs]
+        neighbours = [graph.neighbours(components) for _, components in drugs]
+
+    results = []
+    reported = set()
+    for (index1, (drug_name1, components1)), (index2, (drug_name2, components2)) in combinations(enumerate(drugs), 2):
+        if drug_name1 == drug_name2:
+            continue
+        if neighbours is not None and not neighbours[index1] & masks[index2]:
+            continue
+
+        drug_pair = canonical_pair(drug_name1, drug_name2)
+        interaction_types = [
+            interaction_type
+            for interaction_type in components_interactions(interaction_map, components1, components2)
+            if (drug_pair, interaction_type) not in reported
+        ]
+        if interaction_types:
+            reported.update((drug_pair, interaction_type) for interaction_type in interaction_types)
+            results.append((index1, index2, interaction_types))
+    return results
+
+
+def find_pair_interactions(drugs):
+    """
+    Find the interactions among a list of drugs, checking each unordered pair once.
+
+    - Normalizes every component once and, when DDI_INTERACTION_INDEX is enabled (the default), resolves it
+      to its ingredient ID, so the pair loops compare integers and drug pairs whose ingredient bitsets do not
+      intersect are skipped; falls back to a single batched query otherwise.
+    - Enumerates each unordered pair of drugs once and skips pairs sharing a trade name.
+    - Deduplicates results by (drugA, drugB, interaction), so mirrored DDI rows and repeated
+      drug pairs across prescriptions are reported once.
+
+    Parameters:
+        - drugs (list): (drug_name, components) tuples, e.g. a trade name and its ScNameComponents.
+
+    Returns:
+        - list: (index1, index2, interaction_types) tuples, where the indexes point into `drugs`.
+    """
+    normalized = [
+        (drug_name, [normalize_component(component) for component in components])
+        for drug_name, components in drugs
+    ]
+    if not getattr(settings, 'DDI_INTERACTION_INDEX', True):
+        interaction_map = fetch_interactions(component for _, components in normalized for component in components)
+        return _pair_interactions(normalized, interaction_map)
+
+    # Components without an ingredient ID appear in no interaction and are dropped
+    graph = interaction_index.snapshot()
+    ingredient_ids = graph.ingredient_ids
+    keyed = [
+        (drug_name, [ingredient_ids[component] for component in components if component in ingredient_ids])
+        for drug_name, components in normalized
+    ]
+    return _pair_interactions(keyed, graph.pairs, graph)
+
+
+def find_drug_eye_interactions(drug_eye_lists):
+    """
+    Find the interactions within each of several lists of DrugEye catalog entries.
+
+    - Works on the precomputed ingredient IDs of the entries when DDI_INTERACTION_INDEX is enabled (the default),
+      so no query is issued once the interaction index is loaded.
+    - Falls back to a single batched query covering every list otherwise.
+
+    Parameters:
+        - drug_eye_lists (list): Lists of DrugRecord instances, each screened independently.
+
+    Returns:
+        - list: For each list, (index1, index2, interaction_types) tuples, where the indexes point into that list.
+    """
+    if not getattr(settings, 'DDI_INTERACTION_INDEX', True):
+        interaction_map = fetch_interactions(
+            ingredient for drug_eyes in drug_eye_lists for drug_eye in drug_eyes for ingredient in drug_eye.ingredients
+        )
+        return [
+            _pair_interactions([(drug_eye.TradeName, drug_eye.ingredients) for drug_eye in drug_eyes], interaction_map)
+            for drug_eyes in drug_eye_lists
+        ]
+
+    graph = interaction_index.snapshot()
+    return [
+        _pair_interactions([(drug_eye.TradeName, drug_eye.ingredient_ids) for drug_eye in drug_eyes], graph.pairs, graph)
+        for drug_eyes in drug_eye_lists
+    ]
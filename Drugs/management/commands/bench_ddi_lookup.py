@@ -0,0 +1,111 @@
+"""
+Benchmark showing how DDI pair lookup latency scales with the size of the DDIInteraction table.
+
+For each requested table size the command loads synthetic interactions inside a transaction,
+times the legacy case-insensitive lookup (drug1_name__iexact / drug2_name__iexact) against
+the indexed equality lookup on (drug1_key, drug2_key), and rolls the synthetic rows back.
+
+Usage:
+    python manage.py bench_ddi_lookup --sizes 1000 10000 100000 --lookups 200
+"""
+
+# Import necessary modules and classes
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Drugs.models import DDIInteraction, canonical_pair
+
+# Prefix for synthetic component names so they never collide with real data
+BENCH_PREFIX = 'bench-component-'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark DDI pair lookup latency against the size of the DDIInteraction table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                            help='DDIInteraction table sizes to benchmark.')
+        parser.add_argument('--lookups', type=int, default=200,
+                            help='Number of pair lookups timed per table size.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows inserted per bulk_create call.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'iexact p50 ms':>14} {'iexact p99 ms':>14} {'key p50 ms':>11} {'key p99 ms':>11}")
+        for size in options['sizes']:
+            iexact_times, key_times = self.run_size(size, options['lookups'], options['batch_size'])
+            self.stdout.write(
+                f"{size:>10} {self.percentile(iexact_times, 50):>14.3f} {self.percentile(iexact_times, 99):>14.3f}"
+                f" {self.percentile(key_times, 50):>11.3f} {self.percentile(key_times, 99):>11.3f}"
+            )
+
+    def run_size(self, size, lookups, batch_size):
+        """
+        Load `size` synthetic interactions, time both lookup strategies and roll the rows back.
+
+        Returns:
+            - tuple: Lists of per-lookup latencies in milliseconds for the iexact and key lookups.
+        """
+        rng = random.Random(size)
+        with transaction.atomic():
+            pairs = self.load_rows(size, batch_size)
+            sample = [pairs[rng.randrange(len(pairs))] for _ in range(lookups)]
+
+            iexact_times = []
+            for name1, name2 in sample:
+                start = time.perf_counter()
+                list(DDIInteraction.objects.filter(
+                    drug1_name__iexact=name1, drug2_name__iexact=name2
+                ).values_list('interaction_type', flat=True))
+                iexact_times.append((time.perf_counter() - start) * 1000)
+
+            key_times = []
+            for name1, name2 in sample:
+                start = time.perf_counter()
+                key1, key2 = canonical_pair(name1.lower(), name2.lower())
+                list(DDIInteraction.objects.filter(
+                    drug1_key=key1, drug2_key=key2
+                ).values_list('interaction_type', flat=True))
+                key_times.append((time.perf_counter() - start) * 1000)
+
+            # Never keep the synthetic rows
+            transaction.set_rollback(True)
+        return iexact_times, key_times
+
+    def load_rows(self, size, batch_size):
+        """
+        Insert `size` synthetic interactions in batches.
+
+        Returns:
+            - list: The (drug1_name, drug2_name) pairs that were inserted.
+        """
+        pairs = []
+        batch = []
+        for index in range(size):
+            name1 = f'{BENCH_PREFIX.upper()}{index}'
+            name2 = f'{BENCH_PREFIX.upper()}{index + 1}'
+            key1, key2 = canonical_pair(name1.lower(), name2.lower())
+            pairs.append((name1, name2))
+            batch.append(DDIInteraction(
+                drug1_id=str(index), drug2_id=str(index + 1),
+                drug1_name=name1, drug2_name=name2,
+                drug1_key=key1, drug2_key=key2,
+                interaction_type='synthetic',
+            ))
+            if len(batch) >= batch_size:
+                DDIInteraction.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            DDIInteraction.objects.bulk_create(batch)
+        return pairs
+
+    @staticmethod
+    def percentile(values, percent):
+        """
+        Return the nearest-rank percentile of a list of latencies.
+        """
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
@@ -0,0 +1,148 @@
+"""
+Benchmark of interaction screening for a patient's active drug set.
+
+The command loads a synthetic DDI graph inside a transaction, then, for each requested number of active
+drugs, times the per-pair ORM path (one DDIInteraction query per component pair of every drug pair) against
+the bitset engine that backs the per-user interaction views (building the interaction matrix of the drug
+set from the in-memory interaction graph), and rolls the synthetic rows back.
+
+Usage:
+    python manage.py bench_interaction_engine --drugs 5 20 100 --ingredients 2000 --interactions 50000
+"""
+
+# Import necessary modules and classes
+import random
+import time
+from itertools import combinations
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Drugs.interactions import interaction_index
+from Drugs.matrix import apply_changes, entry_key
+from Drugs.models import DDIInteraction, UserInteractionMatrix, canonical_pair
+from Prescription.ingredients import ingredient_ids_for
+
+# Prefix for synthetic ingredient names so they never collide with real data
+BENCH_PREFIX = 'bench-ingredient-'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the per-pair ORM interaction check against the bitset interaction engine.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drugs', nargs='+', type=int, default=[5, 20, 100],
+                            help='Numbers of active drugs to screen.')
+        parser.add_argument('--ingredients', type=int, default=2000, help='Number of synthetic ingredients.')
+        parser.add_argument('--interactions', type=int, default=50000, help='Number of synthetic DDI rows.')
+        parser.add_argument('--runs', type=int, default=20, help='Timed runs per drug count and engine.')
+        parser.add_argument('--orm-runs', type=int, default=3,
+                            help='Timed runs of the per-pair ORM path (it is slow for large drug sets).')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed for the synthetic data.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            names = self.load_graph(rng, options['ingredients'], options['interactions'])
+
+            interaction_index.invalidate()
+            start = time.perf_counter()
+            graph = interaction_index.snapshot()
+            self.stdout.write(
+                f'Compiled {len(graph.pairs)} pairs over {len(graph.adjacency)} ingredients '
+                f'in {(time.perf_counter() - start) * 1000:.1f} ms'
+            )
+
+            self.stdout.write(f"{'drugs':>6} {'pairs':>7} {'per-pair ORM ms':>16} {'bitset engine ms':>17} {'found':>6}")
+            for drug_count in options['drugs']:
+                drugs = {
+                    entry_key(1, f'BENCH DRUG {index}'): {
+                        'prescription_id': 1,
+                        'drug': f'BENCH DRUG {index}',
+                        'scname': None,
+                        'state': 'active',
+                        'components': rng.sample(names, rng.randint(1, 3)),
+                    }
+                    for index in range(drug_count)
+                }
+                orm_times = [self.time_call(self.per_pair_orm, drugs) for _ in range(options['orm_runs'])]
+                engine_times = [self.time_call(self.bitset_engine, drugs) for _ in range(options['runs'])]
+                self.stdout.write(
+                    f'{drug_count:>6} {drug_count * (drug_count - 1) // 2:>7} {self.median(orm_times):>16.2f}'
+                    f' {self.median(engine_times):>17.3f} {len(self.bitset_engine(drugs)):>6}'
+                )
+
+            # Never keep the synthetic rows, nor a graph compiled from them
+            transaction.set_rollback(True)
+        interaction_index.invalidate()
+
+    def load_graph(self, rng, ingredient_count, interaction_count):
+        """
+        Insert synthetic ingredients and random interactions between them.
+
+        Returns:
+            - list: The synthetic ingredient names.
+        """
+        names = [f'{BENCH_PREFIX}{index}' for index in range(ingredient_count)]
+        ingredient_ids_for(names)
+        batch = []
+        for index in range(interaction_count):
+            key1, key2 = canonical_pair(*rng.sample(names, 2))
+            batch.append(DDIInteraction(
+                drug1_id=str(index), drug2_id=str(index),
+                drug1_name=key1, drug2_name=key2,
+                drug1_key=key1, drug2_key=key2,
+                interaction_type=f'synthetic {index % 10}',
+            ))
+            if len(batch) >= 5000:
+                DDIInteraction.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            DDIInteraction.objects.bulk_create(batch)
+        return names
+
+    @staticmethod
+    def per_pair_orm(drugs):
+        """
+        The previous check: query the DDI table for every component pair of every drug pair.
+        """
+        interactions = []
+        for (key1, entry1), (key2, entry2) in combinations(drugs.items(), 2):
+            interaction_types = []
+            for component1 in entry1['components']:
+                for component2 in entry2['components']:
+                    drug1_key, drug2_key = canonical_pair(component1, component2)
+                    for interaction_type in DDIInteraction.objects.filter(
+                        drug1_key=drug1_key, drug2_key=drug2_key
+                    ).values_list('interaction_type', flat=True):
+                        if interaction_type not in interaction_types:
+                            interaction_types.append(interaction_type)
+            if interaction_types:
+                interactions.append((key1, key2, interaction_types))
+        return interactions
+
+    @staticmethod
+    def bitset_engine(drugs):
+        """
+        The current check: build the interaction matrix of the drug set from the interaction graph.
+        """
+        matrix = UserInteractionMatrix(user_id=0, drugs={}, interactions=[])
+        apply_changes(matrix, {}, drugs)
+        return matrix.interactions
+
+    @staticmethod
+    def time_call(function, *args):
+        """
+        Return the latency of one call in milliseconds.
+        """
+        start = time.perf_counter()
+        function(*args)
+        return (time.perf_counter() - start) * 1000
+
+    @staticmethod
+    def median(values):
+        """
+        Return the median of a list of latencies.
+        """
+        ordered = sorted(values)
+        return ordered[len(ordered) // 2]
@@ -0,0 +1,261 @@
+"""
+Streaming bulk importer for the DrugEye catalog and the DDI interaction dataset.
+
+The command reads a CSV (with a header row) or JSONL file one row at a time, so memory stays constant
+whatever the file size, normalizes drug and component names, and writes rows in batches with
+bulk_create/bulk_update inside transactions, reporting throughput as it goes.
+
+- Upsert mode (the default) matches rows on their natural key, i.e. the DrugEye `ID` or the DDI
+  (drug1_key, drug2_key, interaction_type), updating existing rows and inserting new ones, one
+  transaction per batch.
+- Replace mode (--replace) deletes the table and loads the file inside a single transaction, so readers
+  keep seeing the previous dataset until the new one is committed, and never a half-loaded one. The table
+  is cleared with raw DELETEs, so the per-row delete signals never fire.
+
+Ingredients are computed on import: DrugEye ScNames are split into normalized ingredients and mapped
+to Ingredient IDs, and DDI drug names are registered as ingredients, batch by batch. Bulk writes send
+no model signals, so the command bumps the DrugEye catalog version or the DDI version itself, once, after
+the import is committed.
+
+Columns:
+    drugeye: TradeName, ID, ScName, HOWMUCH, Unit, CLASSIFICATION
+    ddi:     drug1_id, drug2_id, drug1_name, drug2_name, interaction_type
+
+Usage:
+    python manage.py import_dataset drugeye drugeye.csv --batch-size 5000
+    python manage.py import_dataset ddi ddi.jsonl --replace
+"""
+
+# Import necessary modules and classes
+import csv
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Drugs.interactions import bump_interaction_version
+from Drugs.models import DDIInteraction, canonical_pair, normalize_component
+from Prescription.catalog import bump_catalog_version
+from Prescription.ingredients import ingredient_ids_for, sync_drug_eye_ingredients
+from Prescription.models import DrugEye, DrugEyeIngredient
+
+DRUGEYE_FIELDS = ('TradeName', 'ID', 'ScName', 'HOWMUCH', 'Unit', 'CLASSIFICATION')
+DDI_FIELDS = ('drug1_id', 'drug2_id', 'drug1_name', 'drug2_name', 'interaction_type')
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSONL file into the DrugEye or DDIInteraction table with batched bulk writes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['drugeye', 'ddi'], help='The dataset to import.')
+        parser.add_argument('path', help='Path to a .csv (with header) or .jsonl file.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='File format; inferred from the file extension by default.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per batch.')
+        parser.add_argument('--replace', action='store_true',
+                            help='Replace the whole table in a single transaction instead of upserting.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+        file_format = options['format'] or ('jsonl' if options['path'].endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        if options['dataset'] == 'drugeye':
+            model, build, write_batch = DrugEye, self.build_drugeye, self.upsert_drugeye
+        else:
+            model, build, write_batch = DDIInteraction, self.build_ddi, self.upsert_ddi
+
+        self.started = time.perf_counter()
+        self.imported = 0
+        # Whether a transaction changing the table was committed
+        changed = False
+        try:
+            with open(options['path'], newline='', encoding='utf-8') as stream:
+                objects = (build(line_number, row) for line_number, row in self.read_rows(stream, file_format))
+                if options['replace']:
+                    # Swap the dataset atomically: readers see the old rows until the new ones are committed
+                    with transaction.atomic():
+                        self.clear_table(options['dataset'])
+                        for batch in self.batches(objects, options['batch_size']):
+                            model.objects.bulk_create(batch)
+                            self.map_ingredients(options['dataset'], batch)
+                            self.report(len(batch))
+                    changed = True
+                else:
+                    for batch in self.batches(objects, options['batch_size']):
+                        with transaction.atomic():
+                            write_batch(batch)
+                            self.map_ingredients(options['dataset'], batch)
+                        changed = True
+                        self.report(len(batch))
+        except OSError as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+        finally:
+            # Bulk writes bypass the model signals; refresh the derived caches explicitly, once
+            if changed:
+                self.refresh_caches(options['dataset'])
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {self.imported} {options["dataset"]} rows in {elapsed:.1f} s '
+            f'({self.imported / elapsed if elapsed else 0:.0f} rows/s)'
+        ))
+
+    def read_rows(self, stream, file_format):
+        """
+        Yield (line number, row dict) pairs from a CSV or JSONL stream, one row at a time.
+        """
+        if file_format == 'csv':
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise CommandError(f'Line {line_number}: invalid JSON ({exc})')
+
+    @staticmethod
+    def batches(objects, batch_size):
+        """
+        Group an iterator into lists of at most `batch_size` items.
+        """
+        while True:
+            batch = list(islice(objects, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    @staticmethod
+    def require(line_number, row, fields):
+        """
+        Return the stripped values of the required fields of a row.
+
+        Raises:
+            CommandError: If a field is missing or empty.
+        """
+        values = {}
+        for field in fields:
+            value = row.get(field)
+            value = value.strip() if isinstance(value, str) else value
+            if value in (None, ''):
+                raise CommandError(f'Line {line_number}: missing {field}')
+            values[field] = value
+        return values
+
+    def build_drugeye(self, line_number, row):
+        """
+        Build an unsaved DrugEye from a row, normalizing the spacing of its ScName components.
+        """
+        values = self.require(line_number, row, DRUGEYE_FIELDS)
+        try:
+            values['HOWMUCH'] = int(values['HOWMUCH'])
+        except (TypeError, ValueError):
+            raise CommandError(f"Line {line_number}: HOWMUCH must be an integer, got {values['HOWMUCH']!r}")
+        values['ID'] = str(values['ID'])
+        values['ScName'] = '+'.join(component.strip() for component in str(values['ScName']).split('+'))
+        return DrugEye(**values)
+
+    def build_ddi(self, line_number, row):
+        """
+        Build an unsaved DDIInteraction from a row, with its normalized, canonical pair keys.
+        """
+        values = self.require(line_number, row, DDI_FIELDS)
+        values['drug1_id'], values['drug2_id'] = str(values['drug1_id']), str(values['drug2_id'])
+        interaction = DDIInteraction(**values)
+        interaction.drug1_key, interaction.drug2_key = canonical_pair(
+            normalize_component(interaction.drug1_name),
+            normalize_component(interaction.drug2_name),
+        )
+        return interaction
+
+    @staticmethod
+    def clear_table(dataset):
+        """
+        Delete every row of the DrugEye or DDIInteraction table, and the DrugEye→ingredient mapping with it.
+
+        - Issues raw DELETE statements: a regular delete() would fetch every row to send the post_delete
+          signals, whose receivers bump the catalog or DDI version once per row.
+        """
+        if dataset == 'drugeye':
+            querysets = [DrugEyeIngredient.objects.all(), DrugEye.objects.all()]
+        else:
+            querysets = [DDIInteraction.objects.all()]
+        for queryset in querysets:
+            queryset._raw_delete(queryset.db)
+
+    def upsert_drugeye(self, batch):
+        """
+        Insert or update a batch of DrugEye rows, matched on their DrugEye `ID`.
+        """
+        # Later rows of the batch win over earlier rows with the same ID
+        incoming = {drug_eye.ID: drug_eye for drug_eye in batch}
+        existing = {drug_eye.ID: drug_eye for drug_eye in DrugEye.objects.filter(ID__in=list(incoming))}
+
+        to_update = []
+        for drug_id, drug_eye in incoming.items():
+            current = existing.get(drug_id)
+            if current is not None:
+                drug_eye.id = current.id
+                to_update.append(drug_eye)
+        DrugEye.objects.bulk_update(to_update, ['TradeName', 'ScName', 'HOWMUCH', 'Unit', 'CLASSIFICATION'])
+        DrugEye.objects.bulk_create([drug_eye for drug_eye in incoming.values() if drug_eye.id is None])
+
+    def upsert_ddi(self, batch):
+        """
+        Insert or update a batch of DDI rows, matched on (drug1_key, drug2_key, interaction_type).
+        """
+        incoming = {
+            (interaction.drug1_key, interaction.drug2_key, interaction.interaction_type): interaction
+            for interaction in batch
+        }
+        candidates = DDIInteraction.objects.filter(
+            drug1_key__in={key[0] for key in incoming},
+            drug2_key__in={key[1] for key in incoming},
+        ).only('id', 'drug1_key', 'drug2_key', 'interaction_type')
+        existing = {
+            (interaction.drug1_key, interaction.drug2_key, interaction.interaction_type): interaction.id
+            for interaction in candidates
+        }
+
+        to_update = []
+        for key, interaction in incoming.items():
+            if key in existing:
+                interaction.id = existing[key]
+                to_update.append(interaction)
+        DDIInteraction.objects.bulk_update(to_update, ['drug1_id', 'drug2_id', 'drug1_name', 'drug2_name'])
+        DDIInteraction.objects.bulk_create([interaction for interaction in incoming.values() if interaction.id is None])
+
+    def map_ingredients(self, dataset, batch):
+        """
+        Compute the ingredients of a written batch: the DrugEye→ingredient mapping, or the DDI drug names.
+        """
+        if dataset == 'drugeye':
+            # Read the primary keys back, as bulk_create does not set them on every database backend
+            rows = DrugEye.objects.filter(ID__in={drug_eye.ID for drug_eye in batch}).values_list('id', 'ScName')
+            sync_drug_eye_ingredients(rows)
+        else:
+            ingredient_ids_for(key for interaction in batch for key in (interaction.drug1_key, interaction.drug2_key))
+
+    def refresh_caches(self, dataset):
+        """
+        Make readers pick up the imported rows.
+        """
+        if dataset == 'drugeye':
+            bump_catalog_version()
+        else:
+            bump_interaction_version()
+
+    def report(self, count):
+        """
+        Record a written batch and print the running throughput.
+        """
+        self.imported += count
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'{self.imported} rows written ({self.imported / elapsed if elapsed else 0:.0f} rows/s)')
@@ -0,0 +1,252 @@
+"""
+This file maintains the persisted per-user interaction matrix.
+Each user has one UserInteractionMatrix row holding their active and new drugs and the interactions among them.
+When a prescription changes, only the drug entries whose state or components changed are re-checked,
+and only against the entries holding an interacting component, found by intersecting ingredient bitsets,
+so the interaction check endpoints become a single row read.
+Each matrix records the DDI version it was resolved at; a matrix older than the DDI dataset is rebuilt when it
+is next read, so changing the dataset costs nothing up front. Rebuilds and incremental updates both hold the
+matrix row lock, so neither overwrites the other.
+"""
+
+# Import necessary modules and classes
+from django.db import transaction
+
+from Prescription.drug_states import prescriptions_with_state
+
+from .interactions import components_interactions, interaction_version, interactions_between
+from .models import UserInteractionMatrix, canonical_pair, normalize_component
+
+# Drug states that take part in interaction checks
+ACTIVE_STATES = ('active', 'new')
+
+
+def entry_key(prescription_id, drug_name):
+    """
+    Build the key of a drug entry in the matrix.
+
+    Parameters:
+        - prescription_id (int): The ID of the prescription holding the drug.
+        - drug_name (str): The trade name of the drug.
+
+    Returns:
+        - str: The entry key, "<prescription_id>:<trade name>".
+    """
+    return f'{prescription_id}:{drug_name}'
+
+
+def prescription_entries(prescription):
+    """
+    Build the matrix entries for the active and new drugs of a prescription.
+
+    Parameters:
+        - prescription (Prescription): The prescription to read drugs from.
+
+    Returns:
+        - dict: Drug entries keyed by entry key.
+    """
+    return {
+        entry_key(prescription.id, drug_name): {
+            'prescription_id': prescription.id,
+            'drug': drug_name,
+            'scname': drug_data.get('ScName'),
+            'state': drug_data.get('state'),
+            'components': [normalize_component(component) for component in drug_data.get('ScNameComponents', [])],
+        }
+        for drug_name, drug_data in prescription.drugs.items()
+        if drug_data.get('state') in ACTIVE_STATES
+    }
+
+
+def apply_changes(matrix, current, desired):
+    """
+    Update a matrix from the current to the desired entries of one or more prescriptions.
+
+    - Entries that were removed or whose components changed lose their interactions.
+    - Entries that were added or whose components changed are checked against the rest of the set.
+    - Entries whose state or scientific name changed are updated in place without re-checking.
+
+    Parameters:
+        - matrix (UserInteractionMatrix): The matrix to update, modified in place.
+        - current (dict): The entries currently stored for the affected prescriptions.
+        - desired (dict): The entries those prescriptions should now contribute.
+
+    Returns:
+        - bool: True if the matrix changed and needs to be saved.
+    """
+    removed = [key for key in current if key not in desired]
+    recheck = [
+        key for key, entry in desired.items()
+        if key not in current or current[key]['components'] != entry['components']
+    ]
+    updated = [key for key, entry in desired.items() if key in current and current[key] != entry]
+    if not (removed or recheck or updated):
+        return False
+
+    # Drop the interactions of entries that left the set or need re-checking
+    dropped = set(removed) | set(recheck)
+    if dropped:
+        matrix.interactions = [
+            interaction for interaction in matrix.interactions
+            if interaction['entry1'] not in dropped and interaction['entry2'] not in dropped
+        ]
+    for key in removed:
+        matrix.drugs.pop(key, None)
+    for key in set(recheck) | set(updated):
+        matrix.drugs[key] = desired[key]
+
+    if not recheck:
+        return True
+
+    # Resolve every pair between the re-checked components and the whole set at once
+    interaction_map = interactions_between(
+        (component for key in recheck for component in matrix.drugs[key]['components']),
+        (component for entry in matrix.drugs.values() for component in entry['components']),
+    )
+
+    # Index the set by component, and the found pairs by partner, so each re-checked entry only visits
+    # the entries holding a component it interacts with
+    holders = {}
+    for other_key, other in matrix.drugs.items():
+        for component in other['components']:
+            holders.setdefault(component, []).append(other_key)
+    partners = {}
+    for component1, component2 in interaction_map:
+        partners.setdefault(component1, set()).add(component2)
+        partners.setdefault(component2, set()).add(component1)
+    order = {other_key: position for position, other_key in enumerate(matrix.drugs)}
+
+    # Check each re-checked entry against its candidate entries, visiting each pair once
+    checked = set()
+    for key in recheck:
+        checked.add(key)
+        entry = matrix.drugs[key]
+        candidates = {
+            other_key
+            for component in entry['components']
+            for partner in partners.get(component, ())
+            for other_key in holders.get(partner, ())
+        }
+        for other_key in sorted(candidates, key=order.get):
+            other = matrix.drugs[other_key]
+            if other_key in checked or other['drug'] == entry['drug']:
+                continue
+            interaction_types = components_interactions(interaction_map, entry['components'], other['components'])
+            if interaction_types:
+                matrix.interactions.append({
+                    'entry1': key,
+                    'entry2': other_key,
+                    'interaction_type': interaction_types,
+                })
+    return True
+
+
+def is_current(matrix, version):
+    """
+    Return whether a matrix was resolved at the given DDI version or a later one.
+
+    - A matrix stamped by a worker whose graph is already newer is kept, so workers reloading their graph
+      at different times do not rebuild it back and forth.
+    """
+    return matrix.ddi_version is not None and matrix.ddi_version >= version
+
+
+def rebuild_matrix(user_id):
+    """
+    Build and persist the matrix of a user from all of their prescriptions.
+
+    - Locks the user's matrix row, creating it if needed, so concurrent rebuilds and prescription syncs
+      are serialized, and skips the rebuild if another request brought the matrix up to date meanwhile.
+
+    Parameters:
+        - user_id (int): The ID of the user.
+
+    Returns:
+        - UserInteractionMatrix: The rebuilt matrix.
+    """
+    with transaction.atomic():
+        matrix, _ = UserInteractionMatrix.objects.select_for_update().get_or_create(user_id=user_id)
+        version = interaction_version()
+        if is_current(matrix, version):
+            return matrix
+
+        desired = {}
+        # Only load the prescriptions holding an active or new drug
+        for prescription in prescriptions_with_state(user_id, ACTIVE_STATES):
+            desired.update(prescription_entries(prescription))
+
+        matrix.drugs, matrix.interactions = {}, []
+        apply_changes(matrix, {}, desired)
+        matrix.ddi_version = version
+        matrix.save()
+    return matrix
+
+
+def sync_prescription(prescription, deleted=False):
+    """
+    Bring the owner's matrix up to date after a prescription was saved or deleted.
+
+    - Does nothing if the user has no matrix yet; it is built on the next read.
+    - Only re-checks the drugs of this prescription whose state or components changed.
+
+    Parameters:
+        - prescription (Prescription): The prescription that changed.
+        - deleted (bool): Whether the prescription was deleted.
+    """
+    with transaction.atomic():
+        matrix = UserInteractionMatrix.objects.select_for_update().filter(user_id=prescription.user_id).first()
+        if matrix is None:
+            return
+
+        current = {
+            key: entry for key, entry in matrix.drugs.items()
+            if entry['prescription_id'] == prescription.id
+        }
+        desired = {} if deleted else prescription_entries(prescription)
+        if apply_changes(matrix, current, desired):
+            matrix.save()
+
+
+def user_interactions(user_id):
+    """
+    Return the interactions among a user's active and new drugs.
+
+    - Reads the persisted matrix, building it first if the user has none or it predates the current DDI version.
+    - Deduplicates results by (drugA, drugB, interaction), like the interaction engine.
+
+    Parameters:
+        - user_id (int): The ID of the user.
+
+    Returns:
+        - list: One dictionary per interacting drug pair, with prescription IDs, drug and scientific names,
+          states and the distinct interaction types.
+    """
+    matrix = UserInteractionMatrix.objects.filter(user_id=user_id).first()
+    if matrix is None or not is_current(matrix, interaction_version()):
+        matrix = rebuild_matrix(user_id)
+
+    interactions = []
+    reported = set()
+    for interaction in matrix.interactions:
+        entry1 = matrix.drugs[interaction['entry1']]
+        entry2 = matrix.drugs[interaction['entry2']]
+        drug_pair = canonical_pair(entry1['drug'], entry2['drug'])
+        interaction_types = [
+            interaction_type for interaction_type in interaction['interaction_type']
+            if (drug_pair, interaction_type) not in reported
+        ]
+        if not interaction_types:
+            continue
+        reported.update((drug_pair, interaction_type) for interaction_type in interaction_types)
+        interactions.append({
+            'prescription_id_1': entry1['prescription_id'],
+            'prescription_id_2': entry2['prescription_id'],
+            'drug1': entry1['drug'],
+            'drug2': entry2['drug'],
+            'scname1': entry1['scname'],
+            'scname2': entry2['scname'],
+            'state1': entry1['state'],
+            'state2': entry2['state'],
+            'interaction_type': interaction_types
+        })
+    return interactions
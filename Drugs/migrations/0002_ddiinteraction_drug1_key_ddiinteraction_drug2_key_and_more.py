@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+def populate_drug_keys(apps, schema_editor):
+    """
+    Populate the normalized lookup keys for existing DDIInteraction rows.
+    """
+    DDIInteraction = apps.get_model('Drugs', 'DDIInteraction')
+    batch = []
+    for interaction in DDIInteraction.objects.only('id', 'drug1_name', 'drug2_name').iterator(chunk_size=2000):
+        interaction.drug1_key = interaction.drug1_name.strip().lower()
+        interaction.drug2_key = interaction.drug2_name.strip().lower()
+        batch.append(interaction)
+        if len(batch) >= 2000:
+            DDIInteraction.objects.bulk_update(batch, ['drug1_key', 'drug2_key'])
+            batch = []
+    if batch:
+        DDIInteraction.objects.bulk_update(batch, ['drug1_key', 'drug2_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Drugs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ddiinteraction',
+            name='drug1_key',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='ddiinteraction',
+            name='drug2_key',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(populate_drug_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ddiinteraction',
+            index=models.Index(fields=['drug1_key', 'drug2_key'], name='ddi_pair_key_idx'),
+        ),
+    ]
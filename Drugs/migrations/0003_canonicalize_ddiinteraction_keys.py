@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:05
+
+from django.db import migrations
+from django.db.models import F
+
+
+def canonicalize_drug_keys(apps, schema_editor):
+    """
+    Store the lookup keys of existing DDIInteraction rows in canonical (ascending) order.
+    """
+    DDIInteraction = apps.get_model('Drugs', 'DDIInteraction')
+    batch = []
+    reversed_rows = DDIInteraction.objects.filter(drug1_key__gt=F('drug2_key')).only('id', 'drug1_key', 'drug2_key')
+    for interaction in reversed_rows.iterator(chunk_size=2000):
+        interaction.drug1_key, interaction.drug2_key = interaction.drug2_key, interaction.drug1_key
+        batch.append(interaction)
+        if len(batch) >= 2000:
+            DDIInteraction.objects.bulk_update(batch, ['drug1_key', 'drug2_key'])
+            batch = []
+    if batch:
+        DDIInteraction.objects.bulk_update(batch, ['drug1_key', 'drug2_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Drugs', '0002_ddiinteraction_drug1_key_ddiinteraction_drug2_key_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_drug_keys, migrations.RunPython.noop),
+    ]
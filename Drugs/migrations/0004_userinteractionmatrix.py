@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Drugs', '0003_canonicalize_ddiinteraction_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserInteractionMatrix',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(unique=True)),
+                ('drugs', models.JSONField(default=dict)),
+                ('interactions', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
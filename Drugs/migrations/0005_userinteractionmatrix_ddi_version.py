@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Drugs', '0004_userinteractionmatrix'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinteractionmatrix',
+            name='ddi_version',
+            field=models.IntegerField(null=True),
+        ),
+    ]
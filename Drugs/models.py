@@ -2,6 +2,35 @@
 # Import necessary modules
 from django.db import models
 
+
+def normalize_component(component):
+    """
+    Normalize a scientific name component for case-insensitive pair lookups.
+
+    Parameters:
+        - component (str): A ScName component, e.g. 'Bacitracin ' or 'NEOMYCIN'.
+
+    Returns:
+        - str: The stripped, lowercase component.
+    """
+    return component.strip().lower()
+
+
+def canonical_pair(component1, component2):
+    """
+    Order a pair of normalized components canonically, so (a, b) and (b, a) share one key.
+
+    Parameters:
+        - component1 (str): The first normalized component.
+        - component2 (str): The second normalized component.
+
+    Returns:
+        - tuple: The two components in ascending order.
+    """
+    if component2 < component1:
+        return component2, component1
+    return component1, component2
+
 # Django model to represent drug-drug interactions
 class DDIInteraction(models.Model):
     """
@@ -22,9 +51,29 @@ class DDIInteraction(models.Model):
     drug1_name = models.CharField(max_length=255)
     drug2_name = models.CharField(max_length=255)
 
+    # Lowercase-normalized drug names in canonical (ascending) order, populated on save,
+    # used for indexed lookups of the unordered pair
+    drug1_key = models.CharField(max_length=255, blank=True, editable=False)
+    drug2_key = models.CharField(max_length=255, blank=True, editable=False)
+
     # Field to store the type of interaction
     interaction_type = models.CharField(max_length=1000)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['drug1_key', 'drug2_key'], name='ddi_pair_key_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Custom save method to keep the canonical lookup keys in sync with the drug names.
+        """
+        self.drug1_key, self.drug2_key = canonical_pair(
+            normalize_component(self.drug1_name),
+            normalize_component(self.drug2_name),
+        )
+        return super().save(*args, **kwargs)
+
     def __str__(self):
         """
         Returns a string representation of the model instance.
@@ -33,3 +82,44 @@ class DDIInteraction(models.Model):
             - str: A string representation of the DDIInteraction instance.
         """
         return f"{self.drug1_name} - {self.drug2_name}: {self.interaction_type}"
+
+
+# Django model to persist the interaction result of a user's active drug set
+class UserInteractionMatrix(models.Model):
+    """
+    Django model to persist the interaction result of a user's active and new drugs.
+
+    - Inherits from the Django's `models.Model` class.
+    - Stores one row per user, holding the active/new drug set and the interactions among it.
+    - Is updated incrementally when a prescription's drug states change, so interaction checks
+      for a user become a single row read.
+    - Records the DDI version its interactions were resolved at, and is rebuilt on read once the
+      DDI dataset moves past it.
+    """
+
+    # Primary key field for the model
+    id = models.BigAutoField(primary_key=True)
+
+    # Field to store the user the matrix belongs to
+    user_id = models.IntegerField(unique=True)
+
+    # Active/new drugs keyed by "<prescription_id>:<trade name>", with their normalized components
+    drugs = models.JSONField(default=dict)
+
+    # Interactions between pairs of drug entries, referenced by their keys
+    interactions = models.JSONField(default=list)
+
+    # DDI version the interactions were resolved at, None until the matrix is first built
+    ddi_version = models.IntegerField(null=True)
+
+    # Field to store when the matrix was last updated
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """
+        Returns a string representation of the model instance.
+
+        Returns:
+            - str: A string representation of the UserInteractionMatrix instance.
+        """
+        return f"Interaction matrix for User {self.user_id}"
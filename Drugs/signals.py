@@ -0,0 +1,49 @@
+"""
+Signal handlers that keep the ingredient table, the in-memory interaction index and the per-user
+interaction matrices in sync with the DDIInteraction table and with prescription changes.
+"""
+
+# Import necessary modules and classes
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Prescription.ingredients import ingredient_ids_for
+from Prescription.models import Prescription
+
+from .interactions import bump_interaction_version
+from .matrix import sync_prescription
+from .models import DDIInteraction
+
+
+@receiver(post_save, sender=DDIInteraction)
+def register_interaction_ingredients(sender, instance, **kwargs):
+    """
+    Register the drug names of a saved DDIInteraction as ingredients, so the index keys them by ingredient ID.
+    """
+    ingredient_ids_for([instance.drug1_key, instance.drug2_key])
+
+
+@receiver(post_save, sender=DDIInteraction)
+@receiver(post_delete, sender=DDIInteraction)
+def invalidate_interaction_index(sender, **kwargs):
+    """
+    Bump the DDI version whenever a DDIInteraction row changes, so every worker reloads its interaction index
+    and the persisted matrices are rebuilt on their next read.
+    """
+    bump_interaction_version()
+
+
+@receiver(post_save, sender=Prescription)
+def sync_saved_prescription(sender, instance, **kwargs):
+    """
+    Update the owner's interaction matrix after a prescription is created or its drug states change.
+    """
+    sync_prescription(instance)
+
+
+@receiver(post_delete, sender=Prescription)
+def sync_deleted_prescription(sender, instance, **kwargs):
+    """
+    Remove a deleted prescription's drugs from the owner's interaction matrix.
+    """
+    sync_prescription(instance, deleted=True)
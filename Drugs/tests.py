@@ -1,3 +1,336 @@
-from django.test import TestCase
+"""
+Tests of the drug-drug interaction engine: the in-memory interaction index must agree with the batched
+query it replaces, and the incrementally updated interaction matrices with a full rebuild. Also tests
+the batch interaction endpoint and the dataset importer.
+"""
 
-# Create your tests here.
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from Prescription.catalog import CATALOG_NAME, current_catalog_version, drug_catalog, stamp_catalog_change
+from Prescription.drug_states import prescriptions_with_state
+from Prescription.models import DrugEye, DrugEyeIngredient, Prescription, Session
+from User.models import User
+
+from .interactions import (
+    DDI_CATALOG_NAME,
+    find_pair_interactions,
+    interaction_index,
+    interactions_among,
+    interactions_between,
+)
+from .management.commands.import_dataset import DDI_FIELDS
+from .matrix import ACTIVE_STATES, apply_changes, prescription_entries, user_interactions
+from .models import DDIInteraction, UserInteractionMatrix
+from .views import DrugInteractionBatchView
+
+# (drug1_name, drug2_name, interaction_type) rows; the first two record one pair in both directions
+DDI_ROWS = [
+    ('Aspirin', 'Warfarin', 'bleeding'),
+    ('warfarin', 'aspirin', 'INR up'),
+    ('Caffeine', 'Theophylline', 'toxicity'),
+    ('Ibuprofen', 'Aspirin', 'reduced effect'),
+    ('Clarithromycin', 'Warfarin', 'bleeding'),
+]
+
+
+def create_interactions(rows):
+    for drug1_name, drug2_name, interaction_type in rows:
+        DDIInteraction.objects.create(
+            drug1_id='1', drug2_id='2', drug1_name=drug1_name, drug2_name=drug2_name, interaction_type=interaction_type
+        )
+
+
+def sorted_types(interaction_map):
+    return {pair: sorted(interaction_types) for pair, interaction_types in interaction_map.items()}
+
+
+def matrix_content(matrix):
+    """
+    Return the drugs and interactions of a matrix, independent of the order entries were checked in.
+    """
+    interactions = {
+        (frozenset((interaction['entry1'], interaction['entry2'])), tuple(sorted(interaction['interaction_type'])))
+        for interaction in matrix.interactions
+    }
+    return matrix.drugs, interactions
+
+
+class InteractionIndexTests(TestCase):
+    """
+    The interaction index must return what the batched DDIInteraction query returns.
+    """
+
+    components = ['Aspirin', 'WARFARIN', 'caffeine', 'Theophylline', 'ibuprofen', 'Clarithromycin', 'unknown']
+
+    def setUp(self):
+        create_interactions(DDI_ROWS)
+        interaction_index.invalidate()
+
+    def test_among_matches_batched_query(self):
+        with override_settings(DDI_INTERACTION_INDEX=True):
+            indexed = interactions_among(self.components)
+        with override_settings(DDI_INTERACTION_INDEX=False):
+            naive = interactions_among(self.components)
+        self.assertEqual(sorted_types(indexed), sorted_types(naive))
+        self.assertEqual(sorted(indexed[('aspirin', 'warfarin')]), ['INR up', 'bleeding'])
+
+    def test_between_matches_batched_query(self):
+        components1, components2 = ['warfarin', 'caffeine'], ['aspirin', 'theophylline', 'clarithromycin']
+        with override_settings(DDI_INTERACTION_INDEX=True):
+            indexed = interactions_between(components1, components2)
+        with override_settings(DDI_INTERACTION_INDEX=False):
+            naive = interactions_between(components1, components2)
+        self.assertEqual(sorted_types(indexed), sorted_types(naive))
+        self.assertEqual(set(indexed), {('aspirin', 'warfarin'), ('clarithromycin', 'warfarin'), ('caffeine', 'theophylline')})
+
+    def test_find_pair_interactions_matches_batched_query(self):
+        drugs = [
+            ('Aspocid', ['Aspirin']),
+            ('Marevan', ['Warfarin']),
+            ('Brufen', ['Ibuprofen', 'Caffeine']),
+            ('Klacid', ['Clarithromycin']),
+            ('Aspocid', ['Aspirin']),
+        ]
+        with override_settings(DDI_INTERACTION_INDEX=True):
+            indexed = find_pair_interactions(drugs)
+        with override_settings(DDI_INTERACTION_INDEX=False):
+            naive = find_pair_interactions(drugs)
+        normalize = lambda results: sorted((index1, index2, sorted(types)) for index1, index2, types in results)
+        self.assertEqual(normalize(indexed), normalize(naive))
+
+    @override_settings(CATALOG_VERSION_CHECK_INTERVAL=0)
+    def test_reloads_when_another_process_bumps_the_version(self):
+        self.assertEqual(interactions_among(['caffeine', 'aspirin']), {})
+
+        # Rows written without signals, then stamped, as another worker or import_dataset would
+        DDIInteraction.objects.bulk_create([DDIInteraction(
+            drug1_id='1', drug2_id='2', drug1_name='Aspirin', drug2_name='Caffeine',
+            drug1_key='aspirin', drug2_key='caffeine', interaction_type='stimulation',
+        )])
+        stamp_catalog_change(DDI_CATALOG_NAME)
+        self.assertEqual(interactions_among(['caffeine', 'aspirin']), {('aspirin', 'caffeine'): ['stimulation']})
+
+
+class InteractionMatrixTests(TestCase):
+    """
+    The persisted interaction matrix, updated incrementally on prescription changes, must match a full rebuild.
+    """
+
+    user_id = 7
+
+    def setUp(self):
+        create_interactions(DDI_ROWS)
+        interaction_index.invalidate()
+        self.session = Session.objects.create(doctor_id=1, user_id=self.user_id, otp=1)
+
+    def prescribe(self, drugs):
+        return Prescription.objects.create(session=self.session, doctor_id=1, user_id=self.user_id, drugs=drugs)
+
+    def assert_matches_rebuild(self):
+        """
+        Compare the persisted matrix with one built from scratch from the user's prescriptions.
+        """
+        user_interactions(self.user_id)
+        matrix = UserInteractionMatrix.objects.get(user_id=self.user_id)
+
+        desired = {}
+        for prescription in prescriptions_with_state(self.user_id, ACTIVE_STATES):
+            desired.update(prescription_entries(prescription))
+        rebuilt = UserInteractionMatrix(user_id=self.user_id, drugs={}, interactions=[])
+        apply_changes(rebuilt, {}, desired)
+        self.assertEqual(matrix_content(matrix), matrix_content(rebuilt))
+
+    def test_incremental_updates_match_rebuild(self):
+        first = self.prescribe({
+            'Aspocid': {'ScNameComponents': ['Aspirin', 'Caffeine'], 'state': 'active', 'ScName': 'Aspirin+Caffeine'},
+            'Marevan': {'ScNameComponents': ['Warfarin'], 'state': 'new', 'ScName': 'Warfarin'},
+        })
+        self.assert_matches_rebuild()
+
+        second = self.prescribe({
+            'Theo': {'ScNameComponents': ['Theophylline'], 'state': 'active', 'ScName': 'Theophylline'},
+            'Marevan': {'ScNameComponents': ['Warfarin'], 'state': 'inactive', 'ScName': 'Warfarin'},
+        })
+        self.assert_matches_rebuild()
+
+        first.drugs['Marevan']['state'] = 'inactive'
+        first.save()
+        self.assert_matches_rebuild()
+
+        second.drugs['Marevan']['state'] = 'active'
+        second.drugs['Klacid'] = {'ScNameComponents': ['Clarithromycin'], 'state': 'new', 'ScName': 'Clarithromycin'}
+        second.save()
+        self.assert_matches_rebuild()
+
+        first.drugs['Aspocid']['ScNameComponents'] = ['Ibuprofen']
+        first.save()
+        self.assert_matches_rebuild()
+
+        second.delete()
+        self.assert_matches_rebuild()
+        self.assertEqual(user_interactions(self.user_id), [])
+
+    def test_reports_each_interacting_drug_pair_once(self):
+        self.prescribe({
+            'Aspocid': {'ScNameComponents': ['Aspirin'], 'state': 'active', 'ScName': 'Aspirin'},
+            'Marevan': {'ScNameComponents': ['Warfarin'], 'state': 'active', 'ScName': 'Warfarin'},
+        })
+        self.prescribe({
+            'Marevan': {'ScNameComponents': ['Warfarin'], 'state': 'new', 'ScName': 'Warfarin'},
+        })
+        interactions = user_interactions(self.user_id)
+        self.assertEqual(len(interactions), 1)
+        self.assertEqual(sorted(interactions[0]['interaction_type']), ['INR up', 'bleeding'])
+
+    def test_ddi_change_rebuilds_stale_matrix_on_read(self):
+        self.prescribe({
+            'Aspocid': {'ScNameComponents': ['Aspirin'], 'state': 'active', 'ScName': 'Aspirin'},
+            'Theo': {'ScNameComponents': ['Theophylline'], 'state': 'active', 'ScName': 'Theophylline'},
+        })
+        self.assertEqual(user_interactions(self.user_id), [])
+        version = UserInteractionMatrix.objects.get(user_id=self.user_id).ddi_version
+
+        create_interactions([('Theophylline', 'Aspirin', 'seizures')])
+        matrix = UserInteractionMatrix.objects.get(user_id=self.user_id)
+        self.assertEqual(matrix.ddi_version, version)
+
+        interactions = user_interactions(self.user_id)
+        self.assertEqual([interaction['interaction_type'] for interaction in interactions], [['seizures']])
+        self.assertGreater(UserInteractionMatrix.objects.get(user_id=self.user_id).ddi_version, version)
+        self.assert_matches_rebuild()
+
+
+class DrugInteractionBatchTests(TestCase):
+    """
+    The batch endpoint must report every interacting pair of each list once, even for a drug listed twice,
+    the same whether or not the interaction index is enabled, and from a warm catalog and index without queries.
+    """
+
+    def setUp(self):
+        create_interactions(DDI_ROWS)
+        for trade_name, sc_name in [
+            ('Aspocid', 'Aspirin'), ('Marevan', 'Warfarin'), ('Brufen', 'Ibuprofen+Caffeine'), ('Theo', 'Theophylline'),
+        ]:
+            DrugEye.objects.create(TradeName=trade_name, ID=trade_name, ScName=sc_name, HOWMUCH=10, Unit='tab', CLASSIFICATION='c')
+        drug_catalog.invalidate()
+        interaction_index.invalidate()
+        self.factory = APIRequestFactory()
+
+    def post(self, data):
+        request = self.factory.post('/Drugs/check-drug-interaction-batch/', data, format='json')
+        force_authenticate(request, user=User(username='patient'))
+        return DrugInteractionBatchView.as_view()(request)
+
+    @staticmethod
+    def pairs(result):
+        return sorted(
+            (*sorted((interaction['drug1'], interaction['drug2'])), tuple(sorted(interaction['interaction_type'])))
+            for interaction in result['interactions']
+        )
+
+    def test_single_list(self):
+        response = self.post({'trade_names': ['Aspocid', ' Marevan ', 'Brufen', 'Theo', 'Unknown']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.pairs(response.data), [
+            ('Aspocid', 'Brufen', ('reduced effect',)),
+            ('Aspocid', 'Marevan', ('INR up', 'bleeding')),
+            ('Brufen', 'Theo', ('toxicity',)),
+        ])
+        self.assertEqual(response.data['not_found'], ['Unknown'])
+
+    def test_lists_are_checked_independently(self):
+        data = {'lists': [['Aspocid', 'Theo'], ['Marevan', 'Aspocid', 'Marevan'], []]}
+        with override_settings(DDI_INTERACTION_INDEX=False):
+            naive = self.post(data)
+        self.post(data)
+        with self.assertNumQueries(0):
+            response = self.post(data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([self.pairs(result) for result in response.data['results']], [
+            [],
+            [('Aspocid', 'Marevan', ('INR up', 'bleeding'))],
+            [],
+        ])
+        self.assertEqual(
+            [self.pairs(result) for result in naive.data['results']],
+            [self.pairs(result) for result in response.data['results']],
+        )
+
+    def test_rejects_invalid_batches(self):
+        for data in [{}, {'trade_names': 'Aspocid'}, {'lists': []}, {'lists': [['Aspocid', 1]]}]:
+            self.assertEqual(self.post(data).status_code, 400)
+        with override_settings(DRUG_INTERACTION_BATCH_MAX_DRUGS=3):
+            self.assertEqual(self.post({'lists': [['Aspocid', 'Theo'], ['Marevan', 'Brufen']]}).status_code, 400)
+
+
+class ImportDatasetTests(TestCase):
+    """
+    Replacing a dataset must swap every row at once and bump its version once, after the load.
+    """
+
+    def import_file(self, dataset, content, suffix='.csv', replace=True):
+        descriptor, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, path)
+        call_command('import_dataset', dataset, path, *(['--replace'] if replace else []), stdout=StringIO())
+
+    def test_replace_ddi(self):
+        create_interactions(DDI_ROWS)
+        version = current_catalog_version(DDI_CATALOG_NAME)
+
+        self.import_file('ddi', (
+            '{"drug1_id": 1, "drug2_id": 2, "drug1_name": "Warfarin ", "drug2_name": "Aspirin", "interaction_type": "bleeding"}\n'
+            '\n'
+            '{"drug1_id": 3, "drug2_id": 4, "drug1_name": "Caffeine", "drug2_name": "Lithium", "interaction_type": "tremor"}\n'
+        ), suffix='.jsonl')
+        self.assertEqual(current_catalog_version(DDI_CATALOG_NAME), version + 1)
+        self.assertEqual(
+            sorted(DDIInteraction.objects.values_list('drug1_key', 'drug2_key', 'interaction_type')),
+            [('aspirin', 'warfarin', 'bleeding'), ('caffeine', 'lithium', 'tremor')],
+        )
+        with override_settings(DDI_INTERACTION_INDEX=True):
+            self.assertEqual(interactions_among(['lithium', 'caffeine', 'theophylline']), {('caffeine', 'lithium'): ['tremor']})
+
+    def test_replace_drugeye(self):
+        for trade_name, sc_name in [('Aspocid', 'Aspirin'), ('Panadol', 'Paracetamol')]:
+            DrugEye.objects.create(TradeName=trade_name, ID=trade_name, ScName=sc_name, HOWMUCH=10, Unit='tab', CLASSIFICATION='c')
+        version = current_catalog_version(CATALOG_NAME)
+
+        self.import_file('drugeye', (
+            'TradeName,ID,ScName,HOWMUCH,Unit,CLASSIFICATION\n'
+            'Brufen,1,Ibuprofen,20,tab,analgesic\n'
+            'Panadol Extra,2,Paracetamol + Caffeine,24,tab,analgesic\n'
+        ))
+        self.assertEqual(current_catalog_version(CATALOG_NAME), version + 1)
+        self.assertEqual(
+            sorted(DrugEye.objects.values_list('TradeName', 'ScName')),
+            [('Brufen', 'Ibuprofen'), ('Panadol Extra', 'Paracetamol+Caffeine')],
+        )
+        self.assertEqual(
+            sorted(DrugEyeIngredient.objects.values_list('drug_eye__TradeName', 'ingredient__name')),
+            [('Brufen', 'ibuprofen'), ('Panadol Extra', 'caffeine'), ('Panadol Extra', 'paracetamol')],
+        )
+
+    def test_replace_with_an_empty_file_clears_the_table(self):
+        create_interactions(DDI_ROWS)
+        version = current_catalog_version(DDI_CATALOG_NAME)
+
+        self.import_file('ddi', ','.join(DDI_FIELDS) + '\n')
+        self.assertFalse(DDIInteraction.objects.exists())
+        self.assertEqual(current_catalog_version(DDI_CATALOG_NAME), version + 1)
+
+    def test_failed_replace_keeps_the_previous_dataset(self):
+        create_interactions(DDI_ROWS)
+        version = current_catalog_version(DDI_CATALOG_NAME)
+
+        with self.assertRaisesMessage(CommandError, 'Line 3: missing interaction_type'):
+            self.import_file('ddi', ','.join(DDI_FIELDS) + '\n1,2,Warfarin,Aspirin,bleeding\n3,4,Caffeine,Lithium,\n')
+        self.assertEqual(DDIInteraction.objects.count(), len(DDI_ROWS))
+        self.assertEqual(current_catalog_version(DDI_CATALOG_NAME), version)
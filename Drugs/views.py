@@ -1,19 +1,22 @@
 """
 This file contains API views for handling drug interaction checks and related functionalities.
 It includes views for checking drug interactions in a prescription, based on trade names of drugs,
-among all active prescriptions for a user, and for all user prescriptions. 
+within batches of trade names, among all active prescriptions for a user, and for all user prescriptions. 
 These views are designed to provide information about potential drug interactions, if any are found,
 while ensuring proper authentication and authorization for patients and doctors.
 """
 
 # Import necessary modules and classes
+from django.conf import settings
 from django.shortcuts import render
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import DDIInteraction
-from Prescription.models import Prescription ,DrugEye
+from .interactions import drug_eye_interactions, find_drug_eye_interactions, find_pair_interactions
+from .matrix import user_interactions
+from Prescription.models import Prescription
+from Prescription.catalog import drug_catalog
 from User.authentication import CustomTokenAuthentication
 from Doctor.authentication import DoctorCustomTokenAuthentication
 from Prescription.models import Session
@@ -63,54 +66,22 @@ class DrugInteractionCheckView(APIView):
         # Extract drugs data from the prescription
         drugs_data = prescription.drugs
 
-        # List to store interactions found
-        interactions = []
-
-        # Iterate through each pair of drugs and check for interactions
-        for drug_name1, drug_data1 in drugs_data.items():
-            for drug_name2, drug_data2 in drugs_data.items():
-                if drug_name1 != drug_name2:
-                    # Get ScNameComponents for each drug and convert to lowercase for case-insensitive comparison
-                    components1 = [component.lower() for component in drug_data1.get('ScNameComponents', [])]
-                    components2 = [component.lower() for component in drug_data2.get('ScNameComponents', [])]
-                    
-                    # Check for interactions between ScNameComponents of the two drugs
-                    for component1 in components1:
-                        for component2 in components2:
-                            # Check for interactions in both directions
-                            interaction = self.check_interaction(component1, component2)
-                            if interaction:
-                                interactions.append({
-                                    'drug1': drug_name1,
-                                    'drug2': drug_name2,
-                                    'interaction_type': interaction
-                                })
+        # Check each unordered pair of drugs once for interactions between their ScNameComponents
+        drugs = [(drug_name, drug_data.get('ScNameComponents', [])) for drug_name, drug_data in drugs_data.items()]
+        interactions = [
+            {
+                'drug1': drugs[index1][0],
+                'drug2': drugs[index2][0],
+                'interaction_type': interaction_types
+            }
+            for index1, index2, interaction_types in find_pair_interactions(drugs)
+        ]
 
         # Return interactions found
         if interactions:
             return Response(interactions, status=status.HTTP_200_OK)
         else:
             return Response({'message': 'No interactions found'}, status=status.HTTP_200_OK)
-
-    def check_interaction(self, component1, component2):
-        """
-        Method to check for drug interactions between two drug components.
-
-        Parameters:
-            - component1 (str): The first drug component to check.
-            - component2 (str): The second drug component to check.
-
-        Returns:
-            - str: The type of interaction found, if any.
-        """
-
-        # Check if there's an interaction between component1 and component2 in the DDI database
-        interactions = DDIInteraction.objects.filter(
-            drug1_name__iexact=component1,
-            drug2_name__iexact=component2
-        )
-        interaction_types = [interaction.interaction_type for interaction in interactions]
-        return interaction_types
     
 # View class for checking drug interactions by trade name
 class DrugInteractionByTradeNameView(APIView):
@@ -144,7 +115,7 @@ class DrugInteractionByTradeNameView(APIView):
         if not trade_name1 or not trade_name2:
             return Response({'error': 'Trade names of both drugs are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Fetch scientific names and their components from DrugEye for the given trade names
+        # Fetch the two drugs and their precomputed ingredients from the DrugEye catalog
         drug1_info = self.get_drug_info(trade_name1)
         drug2_info = self.get_drug_info(trade_name2)
 
@@ -152,8 +123,8 @@ class DrugInteractionByTradeNameView(APIView):
         if not drug1_info or not drug2_info:
             return Response({'error': 'One or both drugs not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Check if there's an interaction between the two drugs based on their components
-        interaction_types = self.check_interaction(drug1_info['ScNameComponents'], drug2_info['ScNameComponents'])
+        # Check if there's an interaction between the two drugs based on their ingredients
+        interaction_types = self.check_interaction(drug1_info, drug2_info)
 
         # Return interactions found
         if interaction_types:
@@ -169,58 +140,106 @@ class DrugInteractionByTradeNameView(APIView):
             - trade_name (str): The trade name of the drug.
 
         Returns:
-            - dict or None: A dictionary containing drug information if found, else None.
+            - DrugRecord or None: The catalog entry, with its ScName and ingredient IDs, if found, else None.
         """
 
-        try:
-            drug_eye = DrugEye.objects.get(TradeName=trade_name)
-        except DrugEye.DoesNotExist:
-            return None
-        # Convert ScNameComponents to lowercase for case-insensitive comparison
-        sc_name_components_lower = [component.lower() for component in drug_eye.ScName.split('+')]
-        print(sc_name_components_lower)
-        return {
-            'ScName': drug_eye.ScName,
-            'ScNameComponents': sc_name_components_lower
-        }
-
-    def check_interaction(self, components1, components2):
+        # Read the drug from the in-memory DrugEye catalog; its ingredients were normalized on import
+        return drug_catalog.get().lookup(trade_name)
+
+    def check_interaction(self, drug1_info, drug2_info):
         """
-        Helper method to check for drug interactions between components of two drugs.
+        Helper method to check for drug interactions between the ingredients of two drugs.
 
         Parameters:
-            - components1 (list): A list of components of the first drug.
-            - components2 (list): A list of components of the second drug.
+            - drug1_info (DrugRecord): The catalog entry of the first drug.
+            - drug2_info (DrugRecord): The catalog entry of the second drug.
 
         Returns:
-            - list: A list of interaction types found between the two drugs' components.
+            - list: A list of interaction types found between the two drugs' ingredients.
         """
 
-        # Check if there's an interaction between the components of the two drugs in the DDI database
-        interactions = []
-        for component1 in components1:
-            for component2 in components2:
-                interactions += self.get_interactions(component1, component2)
-        return interactions
+        # Check if there's an interaction between the ingredients of the two drugs in the DDI database
+        return drug_eye_interactions(drug1_info, drug2_info)
 
-    def get_interactions(self, component1, component2):
+# View class for checking drug interactions among many trade names at once
+class DrugInteractionBatchView(APIView):
+    """
+    API view to check for drug interactions among one or several lists of trade names in a single call.
+
+    - Inherits from APIView provided by Django REST Framework.
+    - Requires authentication using custom tokens for both patients and doctors.
+    - Requires the requesting user to be authenticated.
+    - Accepts either `trade_names`, a list of trade names, or `lists`, several independent lists of trade names,
+      and checks every pair within each list.
+    - Resolves the drugs from the in-memory DrugEye catalog and their interactions from the interaction index,
+      so a batch costs a constant number of queries whatever its size.
+    """
+
+    authentication_classes = [CustomTokenAuthentication, DoctorCustomTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
         """
-        Helper method to retrieve interactions between two components from the DDI database.
+        Handles POST requests to check for drug interactions among lists of trade names.
 
         Parameters:
-            - component1 (str): The first drug component.
-            - component2 (str): The second drug component.
+            - request (HttpRequest): The request object.
 
         Returns:
-            - list: A list of interaction types found between the two components.
+            - Response: For `trade_names`, the interactions found and the trade names missing from DrugEye;
+              for `lists`, one such result per list, in request order.
         """
 
-        interactions = DDIInteraction.objects.filter(
-            drug1_name__icontains=component1,
-            drug2_name__icontains=component2
-        ).values_list('interaction_type', flat=True)
+        # Get the list, or lists, of trade names from the request data
+        single = 'trade_names' in request.data
+        lists = [request.data.get('trade_names')] if single else request.data.get('lists')
+        if not isinstance(lists, list) or not lists or not all(
+            isinstance(trade_names, list) and all(isinstance(trade_name, str) for trade_name in trade_names)
+            for trade_names in lists
+        ):
+            return Response({'error': 'Provide trade_names as a list of trade names, or lists as a list of such lists'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Bound the work done by one request
+        max_drugs = getattr(settings, 'DRUG_INTERACTION_BATCH_MAX_DRUGS', 500)
+        if sum(len(trade_names) for trade_names in lists) > max_drugs:
+            return Response({'error': f'A batch can check at most {max_drugs} trade names'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Resolve every trade name from the in-memory DrugEye catalog
+        catalog = drug_catalog.get()
+        resolved = []
+        not_found = []
+        for trade_names in lists:
+            drug_eyes = []
+            missing = []
+            for trade_name in trade_names:
+                drug_eye = catalog.lookup(trade_name.strip())
+                if drug_eye is None:
+                    missing.append(trade_name)
+                else:
+                    drug_eyes.append(drug_eye)
+            resolved.append(drug_eyes)
+            not_found.append(missing)
+
+        # Check each unordered pair of drugs of each list once for interactions between their ingredients
+        results = [
+            {
+                'interactions': [
+                    {
+                        'drug1': drug_eyes[index1].TradeName,
+                        'drug2': drug_eyes[index2].TradeName,
+                        'interaction_type': interaction_types
+                    }
+                    for index1, index2, interaction_types in pair_interactions
+                ],
+                'not_found': missing
+            }
+            for drug_eyes, missing, pair_interactions in zip(resolved, not_found, find_drug_eye_interactions(resolved))
+        ]
 
-        return list(interactions)
+        # Return interactions found
+        if single:
+            return Response(results[0], status=status.HTTP_200_OK)
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
 # During the session
 # View class for checking drug interactions among all user prescriptions
@@ -268,53 +287,8 @@ class DrugInteractionCheckViewForAllUserPrescriptions(APIView):
             session.save()
             return Response({'error': 'Session has expired'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Step 2: Retrieve active prescriptions for the user
-        user_id = session.user_id
-        
-        # Retrieve all prescriptions for the user
-        prescriptions = Prescription.objects.filter(user_id=user_id)
-        active_prescriptions = []
-
-        # Add prescription from the session to active prescriptions
-        session_prescription = Prescription.objects.filter(doctor_id=doctor_id, user_id=user_id, session_id=session.session_id).first()
-        if session_prescription:
-            active_prescriptions.append(session_prescription)
-
-        for prescription in prescriptions:
-            drugs_data = prescription.drugs  # Assuming prescription.drugs is already a dictionary
-            for drug_name, drug_info in drugs_data.items():
-                if drug_info.get('state') in ['active', 'new']:  # Ensure 'state' key exists and its value is 'active' or 'new'
-                    active_prescriptions.append(prescription)
-                    break  # Break out of the inner loop once an active drug is found
-
-        # List to store interactions found
-        interactions = []
-
-        # Step 3: Check for interactions between all the drugs of these prescriptions
-        for prescription1 in active_prescriptions:
-            drugs_data1 = prescription1.drugs
-            for prescription2 in active_prescriptions:
-                drugs_data2 = prescription2.drugs
-                for drug_name1, drug_data1 in drugs_data1.items():
-                    for drug_name2, drug_data2 in drugs_data2.items():
-                        if drug_name1 != drug_name2:
-                            components1 = [component.lower() for component in drug_data1.get('ScNameComponents', [])]
-                            components2 = [component.lower() for component in drug_data2.get('ScNameComponents', [])]
-                            for component1 in components1:
-                                for component2 in components2:
-                                    interaction = self.check_interaction(component1, component2)
-                                    if interaction:
-                                        interactions.append({
-                                            'prescription_id_1': prescription1.id,
-                                            'prescription_id_2': prescription2.id,
-                                            'drug1': drug_name1,
-                                            'drug2': drug_name2,
-                                            'scname1': drug_data1.get('ScName'),
-                                            'scname2': drug_data2.get('ScName'),
-                                            'state1': drug_data1.get('state'),
-                                            'state2': drug_data2.get('state'),
-                                            'interaction_type': interaction
-                                        })
+        # Step 2: Read the interactions among the user's active and new drugs from their interaction matrix
+        interactions = user_interactions(session.user_id)
 
         # Return interactions found
         if interactions:
@@ -322,26 +296,6 @@ class DrugInteractionCheckViewForAllUserPrescriptions(APIView):
         else:
             return Response({'message': 'No interactions found'}, status=status.HTTP_200_OK)
 
-    def check_interaction(self, component1, component2):
-        """
-        Helper method to check for interactions between two drug components.
-
-        Parameters:
-            - component1 (str): The first drug component.
-            - component2 (str): The second drug component.
-
-        Returns:
-            - list: A list of interaction types found between the two components.
-        """
-
-        # Step 4: Check for interactions between component1 and component2
-        interactions = DDIInteraction.objects.filter(
-            drug1_name__iexact=component1,
-            drug2_name__iexact=component2
-        )
-        interaction_types = [interaction.interaction_type for interaction in interactions]
-        return interaction_types
-
 # for patient all prescreptions check
 # View class for checking drug interactions among all active prescriptions for a user
 class DrugInteractionCheckViewForUser(APIView):
@@ -380,68 +334,11 @@ class DrugInteractionCheckViewForUser(APIView):
         # Determine the user ID to use for querying prescriptions
         query_user_id = target_user_id if target_user_id else user_id
 
-        # Retrieve all prescriptions for the user
-        prescriptions = Prescription.objects.filter(user_id=query_user_id)
-        active_prescriptions = []
-
-        for prescription in prescriptions:
-            drugs_data = prescription.drugs  # Assuming prescription.drugs is already a dictionary
-            for drug_name, drug_info in drugs_data.items():
-                if drug_info.get('state') in ['active', 'new']:  # Ensure 'state' key exists and its value is 'active' or 'new'
-                    active_prescriptions.append(prescription)
-                    break  # Break out of the inner loop once an active drug is found
-
-        # List to store interactions found
-        interactions = []
-
-        # Step 3: Check for interactions between all the drugs of these prescriptions
-        for prescription1 in active_prescriptions:
-            drugs_data1 = prescription1.drugs
-            for prescription2 in active_prescriptions:
-                drugs_data2 = prescription2.drugs
-                for drug_name1, drug_data1 in drugs_data1.items():
-                    for drug_name2, drug_data2 in drugs_data2.items():
-                        if drug_name1 != drug_name2:
-                            components1 = [component.lower() for component in drug_data1.get('ScNameComponents', [])]
-                            components2 = [component.lower() for component in drug_data2.get('ScNameComponents', [])]
-                            for component1 in components1:
-                                for component2 in components2:
-                                    interaction = self.check_interaction(component1, component2)
-                                    if interaction:
-                                        interactions.append({
-                                            'prescription_id_1': prescription1.id,
-                                            'prescription_id_2': prescription2.id,
-                                            'drug1': drug_name1,
-                                            'drug2': drug_name2,
-                                            'scname1': drug_data1.get('ScName'),
-                                            'scname2': drug_data2.get('ScName'),
-                                            'state1': drug_data1.get('state'),
-                                            'state2': drug_data2.get('state'),
-                                            'interaction_type': interaction
-                                        })
+        # Read the interactions among the user's active and new drugs from their interaction matrix
+        interactions = user_interactions(query_user_id)
 
         # Return interactions found
         if interactions:
             return Response(interactions, status=status.HTTP_200_OK)
         else:
-            return Response({'message': 'No interactions found'}, status=status.HTTP_200_OK)
-
-    def check_interaction(self, component1, component2):
-        """
-        Helper method to check for interactions between two drug components.
-
-        Parameters:
-            - component1 (str): The first drug component.
-            - component2 (str): The second drug component.
-
-        Returns:
-            - list: A list of interaction types found between the two components.
-        """
-
-        # Step 4: Check for interactions between component1 and component2
-        interactions = DDIInteraction.objects.filter(
-            drug1_name__iexact=component1,
-            drug2_name__iexact=component2
-        )
-        interaction_types = [interaction.interaction_type for interaction in interactions]
-        return interaction_types
\ No newline at end of file
+            return Response({'message': 'No interactions found'}, status=status.HTTP_200_OK)
\ No newline at end of file
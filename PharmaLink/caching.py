@@ -0,0 +1,165 @@
+"""
+Caching helpers shared by the project's apps.
+It provides a thread-safe, in-process LRU cache whose entries expire after a TTL, and a tiered cache that
+puts such a cache in front of an optional shared Django cache (e.g. Redis or Memcached), so hot lookups
+are served from process memory and other processes can still reuse each other's results.
+"""
+
+# Import necessary modules and classes
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+# Marker for cache misses, so that None can be cached
+MISSING = object()
+
+
+# In-process LRU cache with a per-entry time to live
+class TTLCache:
+    """
+    Thread-safe, in-process LRU cache whose entries expire after a time to live.
+
+    - Evicts the least recently used entry once `maxsize` entries are stored.
+    - Treats entries older than `ttl` seconds as missing.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        """
+        Initialize the cache.
+
+        Parameters:
+            - maxsize (int): The maximum number of entries kept.
+            - ttl (float): The number of seconds an entry stays valid; None keeps entries until evicted.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Return the value cached under `key`, or `default` if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """
+        Cache `value` under `key`, evicting the least recently used entry if the cache is full.
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Remove `key` from the cache, if present.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# In-process cache in front of an optional shared Django cache
+class TieredCache:
+    """
+    Two-level cache: an in-process TTLCache in front of an optional shared Django cache.
+
+    - Reads the in-process cache first, then the shared cache, and copies shared hits into process memory.
+    - Writes and deletes go to both levels.
+    - Deleting a key only clears the in-process level of the current process; other processes keep
+      their copy until it expires, so the TTL bounds how stale an entry can be.
+    - With `shared_only`, entries are kept in the shared cache alone, so deleting a key takes effect in
+      every process at once; without a shared cache nothing is cached then. Use it for entries that must
+      not outlive their invalidation, e.g. revocable credentials.
+    """
+
+    def __init__(self, namespace, ttl=60, maxsize=1024, shared_alias=None, shared_only=False):
+        """
+        Initialize the cache.
+
+        Parameters:
+            - namespace (str): Prefix for keys in the shared cache.
+            - ttl (float): The number of seconds an entry stays valid at both levels.
+            - maxsize (int): The maximum number of entries kept in process memory.
+            - shared_alias (str): The alias of a Django cache in CACHES to share entries through, or None.
+            - shared_only (bool): Whether to skip the in-process level.
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=0 if shared_only else maxsize, ttl=ttl)
+        self.shared_alias = shared_alias
+        self.shared_only = shared_only
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _shared_key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def get(self, key, default=None):
+        """
+        Return the value cached under `key`, or `default` if neither level has it.
+        """
+        if not self.shared_only:
+            value = self.local.get(key, MISSING)
+            if value is not MISSING:
+                return value
+
+        shared = self.shared
+        if shared is None:
+            return default
+        value = shared.get(self._shared_key(key), MISSING)
+        if value is MISSING:
+            return default
+        if not self.shared_only:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key, value):
+        """
+        Cache `value` under `key` at both levels.
+        """
+        if not self.shared_only:
+            self.local.set(key, value)
+        shared = self.shared
+        if shared is not None:
+            shared.set(self._shared_key(key), value, self.ttl)
+
+    def delete(self, key):
+        """
+        Remove `key` from both levels.
+        """
+        self.local.delete(key)
+        shared = self.shared
+        if shared is not None:
+            shared.delete(self._shared_key(key))
+
+    def clear(self):
+        """
+        Remove every entry from the in-process level.
+        """
+        self.local.clear()
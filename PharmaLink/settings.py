@@ -67,7 +67,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'Prescription.middleware.SessionExpirationMiddleware',
+    # Session expiry runs in `manage.py run_housekeeping`, which must be deployed next to the web server
+    # 'Prescription.middleware.SessionExpirationMiddleware',
 
     # 'django.contrib.sessions.middleware.SessionMiddleware',
     # 'django.middleware.security.SecurityMiddleware',
@@ -111,6 +112,8 @@ DATABASES = {
 }
 
 # Glopal Database
+# Chat message search is indexed on SQLite (FTS5) and PostgreSQL only; on MongoDB it falls back to an
+# unindexed, unranked `icontains` scan of the searcher's messages (see chat/search.py).
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'djongo',
@@ -338,5 +341,66 @@ MEDIA_URL = '/'
 MEDIA_ROOT = os.path.join(BASE_DIR, '')
 CORS_ORIGIN_ALLOW_ALL = True
 
-# Background tasks configuration
-BACKGROUND_TASK_RUN_ASYNC = True
\ No newline at end of file
+# Housekeeping (session expiry and drug deactivation) is run by `manage.py run_housekeeping`, not by requests.
+# It must run in every deployment, as a long-lived process next to the web server or from cron with --once;
+# otherwise sessions never expire and drugs past their end date stay active.
+# Seconds between runs and prescriptions processed per batch:
+HOUSEKEEPING_INTERVAL = 300
+HOUSEKEEPING_BATCH_SIZE = 500
+
+# Drug interaction lookups: keep the DDI table in an in-memory index per process.
+# Set to False to resolve each request with a single batched query instead.
+DDI_INTERACTION_INDEX = True
+
+# Expired prescription sessions are ended at most once per this many seconds per process
+# by Prescription.middleware.SessionExpirationMiddleware, if it is enabled instead of run_housekeeping.
+SESSION_EXPIRY_CHECK_INTERVAL = 60
+
+# Authenticated tokens are cached for this many seconds in the shared cache named by AUTH_TOKEN_SHARED_CACHE
+# (an alias in CACHES, e.g. Redis), where a logout or token refresh drops them for every process.
+# Tokens are not cached while AUTH_TOKEN_SHARED_CACHE is None.
+AUTH_TOKEN_CACHE_TTL = 30
+AUTH_TOKEN_SHARED_CACHE = None
+
+# Doctor summary cards shown in prescription listings are cached per process (LRU) for this many seconds.
+DOCTOR_CARD_CACHE_SIZE = 1000
+DOCTOR_CARD_CACHE_TTL = 300
+
+# Patient home-page documents are cached in this Django cache alias for HOME_PAGE_CACHE_TTL seconds, under
+# per-user versions stored in the database, so invalidations reach every process even with a per-process cache.
+# Point it at a shared cache (e.g. Redis) when running several processes, so each document is built only once.
+HOME_PAGE_CACHE = 'default'
+HOME_PAGE_CACHE_TTL = 600
+
+# Workers compare their in-memory DrugEye catalog and DDI interaction graph with the stored catalog versions
+# at most once per this many seconds.
+CATALOG_VERSION_CHECK_INTERVAL = 30
+
+# Maximum number of trade names, across all lists, checked by one batch drug interaction request.
+DRUG_INTERACTION_BATCH_MAX_DRUGS = 500
+
+# Channel layer used by the chat consumer to deliver messages to the receiver's open sockets.
+# The in-memory layer only reaches sockets of the same process; set CHANNEL_LAYER_REDIS_URL
+# (requires channels_redis) to share groups between workers and nodes.
+if os.environ.get('CHANNEL_LAYER_REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.environ['CHANNEL_LAYER_REDIS_URL']]},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Chat message receivers are cached per process (LRU) for this many seconds.
+CHAT_RECEIVER_CACHE_SIZE = 10000
+CHAT_RECEIVER_CACHE_TTL = 60
+
+# Chat messages are saved in batches by a per-worker write-behind buffer: a batch is written once this many
+# messages are pending or this many milliseconds after the first pending message.
+CHAT_WRITE_BUFFER_SIZE = 100
+CHAT_WRITE_BUFFER_FLUSH_MS = 50
@@ -8,6 +8,7 @@ from django.conf.urls.static import static
 from django.conf import settings
 from Prescription.views import *
 from Drugs.views import *
+from chat.views import *
 
 # from django.conf.urls import url
 
@@ -64,6 +65,7 @@ urlpatterns = [
 
     # Prescription 
     path('Prescription/drug_search/', MedicineSearchView.as_view(), name='medicine-search'),
+    path('Prescription/drug_autocomplete/', DrugAutocompleteView.as_view(), name='drug-autocomplete'),
     path('Prescription/start-session/', StartSessionView.as_view(), name='start_session'),
     path('Prescription/verify-session/', VerifySessionView.as_view(), name='verify_session'),
     path('Prescription/end-session/', EndSessionView.as_view(), name='end_session'),
@@ -80,11 +82,16 @@ urlpatterns = [
     # Drugs
     path('Drugs/<int:prescription_id>/check-drug-interaction/', DrugInteractionCheckView.as_view(), name='check_drug_interaction'),
     path('Drugs/check-drug-interaction-TradeName/', DrugInteractionByTradeNameView.as_view(), name='check_drug_interaction_by_tradename'),
+    path('Drugs/check-drug-interaction-batch/', DrugInteractionBatchView.as_view(), name='check_drug_interaction_batch'),
     path('Drugs/check-drug-interaction-All/', DrugInteractionCheckViewForAllUserPrescriptions.as_view(), name='check_drug_interaction_for_all_user_prescriptions'),
     path('Drugs/User/check-interactions/', DrugInteractionCheckViewForUser.as_view(), name='user_check_interactions'),
 
 
     # Chat
+    path('Chat/messages/', ChatHistoryView.as_view(), name='chat_history'),
+    path('Chat/messages/search/', ChatSearchView.as_view(), name='chat_search'),
+    path('Chat/conversations/', ConversationListView.as_view(), name='chat_conversations'),
+    path('Chat/conversations/read/', ConversationReadView.as_view(), name='chat_conversation_read'),
     # path('Chat/messages/<int:receiver_id>/', ChatMessageCreateView.as_view(), name='chat-message-create'),
     # path('Chat/messages/list/<int:channel_id>/', ChatMessageListView.as_view(), name='chat-message-list'),
     # path('Chat/channel/', ChatChannelCreateView.as_view(), name='chat-channel-create'),
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PrescriptionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Prescription'
+
+    def ready(self):
+        # Connect the signal handlers that invalidate the medicine search index
+        from . import signals  # noqa: F401
@@ -0,0 +1,243 @@
+"""
+This file contains the process-local, read-through copy of the DrugEye catalog.
+The catalog is loaded once per process into compact slotted records keyed by TradeName and by ID, and
+every DrugEye read of the Prescription and Drugs apps goes through it instead of the ORM. A version stamp
+stored in CatalogVersion is bumped whenever the catalog changes; workers compare it with their copy
+at most once per CATALOG_VERSION_CHECK_INTERVAL seconds and reload only when it moved.
+Records also carry their ScName components and ingredient IDs, read from the DrugEye→ingredient mapping,
+so requests never split or normalize scientific names.
+"""
+
+# Import necessary modules and classes
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import CatalogVersion, DrugEye, DrugEyeIngredient, Ingredient
+
+# Name of the DrugEye catalog in CatalogVersion
+CATALOG_NAME = 'drugeye'
+
+# Number of times a catalog load is retried when the catalog changes while it is being read
+CATALOG_LOAD_ATTEMPTS = 3
+
+# DrugEye fields copied into catalog records
+CATALOG_FIELDS = ('id', 'TradeName', 'ID', 'ScName', 'HOWMUCH', 'Unit', 'CLASSIFICATION')
+
+
+# Compact, read-only copy of a DrugEye row
+class DrugRecord:
+    """
+    Compact, read-only copy of a DrugEye row.
+
+    - Uses __slots__ so that the whole catalog fits in little memory.
+    - Exposes the same attribute names as DrugEye, so it can be serialized with DrugEyeSerializer.
+    - Carries the ScName split on '+' and the entry's normalized ingredient names and IDs.
+    """
+
+    __slots__ = CATALOG_FIELDS + ('sc_name_components', 'ingredients', 'ingredient_ids')
+
+    def __init__(self, *values, ingredients=()):
+        for field, value in zip(CATALOG_FIELDS, values):
+            setattr(self, field, value)
+        self.sc_name_components = tuple(self.ScName.split('+'))
+        self.ingredients = tuple(name for name, _ in ingredients)
+        self.ingredient_ids = tuple(ingredient_id for _, ingredient_id in ingredients)
+
+    def __repr__(self):
+        return f'<DrugRecord {self.id}: {self.TradeName}>'
+
+
+# Immutable snapshot of the catalog at one version
+class CatalogSnapshot:
+    """
+    Immutable snapshot of the DrugEye catalog at one version.
+
+    - Holds every record in primary key order.
+    - Indexes records by primary key, by TradeName and by DrugEye ID; when a trade name or DrugEye ID
+      appears more than once, lookups return its first record, like `filter(...).first()`.
+    """
+
+    __slots__ = ('version', 'records', 'by_pk', 'by_trade_name', 'by_id')
+
+    def __init__(self, version, records):
+        """
+        Build the snapshot.
+
+        Parameters:
+            - version (int): The catalog version the records were read at.
+            - records (list): DrugRecord instances, ordered by primary key.
+        """
+        self.version = version
+        self.records = records
+        self.by_pk = {}
+        self.by_trade_name = {}
+        self.by_id = {}
+        for record in records:
+            self.by_pk[record.id] = record
+            self.by_trade_name.setdefault(record.TradeName, []).append(record)
+            self.by_id.setdefault(record.ID, record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def lookup(self, trade_name):
+        """
+        Return the first record with a trade name, or None.
+        """
+        records = self.by_trade_name.get(trade_name)
+        return records[0] if records else None
+
+    def named(self, trade_names):
+        """
+        Return every record whose trade name is one of `trade_names`, in primary key order.
+        """
+        records = [record for trade_name in set(trade_names) for record in self.by_trade_name.get(trade_name, ())]
+        return sorted(records, key=lambda record: record.id)
+
+
+# Process-wide, versioned DrugEye catalog
+class DrugCatalog:
+    """
+    Holds the process-wide CatalogSnapshot.
+
+    - Loads the snapshot from the DrugEye table on first use.
+    - Compares the stored catalog version with the snapshot's at most once per
+      CATALOG_VERSION_CHECK_INTERVAL seconds, and reloads only when it changed.
+    - Is invalidated locally when this process changes the catalog.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Return the current catalog snapshot, loading or reloading it if needed.
+
+        Returns:
+            - CatalogSnapshot: The current snapshot.
+        """
+        snapshot = self._snapshot
+        interval = getattr(settings, 'CATALOG_VERSION_CHECK_INTERVAL', 30)
+        if snapshot is not None and time.monotonic() - self._checked_at < interval:
+            return snapshot
+
+        # Check and load under the lock so concurrent requests share a single load
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() - self._checked_at < interval:
+                return self._snapshot
+            version = current_catalog_version()
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = self._load(version)
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def _load(self, version):
+        """
+        Read every DrugEye row and its ingredients into a new snapshot.
+
+        - The rows, the mapping and the ingredient names are separate queries, which may see different commits.
+          The version is read again after them, and the load is retried, up to CATALOG_LOAD_ATTEMPTS times,
+          when the catalog changed meanwhile. A snapshot still loaded across a change keeps the version read
+          before it, so it is reloaded at the next version check.
+        - Reads the mapping before the ingredient names, so every mapped ingredient is normally named; one
+          that is not (e.g. deleted meanwhile) is left out of its record rather than failing the load.
+
+        Parameters:
+            - version (int): The catalog version read before the load.
+        """
+        for _ in range(CATALOG_LOAD_ATTEMPTS):
+            snapshot = self._read(version)
+            current = current_catalog_version()
+            if current == version:
+                break
+            version = current
+        return snapshot
+
+    @staticmethod
+    def _read(version):
+        """
+        Read every DrugEye row and its ingredients into a snapshot stamped with `version`.
+        """
+        mapping = DrugEyeIngredient.objects.order_by('drug_eye_id', 'position').values_list('drug_eye_id', 'ingredient_id')
+        mapping = list(mapping.iterator())
+        names = dict(Ingredient.objects.values_list('id', 'name').iterator())
+        ingredients = {}
+        for drug_eye_id, ingredient_id in mapping:
+            if ingredient_id in names:
+                ingredients.setdefault(drug_eye_id, []).append((names[ingredient_id], ingredient_id))
+
+        rows = DrugEye.objects.order_by('id').values_list(*CATALOG_FIELDS)
+        return CatalogSnapshot(version, [
+            DrugRecord(*row, ingredients=ingredients.get(row[0], ())) for row in rows.iterator()
+        ])
+
+    def invalidate(self):
+        """
+        Drop the snapshot so that the next read reloads it.
+        """
+        with self._lock:
+            self._snapshot = None
+
+
+# Shared catalog used by every DrugEye read in this process
+drug_catalog = DrugCatalog()
+
+
+def current_catalog_version(name=CATALOG_NAME):
+    """
+    Return the stored version of a catalog.
+
+    Parameters:
+        - name (str): The name of the catalog in CatalogVersion, the DrugEye catalog by default.
+
+    Returns:
+        - int: The version, or 0 if the catalog was never stamped.
+    """
+    return CatalogVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def stamp_catalog_change(name):
+    """
+    Increment the stored version of a catalog, so that every worker holding a copy reloads it.
+
+    Parameters:
+        - name (str): The name of the catalog in CatalogVersion.
+    """
+    if not CatalogVersion.objects.filter(name=name).update(version=F('version') + 1):
+        _, created = CatalogVersion.objects.get_or_create(name=name, defaults={'version': 1})
+        if not created:
+            # Another process created the row in the meantime
+            CatalogVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def bump_catalog_version():
+    """
+    Record that the DrugEye catalog changed, so every worker reloads it, and drop this process's copy.
+    """
+    stamp_catalog_change(CATALOG_NAME)
+    drug_catalog.invalidate()
+
+
+def resolve_trade_names(trade_names):
+    """
+    Resolve trade names to their catalog records without querying the database.
+
+    Parameters:
+        - trade_names (iterable): The trade names to resolve.
+
+    Returns:
+        - dict: DrugRecord instances keyed by trade name; trade names missing from the catalog are left out.
+          If a trade name appears more than once in the catalog, its first entry is kept.
+    """
+    catalog = drug_catalog.get()
+    drug_eyes = {}
+    for trade_name in set(trade_names):
+        record = catalog.lookup(trade_name)
+        if record is not None:
+            drug_eyes[trade_name] = record
+    return drug_eyes
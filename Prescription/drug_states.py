@@ -0,0 +1,80 @@
+"""
+This file keeps the Drug state table in sync with `Prescription.drugs` and queries it.
+Each prescription contributes one Drug row per drug, holding its trade name, state and dates,
+so views can select the prescriptions holding drugs in a given state with an indexed query.
+"""
+
+# Import necessary modules and classes
+from datetime import datetime
+
+from django.db import transaction
+
+from .models import Drug, Prescription
+
+
+def parse_date(value):
+    """
+    Parse a 'YYYY-MM-DD' date from the drugs JSON.
+
+    Parameters:
+        - value (str): The date string, possibly missing or malformed.
+
+    Returns:
+        - date or None: The parsed date, or None if it is missing or malformed.
+    """
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def drug_state_rows(prescription):
+    """
+    Build the Drug rows describing the drugs of a prescription.
+
+    Parameters:
+        - prescription (Prescription): The prescription to read drugs from.
+
+    Returns:
+        - list: Unsaved Drug instances, one per drug.
+    """
+    return [
+        Drug(
+            prescription_id=prescription.id,
+            user_id=prescription.user_id,
+            trade_name=drug_name,
+            state=drug_info.get('state', ''),
+            start_date=parse_date(drug_info.get('start_date')),
+            end_date=parse_date(drug_info.get('end_date')),
+        )
+        for drug_name, drug_info in (prescription.drugs or {}).items()
+    ]
+
+
+def sync_drug_states(prescription):
+    """
+    Replace the Drug rows of a prescription with rows built from its current drugs JSON.
+
+    Parameters:
+        - prescription (Prescription): The prescription that was saved.
+    """
+    with transaction.atomic():
+        Drug.objects.filter(prescription_id=prescription.id).delete()
+        Drug.objects.bulk_create(drug_state_rows(prescription))
+
+
+def prescriptions_with_state(user_id, states):
+    """
+    Return the prescriptions of a user holding at least one drug in one of the given states.
+
+    Parameters:
+        - user_id (int): The ID of the user.
+        - states (str or iterable): The drug state, or several drug states.
+
+    Returns:
+        - QuerySet: The matching prescriptions, resolved through the indexed Drug table.
+    """
+    if isinstance(states, str):
+        states = [states]
+    prescription_ids = Drug.objects.filter(user_id=user_id, state__in=list(states)).values('prescription_id')
+    return Prescription.objects.filter(user_id=user_id, id__in=prescription_ids)
@@ -0,0 +1,131 @@
+"""
+This file caches the patient home-page payload served by HomePageinfoView.
+Each (user, state) document is stored once in the Django cache, together with its ETag, under a key that
+includes a per-user version stored in HomePageVersion. Bumping the version when the user's prescriptions,
+drug states or profile change, or when a doctor on their prescriptions changes their profile, invalidates
+every cached state at once, in every process: even with a per-process cache, no process reads a document
+of an outdated version.
+Only the drug states a prescription can hold are cached, so arbitrary `state` values cannot fill the cache.
+Documents are stored under the version read before they were built, so a document built from data that
+changed meanwhile lands under a version nobody reads anymore.
+"""
+
+# Import necessary modules and classes
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import HomePageVersion, Prescription
+
+# Drug states whose home pages are cached
+HOME_PAGE_STATES = ('active', 'inactive', 'new')
+
+
+def home_page_cache():
+    """
+    Return the Django cache holding home-page documents.
+
+    - Uses the HOME_PAGE_CACHE alias (the default cache unless configured); multi-process deployments
+      should point it at a shared cache so that each document is built once rather than once per process.
+    """
+    return caches[getattr(settings, 'HOME_PAGE_CACHE', 'default')]
+
+
+def _document_key(user_id, version, state):
+    return f'homepage:{user_id}:{version}:{state}'
+
+
+def compute_etag(data):
+    """
+    Compute the strong ETag of a response payload.
+
+    Parameters:
+        - data: The JSON-serializable payload.
+
+    Returns:
+        - str: The quoted ETag.
+    """
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+
+def home_page_version(user_id):
+    """
+    Return the current home-page version of a user, to be read before building a document.
+
+    Parameters:
+        - user_id (int): The ID of the user.
+
+    Returns:
+        - int: The version, or 0 if the user's home page was never invalidated.
+    """
+    return HomePageVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+def get_home_page(user_id, state, version):
+    """
+    Return the cached home-page document of a user for a drug state.
+
+    Parameters:
+        - user_id (int): The ID of the user.
+        - state (str): The drug state requested.
+        - version: The user's home-page version, as returned by home_page_version().
+
+    Returns:
+        - dict or None: The document with its 'data', 'status' and 'etag', or None if it is not cached.
+    """
+    if state not in HOME_PAGE_STATES:
+        return None
+    return home_page_cache().get(_document_key(user_id, version, state))
+
+
+def set_home_page(user_id, state, version, data, status_code):
+    """
+    Cache the home-page document of a user for a drug state.
+
+    Parameters:
+        - user_id (int): The ID of the user.
+        - state (str): The drug state requested; documents of unknown states are not cached.
+        - version: The user's home-page version read before the payload was built.
+        - data: The response payload.
+        - status_code (int): The response status code.
+
+    Returns:
+        - dict: The document with its 'data', 'status' and 'etag'.
+    """
+    document = {'data': data, 'status': status_code, 'etag': compute_etag(data)}
+    if state in HOME_PAGE_STATES:
+        home_page_cache().set(_document_key(user_id, version, state), document, getattr(settings, 'HOME_PAGE_CACHE_TTL', 600))
+    return document
+
+
+def invalidate_home_page(user_id):
+    """
+    Invalidate every cached home-page document of a user by bumping the user's version.
+
+    Parameters:
+        - user_id (int): The ID of the user.
+    """
+    if not HomePageVersion.objects.filter(user_id=user_id).update(version=F('version') + 1):
+        _, created = HomePageVersion.objects.get_or_create(user_id=user_id, defaults={'version': 1})
+        if not created:
+            # Another process created the row in the meantime
+            HomePageVersion.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+
+def invalidate_doctor_home_pages(doctor_id):
+    """
+    Invalidate the cached home pages of every user with a prescription from a doctor.
+
+    Parameters:
+        - doctor_id (int): The ID of the doctor whose profile changed.
+    """
+    user_ids = set(Prescription.objects.filter(doctor_id=doctor_id).values_list('user_id', flat=True).distinct())
+    HomePageVersion.objects.filter(user_id__in=user_ids).update(version=F('version') + 1)
+    # Users whose home page was never invalidated have no row yet
+    for user_id in user_ids - set(HomePageVersion.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True)):
+        invalidate_home_page(user_id)
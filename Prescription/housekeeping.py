@@ -0,0 +1,121 @@
+"""
+This file contains the housekeeping routines run by the `run_housekeeping` management command.
+Expired sessions are ended with a single indexed UPDATE on (ended, created_at), so the cost of expiring
+sessions does not grow with the size of the session history, and drugs whose end date has passed
+are deactivated across all prescriptions in batches.
+"""
+
+# Import necessary modules and classes
+from datetime import date, datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .drug_states import sync_drug_states
+from .homepage import invalidate_home_page
+from .models import Drug, Prescription, Session
+
+# Sessions end automatically this long after they were started
+SESSION_LIFETIME = timedelta(hours=4)
+
+
+def expire_sessions(now=None):
+    """
+    End every open session that was created more than SESSION_LIFETIME ago.
+
+    - Issues one UPDATE ... WHERE ended = false AND created_at < cutoff, served by the (ended, created_at) index.
+    - Bypasses Session.save() and model signals, as no session state is derived from them.
+
+    Parameters:
+        - now (datetime): The reference time, defaults to the current time.
+
+    Returns:
+        - int: The number of sessions that were ended.
+    """
+    cutoff = (now or timezone.now()) - SESSION_LIFETIME
+    # ended__in keeps an equality predicate on `ended`; ended=False renders as NOT ended on some
+    # backends (e.g. SQLite), which the (ended, created_at) index cannot serve
+    return Session.objects.filter(ended__in=[False], created_at__lt=cutoff).update(ended=True)
+
+
+def deactivate_ended_drugs(drugs, today):
+    """
+    Mark the drugs of a prescription whose end date has passed as inactive.
+
+    Parameters:
+        - drugs (dict): The drugs JSON of a prescription, modified in place.
+        - today (date): The reference date.
+
+    Returns:
+        - list: The trade names of the drugs that were deactivated.
+    """
+    deactivated = []
+    for drug_name, drug_info in drugs.items():
+        end_date_str = drug_info.get('end_date')
+        if not end_date_str or drug_info.get('state') == 'inactive':
+            continue
+        try:
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            # Leave drugs with malformed end dates untouched
+            continue
+        if end_date < today:
+            drug_info['state'] = 'inactive'
+            deactivated.append(drug_name)
+    return deactivated
+
+
+def deactivate_expired_drugs(today=None, batch_size=500):
+    """
+    Deactivate every drug whose end date has passed, across all prescriptions.
+
+    - Finds the prescriptions holding an active or new drug past its end date through the indexed Drug table.
+    - Walks those prescriptions in primary key order, `batch_size` at a time, loading only their drugs.
+    - Locks each batch with SELECT ... FOR UPDATE and writes it with one bulk_update in the same transaction.
+    - Brings the Drug state rows, the owners' interaction matrices and their cached home pages up to date,
+      as bulk_update does not send post_save.
+
+    Parameters:
+        - today (date): The reference date, defaults to the current date.
+        - batch_size (int): The number of prescriptions read and written per batch.
+
+    Returns:
+        - int: The number of drugs that were deactivated.
+    """
+    # Imported here as the Drugs app depends on this app's models
+    from Drugs.matrix import sync_prescription
+
+    today = today or date.today()
+    expired_prescription_ids = Drug.objects.filter(
+        state__in=['active', 'new'], end_date__lt=today
+    ).values('prescription_id')
+
+    deactivated_count = 0
+    last_id = 0
+    while True:
+        # Lock the batch while it is read and written back, so drug changes saved meanwhile are not overwritten
+        with transaction.atomic():
+            batch = list(
+                Prescription.objects.select_for_update()
+                .filter(id__gt=last_id, id__in=expired_prescription_ids)
+                .order_by('id')
+                .only('id', 'user_id', 'drugs')[:batch_size]
+            )
+            if not batch:
+                return deactivated_count
+            last_id = batch[-1].id
+
+            changed = []
+            for prescription in batch:
+                deactivated = deactivate_ended_drugs(prescription.drugs, today)
+                if deactivated:
+                    changed.append(prescription)
+                    deactivated_count += len(deactivated)
+            if not changed:
+                continue
+
+            Prescription.objects.bulk_update(changed, ['drugs'])
+            for prescription in changed:
+                sync_drug_states(prescription)
+                sync_prescription(prescription)
+                invalidate_home_page(prescription.user_id)
@@ -0,0 +1,73 @@
+"""
+This file maintains the normalized ingredient table and the DrugEye→ingredient mapping.
+ScName components are split on '+', stripped and lowercased once, when a DrugEye entry is saved or imported,
+and stored as Ingredient IDs, so requests read ready-made ingredient IDs from the catalog instead of
+splitting and normalizing scientific names again.
+"""
+
+# Import necessary modules and classes
+from django.db import transaction
+
+from Drugs.models import normalize_component
+
+from .models import DrugEyeIngredient, Ingredient
+
+
+def split_ingredients(sc_name):
+    """
+    Split a scientific name into its normalized ingredient names.
+
+    Parameters:
+        - sc_name (str): A DrugEye ScName, e.g. 'Bacitracin + NEOMYCIN'.
+
+    Returns:
+        - list: The distinct, normalized components in ScName order, e.g. ['bacitracin', 'neomycin'].
+    """
+    names = []
+    for component in (sc_name or '').split('+'):
+        name = normalize_component(component)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def ingredient_ids_for(names):
+    """
+    Return the IDs of normalized ingredient names, creating the missing ingredients.
+
+    Parameters:
+        - names (iterable): Normalized ingredient names.
+
+    Returns:
+        - dict: Ingredient IDs keyed by name.
+    """
+    names = set(names)
+    if not names:
+        return {}
+    ids = dict(Ingredient.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = names.difference(ids)
+    if missing:
+        # Another process may create the same ingredients concurrently; read back whatever won
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in missing], ignore_conflicts=True)
+        ids.update(Ingredient.objects.filter(name__in=missing).values_list('name', 'id'))
+    return ids
+
+
+def sync_drug_eye_ingredients(drug_eyes):
+    """
+    Replace the ingredient mapping of DrugEye entries with one computed from their ScName.
+
+    Parameters:
+        - drug_eyes (iterable): (DrugEye primary key, ScName) tuples.
+    """
+    components = {drug_eye_id: split_ingredients(sc_name) for drug_eye_id, sc_name in drug_eyes}
+    if not components:
+        return
+    ids = ingredient_ids_for(name for names in components.values() for name in names)
+    with transaction.atomic():
+        DrugEyeIngredient.objects.filter(drug_eye_id__in=list(components)).delete()
+        DrugEyeIngredient.objects.bulk_create([
+            DrugEyeIngredient(drug_eye_id=drug_eye_id, ingredient_id=ids[name], position=position)
+            for drug_eye_id, names in components.items()
+            for position, name in enumerate(names)
+        ])
@@ -0,0 +1,109 @@
+"""
+Benchmark of the medicine search over a synthetic DrugEye catalog.
+
+The command builds a synthetic catalog in memory (no database access), then reports p50/p99 latency of
+the full-catalog fuzzy scan the search view used to run and of the trigram-indexed search it runs now.
+
+Usage:
+    python manage.py bench_medicine_search --rows 50000 --queries 500
+"""
+
+# Import necessary modules and classes
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from fuzzywuzzy import process
+
+from Prescription.search import DrugSearchIndex
+
+SYLLABLES = ['ba', 'ce', 'di', 'fo', 'gu', 'ha', 'ke', 'li', 'mo', 'nu', 'pa', 're', 'si', 'to', 'vu', 'xa', 'zo', 'tri', 'lex', 'mar']
+FORMS = ['tablets', 'syrup', 'cream', 'f.c. tablets', 'capsules', 'ampoules', 'drops', 'oral suspension']
+INGREDIENTS = ['paracetamol', 'ibuprofen', 'amoxicillin', 'clavulanic acid', 'caffeine', 'metformin',
+               'omeprazole', 'atorvastatin', 'warfarin', 'aspirin', 'diclofenac', 'cetirizine']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark medicine search latency over a synthetic DrugEye catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Size of the synthetic catalog.')
+        parser.add_argument('--queries', type=int, default=500, help='Number of timed indexed searches.')
+        parser.add_argument('--scan-queries', type=int, default=20,
+                            help='Number of timed full-scan searches (the full scan is slow).')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed for the synthetic catalog.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = list(self.synthetic_catalog(rng, options['rows']))
+        trade_names = [trade_name for _, trade_name, _ in rows]
+
+        start = time.perf_counter()
+        index = DrugSearchIndex(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(f'Built trigram index over {len(index)} rows in {build_ms:.1f} ms')
+
+        queries = [self.misspell(rng, rng.choice(trade_names)) for _ in range(options['queries'])]
+
+        scan_times = [self.time_call(self.full_scan, trade_names, query) for query in queries[:options['scan_queries']]]
+        index_times = [self.time_call(self.indexed_search, index, query) for query in queries]
+
+        self.report('full scan', scan_times)
+        self.report('trigram index', index_times)
+
+    def synthetic_catalog(self, rng, size):
+        """
+        Yield (id, TradeName, ScName) tuples for a synthetic catalog.
+        """
+        for drug_id in range(1, size + 1):
+            name = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            trade_name = f'{name.upper()} {rng.randint(1, 1000)}mg {rng.choice(FORMS)}'
+            sc_name = '+'.join(rng.sample(INGREDIENTS, rng.randint(1, 3)))
+            yield drug_id, trade_name, sc_name
+
+    @staticmethod
+    def misspell(rng, trade_name):
+        """
+        Turn a trade name into a realistic query: its first word, with one character dropped half of the time.
+        """
+        word = trade_name.split()[0].lower()
+        if len(word) > 4 and rng.random() < 0.5:
+            position = rng.randrange(len(word))
+            word = word[:position] + word[position + 1:]
+        return word
+
+    @staticmethod
+    def full_scan(trade_names, query):
+        """
+        The previous search: fuzzy-score every trade name and scan them all for the query.
+        """
+        matched = [name for name, _ in process.extract(query, trade_names, limit=1)]
+        query_lower = query.lower()
+        return matched + [name for name in trade_names if query_lower in name.lower()]
+
+    @staticmethod
+    def indexed_search(index, query):
+        """
+        The current search: exact lookup, then fuzzy scoring over trigram candidates and indexed substring matches.
+        """
+        if index.exact_match(query):
+            return [query]
+        return index.fuzzy_matches(query, limit=1) + index.containing(query)
+
+    @staticmethod
+    def time_call(function, *args):
+        """
+        Return the wall time of a call in milliseconds.
+        """
+        start = time.perf_counter()
+        function(*args)
+        return (time.perf_counter() - start) * 1000
+
+    def report(self, label, times):
+        """
+        Print the p50/p99 latency of a list of timings.
+        """
+        ordered = sorted(times)
+        p50 = ordered[round(0.50 * (len(ordered) - 1))]
+        p99 = ordered[round(0.99 * (len(ordered) - 1))]
+        self.stdout.write(f'{label:>14}: p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   ({len(ordered)} queries)')
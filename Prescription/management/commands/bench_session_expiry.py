@@ -0,0 +1,137 @@
+"""
+Benchmark showing how the cost of SessionExpirationMiddleware scales with the size of the Session table.
+
+For each requested table size the command loads synthetic sessions inside a transaction (almost all of them
+already ended, as in a long session history), times the legacy per-row scan the middleware used to run,
+the indexed bulk UPDATE it runs now on every request, and the throttled middleware, then rolls the rows back.
+
+Usage:
+    python manage.py bench_session_expiry --sizes 1000 10000 100000 1000000 --requests 200
+"""
+
+# Import necessary modules and classes
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import override_settings
+from django.utils import timezone
+
+from Prescription.housekeeping import SESSION_LIFETIME
+from Prescription.middleware import SessionExpirationMiddleware
+from Prescription.models import Session
+
+# Share of synthetic sessions that are still open
+OPEN_RATIO = 0.01
+
+
+class Command(BaseCommand):
+    help = 'Benchmark SessionExpirationMiddleware latency against the size of the Session table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000, 1000000],
+                            help='Session table sizes to benchmark.')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Number of requests timed per table size.')
+        parser.add_argument('--legacy-max', type=int, default=10000,
+                            help='Largest table size for which the legacy per-row scan is timed.')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows inserted per bulk_create call.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'rows':>10} {'legacy ms':>10} {'update p50 ms':>14} {'update p99 ms':>14}"
+            f" {'throttled p50 ms':>17} {'throttled p99 ms':>17}"
+        )
+        for size in options['sizes']:
+            legacy_ms, update_times, throttled_times = self.run_size(
+                size, options['requests'], options['legacy_max'], options['batch_size']
+            )
+            legacy = f'{legacy_ms:>10.1f}' if legacy_ms is not None else f"{'-':>10}"
+            self.stdout.write(
+                f"{size:>10} {legacy} {self.percentile(update_times, 50):>14.3f} {self.percentile(update_times, 99):>14.3f}"
+                f" {self.percentile(throttled_times, 50):>17.3f} {self.percentile(throttled_times, 99):>17.3f}"
+            )
+
+    def run_size(self, size, requests, legacy_max, batch_size):
+        """
+        Load `size` synthetic sessions, time the expiry strategies and roll the rows back.
+
+        Returns:
+            - tuple: The legacy scan latency in milliseconds (or None when skipped), and lists of per-request
+              latencies in milliseconds for the unthrottled and throttled middleware.
+        """
+        with transaction.atomic():
+            self.load_rows(size, batch_size)
+
+            legacy_ms = None
+            if size <= legacy_max:
+                start = time.perf_counter()
+                self.legacy_scan()
+                legacy_ms = (time.perf_counter() - start) * 1000
+                # Reopen the sessions the legacy scan ended, so both strategies see the same rows
+                Session.objects.filter(session_id__in=self.open_ids).update(ended=False)
+
+            with override_settings(SESSION_EXPIRY_CHECK_INTERVAL=0):
+                update_times = self.time_requests(SessionExpirationMiddleware(self.get_response), requests)
+            throttled_times = self.time_requests(SessionExpirationMiddleware(self.get_response), requests)
+
+            # Never keep the synthetic rows
+            transaction.set_rollback(True)
+        return legacy_ms, update_times, throttled_times
+
+    def load_rows(self, size, batch_size):
+        """
+        Insert `size` synthetic sessions in batches, all created before the expiry cutoff.
+        """
+        created_at = timezone.now() - SESSION_LIFETIME - timedelta(hours=1)
+        open_every = max(int(1 / OPEN_RATIO), 1)
+        batch = []
+        for index in range(size):
+            batch.append(Session(
+                doctor_id=index % 1000, user_id=index, otp=123456, verified=True,
+                ended=index % open_every != 0, created_at=created_at,
+            ))
+            if len(batch) >= batch_size:
+                Session.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Session.objects.bulk_create(batch)
+        self.open_ids = list(Session.objects.filter(ended=False).values_list('session_id', flat=True))
+
+    def legacy_scan(self):
+        """
+        Run the per-row expiry the middleware used to run on every request.
+        """
+        for session in Session.objects.all():
+            if session.created_at < timezone.now() - SESSION_LIFETIME:
+                session.ended = True
+                session.save()
+
+    def time_requests(self, middleware, requests):
+        """
+        Pass `requests` requests through the middleware.
+
+        Returns:
+            - list: Per-request latencies in milliseconds.
+        """
+        times = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            middleware(None)
+            times.append((time.perf_counter() - start) * 1000)
+        return times
+
+    @staticmethod
+    def get_response(request):
+        return HttpResponse()
+
+    @staticmethod
+    def percentile(values, percent):
+        """
+        Return the nearest-rank percentile of a list of latencies.
+        """
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
@@ -0,0 +1,58 @@
+"""
+Scheduled housekeeping runner.
+
+Every interval the command ends expired prescription sessions with one bulk UPDATE and deactivates
+drugs whose end date has passed across all prescriptions in batches, so request paths no longer do
+this work. Every deployment must run it, as a long-lived process next to the web server (or once from
+cron with --once): SessionExpirationMiddleware is disabled, so nothing else expires sessions.
+
+Usage:
+    python manage.py run_housekeeping --interval 300 --batch-size 500
+    python manage.py run_housekeeping --once
+"""
+
+# Import necessary modules and classes
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Prescription.housekeeping import deactivate_expired_drugs, expire_sessions
+
+
+class Command(BaseCommand):
+    help = 'Periodically expire prescription sessions and deactivate drugs whose end date has passed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=getattr(settings, 'HOUSEKEEPING_INTERVAL', 300),
+                            help='Seconds between housekeeping runs.')
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'HOUSEKEEPING_BATCH_SIZE', 500),
+                            help='Prescriptions read and written per batch.')
+        parser.add_argument('--once', action='store_true', help='Run housekeeping once and exit.')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            try:
+                self.run_once(options['batch_size'])
+            except Exception as exc:
+                # Keep the scheduler alive; the next run retries
+                if options['once']:
+                    raise
+                self.stderr.write(f'Housekeeping run failed: {exc}')
+            finally:
+                # Drop connections the database may have closed between runs
+                close_old_connections()
+
+            if options['once']:
+                return
+            time.sleep(max(options['interval'] - (time.monotonic() - started), 0))
+
+    def run_once(self, batch_size):
+        """
+        Run every housekeeping job once and report what changed.
+        """
+        expired = expire_sessions()
+        deactivated = deactivate_expired_drugs(batch_size=batch_size)
+        self.stdout.write(f'Expired {expired} sessions, deactivated {deactivated} drugs')
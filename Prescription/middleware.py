@@ -1,10 +1,20 @@
 # Import necessary modules
-from django.utils import timezone
-from datetime import timedelta
-from .models import Session
+import threading
+import time
+
+from django.conf import settings
+
+from .housekeeping import expire_sessions
 
 # Middleware class to handle session expiration
 class SessionExpirationMiddleware:
+    """
+    Middleware that ends expired prescription sessions.
+
+    - Expires sessions with a single indexed bulk UPDATE instead of loading and saving every session.
+    - Runs the expiry at most once per SESSION_EXPIRY_CHECK_INTERVAL seconds per process.
+    """
+
     def __init__(self, get_response):
         """
         Initialize the middleware.
@@ -13,6 +23,9 @@ class SessionExpirationMiddleware:
             - get_response: The next middleware or view in the chain.
         """
         self.get_response = get_response
+        self.interval = getattr(settings, 'SESSION_EXPIRY_CHECK_INTERVAL', 60)
+        self.next_check = 0.0
+        self.lock = threading.Lock()
 
     def __call__(self, request):
         """
@@ -25,20 +38,34 @@ class SessionExpirationMiddleware:
             - HttpResponse: The HTTP response generated by the view or subsequent middleware.
         """
         # Perform actions before the view is called
+        self.expire_sessions_if_due()
 
-        # Get all sessions from the database
-        sessions = Session.objects.all()
-        
-        # Iterate over each session and check for expiration
-        for session in sessions:
-            # Check if the session has expired (i.e., created more than 4 hours ago)
-            if session.created_at < timezone.now() - timedelta(hours=4):
-                # Mark the session as ended
-                session.ended = True
-                session.save()  # Save the changes to the session
-        
         # Call the next middleware or view in the chain
         response = self.get_response(request)
         
         # Perform actions after the view is called (if needed)
         return response
+
+    def expire_sessions_if_due(self):
+        """
+        End expired sessions if the check interval has elapsed since the last check in this process.
+
+        Returns:
+            - bool: True if the expiry ran during this call.
+        """
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+
+        # Only one request per interval runs the expiry; concurrent requests skip it
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            if now < self.next_check:
+                return False
+            self.next_check = now + self.interval
+        finally:
+            self.lock.release()
+
+        expire_sessions()
+        return True
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:40
+
+from datetime import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def populate_drug_states(apps, schema_editor):
+    """
+    Build the Drug state rows of every existing prescription.
+    """
+    Prescription = apps.get_model('Prescription', 'Prescription')
+    Drug = apps.get_model('Prescription', 'Drug')
+    batch = []
+    for prescription in Prescription.objects.only('id', 'user_id', 'drugs').iterator(chunk_size=500):
+        for drug_name, drug_info in (prescription.drugs or {}).items():
+            batch.append(Drug(
+                prescription_id=prescription.id,
+                user_id=prescription.user_id,
+                trade_name=drug_name,
+                state=drug_info.get('state', ''),
+                start_date=parse_date(drug_info.get('start_date')),
+                end_date=parse_date(drug_info.get('end_date')),
+            ))
+        if len(batch) >= 2000:
+            Drug.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Drug.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Prescription', '0003_session_session_ended_created_idx'),
+    ]
+
+    operations = [
+        # The previous Drug model was never written to; replace it with the drug state table
+        migrations.DeleteModel(
+            name='Drug',
+        ),
+        migrations.CreateModel(
+            name='Drug',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField()),
+                ('trade_name', models.CharField(max_length=255)),
+                ('state', models.CharField(choices=[('active', 'Active'), ('inactive', 'Inactive'), ('new', 'New')], max_length=100)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('prescription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='drug_states', to='Prescription.prescription')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['user_id', 'state'], name='drug_user_state_idx'),
+                    models.Index(fields=['state', 'end_date'], name='drug_state_end_date_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(populate_drug_states, migrations.RunPython.noop),
+    ]
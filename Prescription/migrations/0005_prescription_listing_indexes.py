@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Prescription', '0004_drug_state_table'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['doctor_id', 'created_at'], name='prescription_doctor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['user_id', 'created_at'], name='prescription_user_idx'),
+        ),
+    ]
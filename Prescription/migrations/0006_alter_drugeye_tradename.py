@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Prescription', '0005_prescription_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='drugeye',
+            name='TradeName',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_ingredients(sc_name):
+    names = []
+    for component in (sc_name or '').split('+'):
+        name = component.strip().lower()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def populate_ingredients(apps, schema_editor):
+    """
+    Build the ingredient table from every DrugEye ScName and DDI drug name, and map DrugEye entries to it.
+    """
+    DrugEye = apps.get_model('Prescription', 'DrugEye')
+    Ingredient = apps.get_model('Prescription', 'Ingredient')
+    DrugEyeIngredient = apps.get_model('Prescription', 'DrugEyeIngredient')
+    DDIInteraction = apps.get_model('Drugs', 'DDIInteraction')
+
+    components = {
+        drug_eye_id: split_ingredients(sc_name)
+        for drug_eye_id, sc_name in DrugEye.objects.values_list('id', 'ScName').iterator()
+    }
+    names = {name for drug_names in components.values() for name in drug_names}
+    for drug1_key, drug2_key in DDIInteraction.objects.values_list('drug1_key', 'drug2_key').iterator():
+        names.update((drug1_key, drug2_key))
+    names.discard('')
+
+    Ingredient.objects.bulk_create([Ingredient(name=name) for name in sorted(names)], batch_size=2000)
+    ids = dict(Ingredient.objects.values_list('name', 'id'))
+    DrugEyeIngredient.objects.bulk_create([
+        DrugEyeIngredient(drug_eye_id=drug_eye_id, ingredient_id=ids[name], position=position)
+        for drug_eye_id, drug_names in components.items()
+        for position, name in enumerate(drug_names)
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Prescription', '0007_catalogversion'),
+        ('Drugs', '0003_canonicalize_ddiinteraction_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DrugEyeIngredient',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('position', models.PositiveSmallIntegerField()),
+                ('drug_eye', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredients', to='Prescription.drugeye')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='drug_eyes', to='Prescription.ingredient')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='drugeyeingredient',
+            constraint=models.UniqueConstraint(fields=('drug_eye', 'position'), name='drugeye_ingredient_position_uniq'),
+        ),
+        migrations.RunPython(populate_ingredients, migrations.RunPython.noop),
+    ]
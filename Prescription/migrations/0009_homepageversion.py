@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Prescription', '0008_ingredients'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HomePageVersion',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('user_id', models.IntegerField(unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -15,7 +15,7 @@ class DrugEye(models.Model):
     id = models.AutoField(primary_key=True)
 
     # Fields to store drug details
-    TradeName = models.CharField(max_length=255)
+    TradeName = models.CharField(max_length=255, db_index=True)
     ID = models.CharField(max_length=255)
     ScName = models.CharField(max_length=255)
     HOWMUCH = models.IntegerField()
@@ -32,6 +32,93 @@ class DrugEye(models.Model):
         return self.TradeName
 
 
+# Django model to stamp versions of reference data such as the DrugEye catalog
+class CatalogVersion(models.Model):
+    """
+    Django model to stamp versions of reference data such as the DrugEye catalog.
+
+    - Inherits from the Django's `models.Model` class.
+    - Holds one row per catalog, whose version is bumped whenever the catalog changes,
+      so that workers holding an in-memory copy know when to reload it.
+    """
+
+    # Primary key field for the model
+    id = models.AutoField(primary_key=True)
+
+    # Fields to store the catalog name and its current version
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """
+        Returns a string representation of the model instance.
+
+        Returns:
+            - str: A string representation of the CatalogVersion instance.
+        """
+        return f"{self.name} v{self.version}"
+
+
+# Django model to represent a normalized active ingredient
+class Ingredient(models.Model):
+    """
+    Django model to represent a normalized active ingredient.
+
+    - Inherits from the Django's `models.Model` class.
+    - Holds one row per distinct ScName component and DDI drug name, stripped and lowercased,
+      so interaction checks can work on small integer IDs instead of strings.
+    """
+
+    # Primary key field for the model
+    id = models.AutoField(primary_key=True)
+
+    # Field to store the normalized ingredient name
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        """
+        Returns a string representation of the model instance.
+
+        Returns:
+            - str: A string representation of the Ingredient instance.
+        """
+        return self.name
+
+
+# Django model to map DrugEye entries to their ingredients
+class DrugEyeIngredient(models.Model):
+    """
+    Django model to map DrugEye entries to their ingredients.
+
+    - Inherits from the Django's `models.Model` class.
+    - Holds one row per component of a DrugEye ScName, in ScName order, computed when the
+      DrugEye entry is saved or imported rather than on every request.
+    """
+
+    # Primary key field for the model
+    id = models.BigAutoField(primary_key=True)
+
+    # Fields to store the DrugEye entry, one of its ingredients and the component's position in ScName
+    drug_eye = models.ForeignKey(DrugEye, on_delete=models.CASCADE, related_name='ingredients')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='drug_eyes')
+    position = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['drug_eye', 'position'], name='drugeye_ingredient_position_uniq'),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the model instance.
+
+        Returns:
+            - str: A string representation of the DrugEyeIngredient instance.
+        """
+        return f"{self.drug_eye_id} -> {self.ingredient_id}"
+
+
 # Django model to represent user sessions
 class Session(models.Model):
     """
@@ -52,21 +139,67 @@ class Session(models.Model):
     ended = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Serves the session expiry UPDATE ... WHERE ended = false AND created_at < cutoff
+            models.Index(fields=['ended', 'created_at'], name='session_ended_created_idx'),
+        ]
+
+
+# Django model to represent prescriptions
+class Prescription(models.Model):
+    """
+    Django model to represent prescriptions.
+
+    - Inherits from the Django's `models.Model` class.
+    - Represents a table in the database to store prescription details.
+    """
+
+    # Primary key field for the model
+    id = models.AutoField(primary_key=True)
+
+    # Foreign key field to relate to Session model
+    session = models.ForeignKey(Session, related_name='prescriptions', on_delete=models.CASCADE)
+
+    # Fields to store prescription details
+    doctor_id = models.IntegerField()
+    user_id = models.IntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    drugs = models.JSONField()  # Assuming drugs are stored as JSON data
+
+    class Meta:
+        indexes = [
+            # Serve the keyset-paginated prescription listings of a doctor and of a user
+            models.Index(fields=['doctor_id', 'created_at'], name='prescription_doctor_idx'),
+            models.Index(fields=['user_id', 'created_at'], name='prescription_user_idx'),
+        ]
+
+    def __str__(self):
+        """
+        Returns a string representation of the model instance.
 
-# Django model to represent drugs prescribed to users
+        Returns:
+            - str: A string representation of the Prescription instance.
+        """
+        return f"Prescription {self.id} for User {self.user_id} by Doctor {self.doctor_id}"
+
+
+# Django model to index the state of every drug prescribed to users
 class Drug(models.Model):
     """
-    Django model to represent drugs prescribed to users.
+    Django model to index the state of every drug prescribed to users.
 
     - Inherits from the Django's `models.Model` class.
-    - Represents a table in the database to store drug prescription details.
+    - Holds one row per drug of a prescription, derived from `Prescription.drugs`, so that
+      state-filtered lookups are indexed SQL instead of scans of the drugs JSON.
+    - Is kept in sync with `Prescription.drugs` by Prescription/drug_states.py on every write.
     """
 
     # Primary key field for the model
     id = models.AutoField(primary_key=True)
 
-    # Foreign key field to relate to DrugEye model
-    DrugEye = models.ForeignKey('DrugEye', on_delete=models.CASCADE)
+    # Foreign key field to relate to the prescription holding the drug
+    prescription = models.ForeignKey(Prescription, related_name='drug_states', on_delete=models.CASCADE)
 
     # Choices for drug state
     STATE_CHOICES = [
@@ -75,42 +208,44 @@ class Drug(models.Model):
         ('new', 'New'),
     ]
 
-    # Fields to store drug prescription details
+    # Fields copied from the prescription and its drugs JSON
+    user_id = models.IntegerField()
+    trade_name = models.CharField(max_length=255)
     state = models.CharField(max_length=100, choices=STATE_CHOICES)
-    start_date = models.DateField()
-    end_date = models.DateField()
-    quantity = models.IntegerField()
-    quantity_unit = models.CharField(max_length=100)
-    rate = models.IntegerField()
-    rate_unit = models.CharField(max_length=100)
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Serves the state-filtered prescription lookups of a user
+            models.Index(fields=['user_id', 'state'], name='drug_user_state_idx'),
+            # Serves the search for drugs whose end date has passed
+            models.Index(fields=['state', 'end_date'], name='drug_state_end_date_idx'),
+        ]
 
-# Django model to represent prescriptions
-class Prescription(models.Model):
+
+# Django model to stamp versions of the cached home pages of users
+class HomePageVersion(models.Model):
     """
-    Django model to represent prescriptions.
+    Django model to stamp versions of the cached home pages of users.
 
     - Inherits from the Django's `models.Model` class.
-    - Represents a table in the database to store prescription details.
+    - Holds one row per user whose home page was invalidated; its version is part of the key of every cached
+      home-page document, so bumping it invalidates the user's documents in every process and cache at once.
     """
 
     # Primary key field for the model
     id = models.AutoField(primary_key=True)
 
-    # Foreign key field to relate to Session model
-    session = models.ForeignKey(Session, related_name='prescriptions', on_delete=models.CASCADE)
-
-    # Fields to store prescription details
-    doctor_id = models.IntegerField()
-    user_id = models.IntegerField()
-    created_at = models.DateTimeField(default=timezone.now)
-    drugs = models.JSONField()  # Assuming drugs are stored as JSON data
+    # Fields to store the user and the version of their home page
+    user_id = models.IntegerField(unique=True)
+    version = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         """
         Returns a string representation of the model instance.
 
         Returns:
-            - str: A string representation of the Prescription instance.
+            - str: A string representation of the HomePageVersion instance.
         """
-        return f"Prescription {self.id} for User {self.user_id} by Doctor {self.doctor_id}"
+        return f"Home page of User {self.user_id} v{self.version}"
@@ -0,0 +1,183 @@
+"""
+This file contains the keyset (cursor) pagination and field projection used by the prescription listing views.
+Pages are ordered by (created_at, id), newest first, and the cursor holds the (created_at, id) of the last
+prescription served, so every page is one indexed range query whatever the length of the history.
+The pagination is written against any (timestamp, id) key, so other listings (e.g. the chat) reuse it.
+"""
+
+# Import necessary modules and classes
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .serializers import PrescriptionSerializer
+
+
+# Keyset pagination over (timestamp, id)
+class TimestampCursorPagination(BasePagination):
+    """
+    Keyset pagination on (`timestamp_field`, id), newest first.
+
+    - Reads the page size from the `page_size` query parameter, bounded by `max_page_size`.
+    - Reads the position from the opaque `cursor` query parameter returned as `next` by the previous page.
+    - Fetches one extra row to know whether a next page exists.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    timestamp_field = 'created_at'
+
+    @property
+    def ordering(self):
+        return (f'-{self.timestamp_field}', '-id')
+
+    def get_page_size(self, request):
+        """
+        Return the requested page size, bounded by `max_page_size`.
+
+        Raises:
+            ValueError: If the page size is not a positive integer.
+        """
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            page_size = 0
+        if page_size <= 0:
+            raise ValueError('Page size must be a positive integer')
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, row):
+        """
+        Encode the position right after a row as an opaque cursor.
+        """
+        position = f'{getattr(row, self.timestamp_field).isoformat()}|{row.id}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        Decode a cursor into the (timestamp, id) position it points after.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        try:
+            timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise ValueError('Invalid cursor')
+        timestamp = parse_datetime(timestamp)
+        if timestamp is None:
+            raise ValueError('Invalid cursor')
+        return timestamp, int(row_id)
+
+    def after_cursor(self, queryset, request):
+        """
+        Return the rows of a queryset that follow the request's cursor, in page order.
+
+        Raises:
+            ValueError: If the cursor is invalid.
+        """
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, row_id = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.timestamp_field}__lt': timestamp}) | Q(**{self.timestamp_field: timestamp, 'id__lt': row_id})
+            )
+        return queryset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return the page of rows following the request's cursor.
+
+        Raises:
+            ValueError: If the cursor or the page size is invalid.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        page = list(self.after_cursor(queryset, request)[:page_size + 1])
+        return self.finish_page(page, page_size)
+
+    def finish_page(self, page, page_size):
+        """
+        Trim a page fetched with one extra row and remember the cursor of the next page, if any.
+        """
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+
+# Keyset pagination of prescriptions
+class PrescriptionCursorPagination(TimestampCursorPagination):
+    """
+    Keyset pagination of prescriptions on (created_at, id), newest first.
+    """
+
+    timestamp_field = 'created_at'
+
+
+def requested_fields(request, allowed_fields):
+    """
+    Return the fields requested through the `fields` query parameter.
+
+    Parameters:
+        - request (Request): The HTTP request, e.g. with `?fields=id,created_at`.
+        - allowed_fields (iterable): The fields that may be requested.
+
+    Returns:
+        - list or None: The requested fields in the serializer's order, or None if all fields are requested.
+
+    Raises:
+        ValueError: If an unknown field is requested.
+    """
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested.difference(allowed_fields)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [field for field in allowed_fields if field in requested]
+
+
+def paginated_prescriptions(request, queryset, view=None):
+    """
+    Serialize one page of prescriptions, restricted to the requested fields.
+
+    - Loads only the requested columns (plus the pagination key) from the database.
+
+    Parameters:
+        - request (Request): The HTTP request, with optional `cursor`, `page_size` and `fields` query parameters.
+        - queryset (QuerySet): The prescriptions to list.
+        - view (APIView): The calling view.
+
+    Returns:
+        - Response: The page as {'next': <url or None>, 'results': [...]}, or a 400 response for invalid parameters.
+    """
+    paginator = PrescriptionCursorPagination()
+    try:
+        fields = requested_fields(request, PrescriptionSerializer.Meta.fields)
+        if fields is not None:
+            queryset = queryset.only(*set(fields) | {'id', 'created_at'})
+        page = paginator.paginate_queryset(queryset, request, view=view)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = PrescriptionSerializer(page, many=True, fields=fields)
+    return paginator.get_paginated_response(serializer.data)
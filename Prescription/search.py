@@ -0,0 +1,225 @@
+"""
+This file contains the in-process index used by the medicine search and autocomplete views.
+The index is built from the in-memory DrugEye catalog (TradeName and ScName) and rebuilt whenever a new catalog version is loaded,
+so a search narrows candidates through trigrams before fuzzy scoring instead of scanning every trade name,
+and prefix completion is a binary search over the sorted trade names.
+"""
+
+# Import necessary modules and classes
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from fuzzywuzzy import process
+
+from .catalog import drug_catalog
+
+# Number of best trigram candidates passed on to fuzzy scoring
+FUZZY_CANDIDATES = 200
+
+
+def trigrams(text):
+    """
+    Split a lowercase string into its set of trigrams.
+
+    Parameters:
+        - text (str): The string to split, already lowercased.
+
+    Returns:
+        - set: The distinct three-character substrings of the string.
+    """
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+# Trigram inverted index over the DrugEye catalog
+class DrugSearchIndex:
+    """
+    Trigram inverted index over the DrugEye catalog.
+
+    - Maps every trigram of TradeName and ScName to the catalog entries containing it.
+    - Resolves case-insensitive exact trade name matches from a dictionary.
+    - Narrows fuzzy matching to the entries sharing the most trigrams with the query.
+    - Resolves case-insensitive substring matches by intersecting trigram postings.
+    - Completes prefixes by binary search over the sorted, lowercased trade names.
+    """
+
+    def __init__(self, rows):
+        """
+        Build the index.
+
+        Parameters:
+            - rows (iterable): (id, TradeName, ScName) tuples, ordered by id.
+        """
+        self.ids = []
+        self.trade_names = []
+        self.trade_names_lower = []
+        self.exact = {}
+        self.postings = {}
+
+        for position, (drug_id, trade_name, sc_name) in enumerate(rows):
+            trade_name_lower = trade_name.lower()
+            self.ids.append(drug_id)
+            self.trade_names.append(trade_name)
+            self.trade_names_lower.append(trade_name_lower)
+            # Keep the first entry for a name, like filter(TradeName__iexact=...).first()
+            self.exact.setdefault(trade_name_lower, drug_id)
+            for trigram in trigrams(trade_name_lower) | trigrams((sc_name or '').lower()):
+                self.postings.setdefault(trigram, array('I')).append(position)
+
+        # Distinct trade names sorted case-insensitively, for prefix completion
+        completions = sorted({(name.lower(), name) for name in self.trade_names})
+        self.completion_keys = [key for key, _ in completions]
+        self.completion_names = [name for _, name in completions]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def exact_match(self, name):
+        """
+        Return the ID of the entry whose trade name matches `name`, ignoring case.
+
+        Parameters:
+            - name (str): The trade name to look up.
+
+        Returns:
+            - int or None: The DrugEye ID, or None if there is no exact match.
+        """
+        return self.exact.get(name.lower())
+
+    def candidates(self, query, limit=FUZZY_CANDIDATES):
+        """
+        Return the positions of the entries sharing the most trigrams with the query.
+
+        Parameters:
+            - query (str): The search query.
+            - limit (int): The maximum number of candidates.
+
+        Returns:
+            - list: Catalog positions, best candidates first.
+        """
+        counts = Counter()
+        for trigram in trigrams(query.lower()):
+            postings = self.postings.get(trigram)
+            if postings:
+                counts.update(postings)
+        return [position for position, _ in counts.most_common(limit)]
+
+    def fuzzy_matches(self, query, limit=1):
+        """
+        Return the trade names that fuzzy-match the query best, scoring only the trigram candidates.
+
+        - Queries shorter than a trigram score the trade names they prefix, or every trade name
+          if none does, as the full scan did.
+
+        Parameters:
+            - query (str): The search query.
+            - limit (int): The number of matches to return.
+
+        Returns:
+            - list: The best matching trade names.
+        """
+        if trigrams(query.lower()):
+            candidate_names = [self.trade_names[position] for position in self.candidates(query)]
+        else:
+            candidate_names, _ = self.complete(query, limit=FUZZY_CANDIDATES)
+            candidate_names = candidate_names or self.trade_names
+        if not candidate_names:
+            return []
+        return [name for name, _ in process.extract(query, candidate_names, limit=limit)]
+
+    def containing(self, query):
+        """
+        Return the trade names containing the query, ignoring case.
+
+        Parameters:
+            - query (str): The search query.
+
+        Returns:
+            - list: The matching trade names, in catalog order.
+        """
+        query_lower = query.lower()
+        query_trigrams = trigrams(query_lower)
+        if not query_trigrams:
+            # Queries shorter than a trigram are matched against the in-memory names
+            positions = range(len(self.trade_names_lower))
+        else:
+            postings = sorted((self.postings.get(trigram, ()) for trigram in query_trigrams), key=len)
+            positions = set(postings[0])
+            for posting in postings[1:]:
+                positions.intersection_update(posting)
+                if not positions:
+                    break
+            positions = sorted(positions)
+        return [
+            self.trade_names[position] for position in positions
+            if query_lower in self.trade_names_lower[position]
+        ]
+
+    def complete(self, prefix, offset=0, limit=10):
+        """
+        Return the trade names starting with a prefix, ignoring case.
+
+        - Finds the range of matching names with two binary searches.
+        - Ranks matches in case-insensitive alphabetical order, so the shortest completions
+          (including an exact match) come first.
+
+        Parameters:
+            - prefix (str): The typed prefix.
+            - offset (int): The number of ranked matches to skip.
+            - limit (int): The maximum number of matches to return.
+
+        Returns:
+            - tuple: The page of matching trade names and the total number of matches.
+        """
+        prefix_lower = prefix.lower()
+        start = bisect_left(self.completion_keys, prefix_lower)
+        end = bisect_left(self.completion_keys, prefix_lower + '\U0010ffff', start)
+        page_start = min(start + offset, end)
+        return self.completion_names[page_start:min(page_start + limit, end)], end - start
+
+
+# Lazily built, process-wide search index
+class SearchIndexHolder:
+    """
+    Holds the process-wide DrugSearchIndex.
+
+    - Builds the index from the in-memory DrugEye catalog on first use.
+    - Rebuilds it lazily whenever the catalog snapshot changes.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Return the search index of the current catalog snapshot, building it if needed.
+
+        Returns:
+            - DrugSearchIndex: The current search index.
+        """
+        snapshot = drug_catalog.get()
+        if self._snapshot is snapshot:
+            return self._index
+
+        # Build under the lock so concurrent requests share a single build
+        with self._lock:
+            if self._snapshot is not snapshot:
+                rows = ((record.id, record.TradeName, record.ScName) for record in snapshot.records)
+                self._index = DrugSearchIndex(rows)
+                self._snapshot = snapshot
+            return self._index
+
+    def invalidate(self):
+        """
+        Drop the search index so that the next search rebuilds it.
+        """
+        with self._lock:
+            self._snapshot = None
+            self._index = None
+
+
+# Shared search index used by the medicine search and autocomplete views in this process
+drug_search_index = SearchIndexHolder()
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from User.models import User
 from rest_framework import serializers
 from .models import *
+from .catalog import resolve_trade_names
 
 class DrugEyeSerializer(serializers.ModelSerializer):
     """
@@ -56,12 +57,22 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         DATE_FORMAT (str): Expected date format for start_date and end_date fields.
 
     Methods:
-        validate_drugs(self, drugs): Validate drugs data and link them with DrugEye model.
+        validate_drugs(self, drugs): Validate drugs data and link them with DrugEye model, using the
+            DrugEye entries passed as `drug_eyes` in the serializer context when available.
         create(self, validated_data): Create a new prescription instance with validated data.
+
+    Accepts an optional `fields` argument listing the fields to serialize, e.g. for field projection.
     """
 
     DATE_FORMAT = '%Y-%m-%d'  # Specify the expected date format
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            # Drop the fields that were not requested
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     def validate_drugs(self, drugs):
         """
         Validate drugs data and link them with DrugEye model.
@@ -75,11 +86,15 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         Raises:
             serializers.ValidationError: If any drug data fails validation.
         """
+        # Reuse the DrugEye entries resolved by the view, or resolve all trade names from the catalog
+        drug_eyes = self.context.get('drug_eyes')
+        if drug_eyes is None:
+            drug_eyes = resolve_trade_names(drugs)
+
         for trade_name, drug_data in drugs.items():
-            try:
-                # Fetch the DrugEye instance based on the trade name
-                drug_eye = DrugEye.objects.get(TradeName=trade_name)
-            except DrugEye.DoesNotExist:
+            # Fetch the DrugEye instance based on the trade name
+            drug_eye = drug_eyes.get(trade_name)
+            if drug_eye is None:
                 raise serializers.ValidationError(f"Drug with trade name '{trade_name}' does not exist.")
 
             # Validate drug data fields
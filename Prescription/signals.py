@@ -0,0 +1,51 @@
+"""
+Signal handlers that keep the DrugEye ingredient mapping and the in-memory DrugEye catalog (and the search
+index built from it) up to date, the Drug state table in sync with the drugs of every
+prescription, and the cached home pages fresh.
+"""
+
+# Import necessary modules and classes
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .drug_states import sync_drug_states
+from .homepage import invalidate_home_page
+from .ingredients import sync_drug_eye_ingredients
+from .models import DrugEye, Prescription
+
+
+@receiver(post_save, sender=DrugEye)
+def sync_drug_eye_ingredient_mapping(sender, instance, **kwargs):
+    """
+    Recompute the ingredients of a DrugEye entry from its ScName after it is saved.
+    Connected before bump_drug_catalog, so the reloaded catalog sees the new mapping.
+    """
+    sync_drug_eye_ingredients([(instance.pk, instance.ScName)])
+
+
+@receiver(post_save, sender=DrugEye)
+@receiver(post_delete, sender=DrugEye)
+def bump_drug_catalog(sender, **kwargs):
+    """
+    Bump the DrugEye catalog version whenever a DrugEye row changes, so every worker reloads its catalog
+    and rebuilds its medicine search index.
+    """
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=Prescription)
+def sync_prescription_drug_states(sender, instance, **kwargs):
+    """
+    Rebuild the Drug state rows of a prescription after it is created or its drugs change.
+    """
+    sync_drug_states(instance)
+
+
+@receiver(post_save, sender=Prescription)
+@receiver(post_delete, sender=Prescription)
+def invalidate_owner_home_page(sender, instance, **kwargs):
+    """
+    Invalidate the cached home pages of a prescription's owner whenever the prescription changes.
+    """
+    invalidate_home_page(instance.user_id)
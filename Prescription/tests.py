@@ -1,3 +1,307 @@
-from django.test import TestCase
+"""
+Tests of the in-memory DrugEye catalog, the medicine search index and the autocomplete endpoint, of the
+Drug state table kept in sync with the drugs of every prescription, of the keyset pagination of prescription
+listings, and of the cached patient home page.
+"""
 
-# Create your tests here.
+from datetime import date, timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from Doctor.models import Doctor
+from User.models import User
+
+from .catalog import CATALOG_LOAD_ATTEMPTS, DrugCatalog, drug_catalog
+from .drug_states import prescriptions_with_state
+from .homepage import home_page_cache, invalidate_doctor_home_pages
+from .models import Drug, DrugEye, HomePageVersion, Prescription, Session
+from .pagination import paginated_prescriptions
+from .search import DrugSearchIndex, drug_search_index
+from .views import DrugAutocompleteView, HomePageinfoView
+
+
+class DrugSearchIndexTests(SimpleTestCase):
+    """
+    The trigram index must find what a fuzzy scan of every trade name finds.
+    """
+
+    def setUp(self):
+        self.index = DrugSearchIndex([
+            (1, 'Panadol', 'Paracetamol'),
+            (2, 'Panadol Extra', 'Paracetamol+Caffeine'),
+            (3, 'Aspocid', 'Aspirin'),
+            (4, 'Zyrtec', 'Cetirizine'),
+        ])
+
+    def test_fuzzy_matches_narrow_through_trigrams(self):
+        self.assertEqual(self.index.fuzzy_matches('panadl'), ['Panadol'])
+        self.assertEqual(self.index.fuzzy_matches('aspirin'), ['Aspocid'])
+
+    def test_fuzzy_matches_queries_shorter_than_a_trigram(self):
+        self.assertEqual(self.index.fuzzy_matches('zy'), ['Zyrtec'])
+        self.assertEqual(self.index.fuzzy_matches('As'), ['Aspocid'])
+        # No trade name starts with the query: every name is scored
+        self.assertEqual(len(self.index.fuzzy_matches('q')), 1)
+
+    def test_containing(self):
+        self.assertEqual(self.index.containing('ADOL'), ['Panadol', 'Panadol Extra'])
+        self.assertEqual(self.index.containing('tec'), ['Zyrtec'])
+        self.assertEqual(self.index.containing('x'), ['Panadol Extra'])
+
+
+class DrugCatalogTests(TestCase):
+    """
+    A catalog loaded while the catalog changes must be reloaded, never kept under the newer version.
+    """
+
+    def setUp(self):
+        DrugEye.objects.create(TradeName='Aspocid', ID='1', ScName='Aspirin', HOWMUCH=10, Unit='tab', CLASSIFICATION='c')
+
+    def test_reloads_when_the_catalog_changes_during_a_load(self):
+        catalog = DrugCatalog()
+        with mock.patch('Prescription.catalog.current_catalog_version', side_effect=[5, 6, 6]), \
+                mock.patch.object(DrugCatalog, '_read', wraps=DrugCatalog._read) as read:
+            snapshot = catalog.get()
+        self.assertEqual([call.args[0] for call in read.call_args_list], [5, 6])
+        self.assertEqual((snapshot.version, snapshot.lookup('Aspocid').ScName), (6, 'Aspirin'))
+
+    def test_keeps_the_version_read_before_a_load_that_never_settles(self):
+        catalog = DrugCatalog()
+        versions = list(range(1, CATALOG_LOAD_ATTEMPTS + 2))
+        with mock.patch('Prescription.catalog.current_catalog_version', side_effect=versions):
+            snapshot = catalog.get()
+        self.assertEqual(snapshot.version, CATALOG_LOAD_ATTEMPTS)
+
+
+class DrugAutocompleteTests(TestCase):
+    """
+    Completions must be the trade names starting with the prefix, ignoring case, ranked alphabetically
+    and paged by offset.
+    """
+
+    trade_names = ['Panadol Night', 'panadol', 'Panadol Extra', 'Panadol', 'Panadrex', 'Pantoloc', 'Aspocid', 'Zyrtec']
+
+    def setUp(self):
+        for position, trade_name in enumerate(self.trade_names):
+            DrugEye.objects.create(
+                TradeName=trade_name, ID=str(position), ScName='Paracetamol', HOWMUCH=10, Unit='tab', CLASSIFICATION='c'
+            )
+        drug_catalog.invalidate()
+        drug_search_index.invalidate()
+        self.factory = APIRequestFactory()
+
+    def get(self, **params):
+        request = self.factory.get('/Prescription/drug_autocomplete/', params)
+        force_authenticate(request, user=User(username='patient'))
+        return DrugAutocompleteView.as_view()(request)
+
+    def test_complete_ranges(self):
+        index = drug_search_index.get()
+        self.assertEqual(
+            index.complete('PANAD', limit=10),
+            (['Panadol', 'panadol', 'Panadol Extra', 'Panadol Night', 'Panadrex'], 5),
+        )
+        self.assertEqual(index.complete('panadol ', limit=10), (['Panadol Extra', 'Panadol Night'], 2))
+        self.assertEqual(index.complete('pan', offset=4, limit=2), (['Panadrex', 'Pantoloc'], 6))
+        self.assertEqual(index.complete('pan', offset=10, limit=2), ([], 6))
+        self.assertEqual(index.complete('zyrtec', limit=10), (['Zyrtec'], 1))
+        self.assertEqual(index.complete('zz', limit=10), ([], 0))
+        self.assertEqual(index.complete('b', limit=10), ([], 0))
+
+    def test_view_pages_by_offset(self):
+        seen = []
+        params = {'prefix': 'pan', 'limit': 4}
+        while True:
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], 6)
+            seen.extend(response.data['results'])
+            if response.data['next_offset'] is None:
+                break
+            params['offset'] = response.data['next_offset']
+        self.assertEqual(seen, ['Panadol', 'panadol', 'Panadol Extra', 'Panadol Night', 'Panadrex', 'Pantoloc'])
+
+    def test_view_rejects_invalid_parameters(self):
+        self.assertEqual(self.get().status_code, 400)
+        self.assertEqual(self.get(prefix='pan', limit='many').status_code, 400)
+        self.assertEqual(self.get(prefix='pan', limit=1000).data['results'], self.get(prefix='pan', limit=50).data['results'])
+
+
+class DrugStateSyncTests(TestCase):
+    """
+    The Drug rows of a prescription must mirror its drugs JSON after every save and delete.
+    """
+
+    def setUp(self):
+        self.session = Session.objects.create(doctor_id=1, user_id=7, otp=1)
+
+    def drug_states(self, prescription):
+        return {
+            drug.trade_name: (drug.state, drug.start_date, drug.end_date)
+            for drug in Drug.objects.filter(prescription=prescription)
+        }
+
+    def test_rows_follow_the_drugs_json(self):
+        prescription = Prescription.objects.create(session=self.session, doctor_id=1, user_id=7, drugs={
+            'Aspocid': {'state': 'active', 'start_date': '2024-01-01', 'end_date': '2024-02-01'},
+            'Marevan': {'state': 'new', 'end_date': 'not a date'},
+        })
+        self.assertEqual(self.drug_states(prescription), {
+            'Aspocid': ('active', date(2024, 1, 1), date(2024, 2, 1)),
+            'Marevan': ('new', None, None),
+        })
+
+        prescription.drugs['Aspocid']['state'] = 'inactive'
+        del prescription.drugs['Marevan']
+        prescription.drugs['Klacid'] = {'state': 'new'}
+        prescription.save()
+        self.assertEqual(self.drug_states(prescription), {
+            'Aspocid': ('inactive', date(2024, 1, 1), date(2024, 2, 1)),
+            'Klacid': ('new', None, None),
+        })
+
+        prescription.delete()
+        self.assertFalse(Drug.objects.exists())
+
+    def test_prescriptions_with_state(self):
+        active = Prescription.objects.create(session=self.session, doctor_id=1, user_id=7, drugs={
+            'Aspocid': {'state': 'active'}, 'Marevan': {'state': 'inactive'},
+        })
+        new = Prescription.objects.create(session=self.session, doctor_id=1, user_id=7, drugs={'Klacid': {'state': 'new'}})
+        Prescription.objects.create(session=self.session, doctor_id=1, user_id=8, drugs={'Aspocid': {'state': 'active'}})
+
+        self.assertEqual(list(prescriptions_with_state(7, 'active')), [active])
+        self.assertEqual(list(prescriptions_with_state(7, 'inactive')), [active])
+        self.assertEqual(set(prescriptions_with_state(7, ['active', 'new'])), {active, new})
+
+        new.drugs['Klacid']['state'] = 'active'
+        new.save()
+        self.assertEqual(set(prescriptions_with_state(7, 'active')), {active, new})
+        self.assertFalse(prescriptions_with_state(7, 'new').exists())
+
+
+class PrescriptionPaginationTests(TestCase):
+    """
+    Walking the pages of a listing must return every prescription once, newest first.
+    """
+
+    def setUp(self):
+        session = Session.objects.create(doctor_id=1, user_id=7, otp=1)
+        now = timezone.now()
+        # Several prescriptions share a creation time, so the id breaks ties across page boundaries
+        for offset in (0, 0, 0, 1, 2, 2, 3):
+            Prescription.objects.create(
+                session=session, doctor_id=1, user_id=7, drugs={}, created_at=now - timedelta(minutes=offset)
+            )
+        self.factory = APIRequestFactory()
+
+    def get_page(self, **params):
+        request = Request(self.factory.get('/prescriptions/', params))
+        return paginated_prescriptions(request, Prescription.objects.filter(user_id=7))
+
+    def test_pages_cover_every_prescription_in_order(self):
+        expected = list(Prescription.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        seen = []
+        params = {'page_size': 2}
+        while True:
+            response = self.get_page(**params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(prescription['id'] for prescription in response.data['results'])
+            if response.data['next'] is None:
+                break
+            params['cursor'] = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        self.assertEqual(seen, expected)
+
+    def test_requested_fields_only(self):
+        response = self.get_page(page_size=1, fields='id,created_at')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'created_at'})
+
+    def test_invalid_parameters(self):
+        for params, error in [
+            ({'cursor': 'not-a-cursor'}, 'Invalid cursor'),
+            ({'page_size': 0}, 'Page size must be a positive integer'),
+            ({'fields': 'bogus'}, 'Unknown fields: bogus'),
+        ]:
+            response = self.get_page(**params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data, {'error': error})
+
+
+class HomePageTests(TestCase):
+    """
+    The home page must answer 304 while the client's ETag is current, and change once the user's
+    prescriptions or doctors change.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            fname='Test', lname='Patient', username='patient', password='x', birthdate=date(1990, 1, 1),
+            email='patient@example.com', phone='1', gender='M',
+        )
+        self.doctor = Doctor.objects.create(
+            fname='Test', lname='Doctor', username='doctor', password='x', birthdate=date(1980, 1, 1),
+            email='doctor@example.com', phone='1', gender='M', license_number='1', specialization='GP',
+            degree='MD', graduation_date=date(2005, 1, 1), university='Cairo',
+        )
+        session = Session.objects.create(doctor_id=self.doctor.id, user_id=self.user.id, otp=1)
+        self.prescription = Prescription.objects.create(
+            session=session, doctor_id=self.doctor.id, user_id=self.user.id,
+            drugs={'Aspocid': {'state': 'active', 'quantity': 1}, 'Marevan': {'state': 'new', 'quantity': 2}},
+        )
+        home_page_cache().clear()
+        self.factory = APIRequestFactory()
+
+    def get(self, state='active', etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        request = self.factory.get('/Prescription/home_page/', {'state': state}, **headers)
+        force_authenticate(request, user=self.user)
+        return HomePageinfoView.as_view()(request)
+
+    def test_unchanged_page_is_not_modified(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([drug['commercial_name'] for drug in response.data[0]['drugs']], ['Aspocid'])
+        etag = response['ETag']
+
+        # Served from the cache: only the version is read
+        with self.assertNumQueries(1):
+            response = self.get(etag=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        other = self.get(state='new')
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other['ETag'], etag)
+
+    def test_prescription_change_invalidates_every_state(self):
+        active_etag, new_etag = self.get()['ETag'], self.get(state='new')['ETag']
+
+        self.prescription.drugs['Marevan']['state'] = 'active'
+        self.prescription.save()
+        response = self.get(etag=active_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([drug['commercial_name'] for drug in response.data[0]['drugs']], ['Aspocid', 'Marevan'])
+        self.assertEqual(self.get(state='new', etag=new_etag).status_code, 404)
+
+    def test_invalidation_is_stored_in_the_database(self):
+        etag = self.get()['ETag']
+        version = HomePageVersion.objects.get(user_id=self.user.id).version
+
+        # Another process changes the doctor's profile: this process's cached document must not be served,
+        # so the page is rebuilt, and still matches the client's copy since the payload is unchanged
+        invalidate_doctor_home_pages(self.doctor.id)
+        self.assertEqual(HomePageVersion.objects.get(user_id=self.user.id).version, version + 1)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.get(etag=etag).status_code, 304)
+
+    def test_unknown_states_are_not_cached(self):
+        self.assertEqual(self.get(state='bogus').status_code, 404)
+        self.assertEqual(caches['default'].get(f'homepage:{self.user.id}:0:bogus'), None)
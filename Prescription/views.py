@@ -11,7 +11,6 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.generics import get_object_or_404
 from rest_framework.exceptions import ValidationError
 
-from .models import DrugEye
 from .serializers import UserSerializerEmail
 from .serializers import DrugEyeSerializer
 from .models import *
@@ -19,23 +18,24 @@ from .models import *
 from User.authentication import CustomTokenAuthentication
 from User.models import User
 
-from Doctor.models import Doctor
-from Doctor.serializers import DoctorSerializer
+from Doctor.profiles import resolve_doctor_cards
 from Doctor.authentication import DoctorCustomTokenAuthentication
 
 from .utils import generate_session_id, generate_otp, validate_session, send_otp,send_custom_email_otp
 from django.utils import timezone
+from django.utils.http import parse_etags
 from datetime import timedelta
 from .serializers import PrescriptionSerializer
+from .search import drug_search_index
+from .drug_states import prescriptions_with_state
+from .homepage import get_home_page, home_page_version, set_home_page
+from .pagination import paginated_prescriptions
+from .catalog import drug_catalog, resolve_trade_names
 
 import json
-from fuzzywuzzy import process
-from django.db.models import Q
 
 from datetime import date,datetime
 
-from background_task import background
-
 # API view to search for medicines by name
 class MedicineSearchView(APIView):
     """
@@ -68,29 +68,80 @@ class MedicineSearchView(APIView):
         if len(query) < 2:
             return Response({'error': 'Query must be at least 2 characters long'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Narrow the catalog through the in-process trigram index
+        search_index = drug_search_index.get()
+
         # Check if there's an exact match for the first word or longest word in the query
         words = query.split()
-        first_word_match = DrugEye.objects.filter(TradeName__iexact=words[0]).first() if words else None
+        first_word_match = search_index.exact_match(words[0]) if words else None
         longest_word_match = max(words, key=len) if words else None
-        exact_match = first_word_match or DrugEye.objects.filter(TradeName__iexact=longest_word_match).first()
+        exact_match_id = first_word_match or (search_index.exact_match(longest_word_match) if longest_word_match else None)
 
-        if exact_match:
+        # Read the matched drugs from the in-memory catalog
+        catalog = drug_catalog.get()
+
+        if exact_match_id and exact_match_id in catalog.by_pk:
             # Serialize the exact match and return the response
-            serializer = DrugEyeSerializer(exact_match)
+            serializer = DrugEyeSerializer(catalog.by_pk[exact_match_id])
             return Response(serializer.data, status=status.HTTP_200_OK)
 
-        # Fetch all drug names from the database
-        all_drug_names = DrugEye.objects.values_list('TradeName', flat=True)
-
-        # Perform fuzzy matching to find the closest match to the user's query
-        matched_names = process.extract(query, all_drug_names, limit=1)
-        # Retrieve drug information for the matched names
-        matched_drugs = DrugEye.objects.filter(Q(TradeName__in=[name for name, _ in matched_names]) | Q(TradeName__icontains=query))
+        # Perform fuzzy matching over the trigram candidates to find the closest match to the user's query
+        matched_names = search_index.fuzzy_matches(query, limit=1)
+        # Retrieve drug information for the matched names and the names containing the query
+        matched_drugs = catalog.named(matched_names + search_index.containing(query))
 
         # Serialize the matched drugs and return the response
         serializer = DrugEyeSerializer(matched_drugs, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
+# API view to autocomplete trade names from a typed prefix
+class DrugAutocompleteView(APIView):
+    """
+    API view to autocomplete drug trade names from a typed prefix.
+
+    - Requires authentication using DoctorCustomTokenAuthentication or CustomTokenAuthentication.
+    - Requires the user to be authenticated.
+    - Handles GET requests with `prefix`, and optional `offset` and `limit` query parameters.
+    - Resolves completions from the in-process sorted trade name index, without querying the database.
+
+    Attributes:
+        permission_classes (list): List containing IsAuthenticated permission class.
+        authentication_classes (list): List containing DoctorCustomTokenAuthentication and CustomTokenAuthentication authentication classes.
+        default_limit (int): Number of completions returned when no limit is given.
+        max_limit (int): Upper bound on the number of completions per page.
+    """
+
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [DoctorCustomTokenAuthentication, CustomTokenAuthentication]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        """
+        GET method to return a ranked page of trade names starting with the prefix.
+
+        Args:
+            request (Request): HTTP request object.
+
+        Returns:
+            Response: JSON response containing the completions, the total number of matches and the next offset.
+        """
+        prefix = request.query_params.get('prefix', '').strip()
+        if not prefix:
+            return Response({'error': 'Prefix is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response({'error': 'Offset and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Resolve the page of completions from the in-process index
+        results, count = drug_search_index.get().complete(prefix, offset=offset, limit=limit)
+        next_offset = offset + len(results) if offset + len(results) < count else None
+
+        return Response({'results': results, 'count': count, 'next_offset': next_offset}, status=status.HTTP_200_OK)
+
 # API view to start a session with a user
 class StartSessionView(APIView):
     """
@@ -273,7 +324,7 @@ class CreatePrescriptionView(APIView):
     - Handles POST requests to create a prescription.
     - Validates session details, including verification, session expiration, and existence.
     - Automatically populates doctor_id, user_id, and session fields in the prescription data.
-    - Fetches scientific name information from DrugEye for each drug in the prescription.
+    - Fetches scientific name information for all drugs in the prescription from the in-memory DrugEye catalog.
     - Validates prescription data and returns appropriate error messages for validation failures.
     - Saves the prescription if all validation passes and returns success response.
 
@@ -294,7 +345,7 @@ class CreatePrescriptionView(APIView):
         - Passes the request object to the serializer context.
         - Automatically populates doctor_id, user_id, and session fields in the prescription data.
         - Checks if a prescription already exists for the session.
-        - Fetches scientific name information from DrugEye for each drug in the prescription.
+        - Fetches scientific name information for all drugs in the prescription from the in-memory DrugEye catalog.
         - Creates a prescription serializer with context and modified data.
         - Validates the prescription data and handles date format errors separately.
         - Saves the prescription and returns the success response with the prescription data.
@@ -340,18 +391,20 @@ class CreatePrescriptionView(APIView):
         if prescription:
             return Response({'error': 'A prescription already exists for this session'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Fetch scientific name from DrugEye and split it into components
+        # Fetch scientific names and their components from the DrugEye catalog for all drugs at once
         drugs_data = request.data.get('drugs', {})
+        drug_eyes = resolve_trade_names(drugs_data)
         for trade_name, drug_data in drugs_data.items():
-            try:
-                drug_eye = DrugEye.objects.get(TradeName=trade_name)
-            except DrugEye.DoesNotExist:
+            drug_eye = drug_eyes.get(trade_name)
+            if drug_eye is None:
                 return Response({'error': f"Drug with trade name '{trade_name}' does not exist."}, status=status.HTTP_400_BAD_REQUEST)
             
             # Add scientific name and its components to the drug data
             drug_data['ScName'] = drug_eye.ScName
-            sc_name_components = drug_eye.ScName.split('+')  # Splitting ScName by '+'
-            drug_data['ScNameComponents'] = sc_name_components
+            drug_data['ScNameComponents'] = list(drug_eye.sc_name_components)  # Split on '+' when the catalog was loaded
+
+        # Share the resolved DrugEye entries with the serializer
+        serializer_context['drug_eyes'] = drug_eyes
 
         # Create prescription serializer with context and modified data
         prescription_serializer = PrescriptionSerializer(data=request.data, context=serializer_context)
@@ -381,7 +434,7 @@ class UpdatePrescriptionView(APIView):
     - Requires the user to be authenticated.
     - Handles PUT requests to update a prescription.
     - Checks if the requesting doctor is authorized to update the prescription.
-    - Fetches scientific name information from DrugEye for each drug in the prescription.
+    - Fetches scientific name information for all drugs in the prescription from the in-memory DrugEye catalog.
     - Validates prescription data and updates the prescription if valid.
 
     Attributes:
@@ -415,26 +468,25 @@ class UpdatePrescriptionView(APIView):
         if prescription.doctor_id != requesting_doctor_id:
             return Response({'error': 'You are not authorized to update this prescription'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Fetch scientific name from DrugEye and split it into components
+        # Fetch scientific names and their components from the DrugEye catalog for all drugs at once
         drugs_data = request.data.get('drugs', {})
+        drug_eyes = resolve_trade_names(drugs_data)
         for trade_name, drug_data in drugs_data.items():
-            try:
-                drug_eye = DrugEye.objects.get(TradeName=trade_name)
-            except DrugEye.DoesNotExist:
+            drug_eye = drug_eyes.get(trade_name)
+            if drug_eye is None:
                 return Response({'error': f"Drug with trade name '{trade_name}' does not exist."}, status=status.HTTP_400_BAD_REQUEST)
             
             # Add scientific name and its components to the drug data
             drug_data['ScName'] = drug_eye.ScName
-            sc_name_components = drug_eye.ScName.split('+')  # Splitting ScName by '+'
-            drug_data['ScNameComponents'] = sc_name_components
+            drug_data['ScNameComponents'] = list(drug_eye.sc_name_components)  # Split on '+' when the catalog was loaded
 
         # Ensure 'state' field is included in request data
         for trade_name, drug_data in drugs_data.items():
             if 'state' not in drug_data:
                 return Response({'error': f"State is required for drug '{trade_name}'"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create serializer instance with partial data update
-        serializer = PrescriptionSerializer(prescription, data=request.data, partial=True)
+        # Create serializer instance with partial data update, sharing the resolved DrugEye entries
+        serializer = PrescriptionSerializer(prescription, data=request.data, partial=True, context={'request': request, 'drug_eyes': drug_eyes})
 
         # Validate and save the updated prescription
         if serializer.is_valid():
@@ -548,6 +600,8 @@ class DoctorPrescriptionsForUserView(APIView):
     - Requires the user to be authenticated.
     - Handles GET requests to retrieve prescriptions.
     - Retrieves prescriptions created by the doctor for the specified user during an active session.
+    - Returns one page at a time, newest first, following the `cursor` and `page_size` query parameters,
+      restricted to the prescription fields listed in the optional `fields` query parameter.
 
     Attributes:
         permission_classes (list): List containing IsAuthenticated permission class.
@@ -585,9 +639,8 @@ class DoctorPrescriptionsForUserView(APIView):
         # Retrieve prescriptions created by the doctor for the specified user during the session
         prescriptions = Prescription.objects.filter(doctor_id=doctor_id, user_id=user_id)
         
-        # Serialize the prescriptions
-        serializer = PrescriptionSerializer(prescriptions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Serialize one page of the prescriptions
+        return paginated_prescriptions(request, prescriptions, view=self)
     
 # API view to retrieve prescriptions of a user that a doctor can see during an active session
 class UserPrescriptionsView(APIView):
@@ -598,6 +651,8 @@ class UserPrescriptionsView(APIView):
     - Requires the user to be authenticated.
     - Handles GET requests to retrieve prescriptions.
     - Retrieves prescriptions based on the active session information.
+    - Returns one page at a time, newest first, following the `cursor` and `page_size` query parameters,
+      restricted to the prescription fields listed in the optional `fields` query parameter.
 
     Attributes:
         permission_classes (list): List containing IsAuthenticated permission class.
@@ -639,9 +694,8 @@ class UserPrescriptionsView(APIView):
             # Doctor is different from the one in the session, return empty queryset
             prescriptions = Prescription.objects.none()
 
-        # Serialize the prescriptions
-        serializer = PrescriptionSerializer(prescriptions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Serialize one page of the prescriptions
+        return paginated_prescriptions(request, prescriptions, view=self)
 
 # API view to retrieve active prescriptions during an active session for a doctor
 class ActivePrescriptionsView(APIView):
@@ -688,20 +742,11 @@ class ActivePrescriptionsView(APIView):
 
         # Retrieve prescriptions based on doctor and session information
         if doctor_id == session.doctor_id:
-            # Doctor is the same as the one in the session, retrieve prescriptions by any doctor
-            prescriptions = Prescription.objects.filter(user_id=session.user_id)
+            # Doctor is the same as the one in the session, retrieve the prescriptions holding an active drug
+            active_prescriptions = prescriptions_with_state(session.user_id, 'active')
         else:
             # Doctor is different from the one in the session, return empty queryset
-            prescriptions = Prescription.objects.none()
-        
-        # Filter prescriptions to get only active ones
-        active_prescriptions = []
-        for prescription in prescriptions:
-            drugs_data = prescription.drugs  # Assuming prescription.drugs is already a dictionary
-            for drug_name, drug_info in drugs_data.items():
-                if drug_info['state'] == 'active':
-                    active_prescriptions.append(prescription)
-                    break  # Break out of the inner loop once an active drug is found
+            active_prescriptions = Prescription.objects.none()
 
         # Serialize the active prescriptions
         serializer = PrescriptionSerializer(active_prescriptions, many=True)
@@ -719,6 +764,8 @@ class DoctorPrescriptionsView(APIView):
     - Requires authentication using DoctorCustomTokenAuthentication.
     - Requires the user to be authenticated.
     - Handles GET requests to retrieve doctor's prescriptions.
+    - Returns one page at a time, newest first, following the `cursor` and `page_size` query parameters,
+      restricted to the prescription fields listed in the optional `fields` query parameter.
 
     Attributes:
         permission_classes (list): List containing IsAuthenticated permission class.
@@ -744,10 +791,8 @@ class DoctorPrescriptionsView(APIView):
         # Retrieve prescriptions created by the doctor
         prescriptions = Prescription.objects.filter(doctor_id=doctor_id)
         
-        # Serialize the prescriptions
-        serializer = PrescriptionSerializer(prescriptions, many=True)
-        
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Serialize one page of the prescriptions
+        return paginated_prescriptions(request, prescriptions, view=self)
     
 """
 Patient
@@ -760,6 +805,8 @@ class PatientPrescriptionsView(APIView):
     - Requires authentication using CustomTokenAuthentication.
     - Requires the user to be authenticated.
     - Handles GET requests to retrieve patient's prescriptions.
+    - Returns one page at a time, newest first, following the `cursor` and `page_size` query parameters,
+      restricted to the prescription fields listed in the optional `fields` query parameter.
 
     Attributes:
         permission_classes (list): List containing IsAuthenticated permission class.
@@ -785,10 +832,8 @@ class PatientPrescriptionsView(APIView):
         # Retrieve prescriptions associated with the patient
         prescriptions = Prescription.objects.filter(user_id=user_id)
         
-        # Serialize the prescriptions
-        serializer = PrescriptionSerializer(prescriptions, many=True)
-        
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Serialize one page of the prescriptions
+        return paginated_prescriptions(request, prescriptions, view=self)
 
 ## Activate APIS
 # View for activating drugs in a prescription.
@@ -1200,17 +1245,8 @@ class ActivePrescriptionsForUserView(APIView):
         # Retrieve the 'state' query parameter from the request, default to 'active' if not provided
         state = request.query_params.get('state', 'active')
         
-        # Retrieve all prescriptions for the user
-        prescriptions = Prescription.objects.filter(user_id=user_id)
-
-         # Filter prescriptions based on the specified state
-        filtered_prescriptions = []
-        for prescription in prescriptions:
-            drugs_data = prescription.drugs  # Assuming prescription.drugs is already a dictionary
-            for drug_name, drug_info in drugs_data.items():
-                if drug_info.get('state') == state:
-                    filtered_prescriptions.append(prescription)
-                    break  # Break out of the inner loop once a prescription is found
+        # Retrieve the prescriptions holding a drug in the specified state
+        filtered_prescriptions = prescriptions_with_state(user_id, state)
         
         # Serialize the filtered prescriptions
         serializer = PrescriptionSerializer(filtered_prescriptions, many=True)
@@ -1238,19 +1274,22 @@ class PatientPrescriptionsDoctorInfoView(APIView):
         # Serialize the prescriptions
         prescription_serializer = PrescriptionSerializer(prescriptions, many=True)
         
+        # Resolve the doctors of all prescriptions at once
+        doctor_cards = resolve_doctor_cards(prescription_data.get('doctor_id') for prescription_data in prescription_serializer.data)
+
         # Extract doctor information for each prescription
         formatted_data = []
         for prescription_data in prescription_serializer.data:
             prescription_id = prescription_data['id']
             doctor_id = prescription_data.get('doctor_id')
             if doctor_id:
-                doctor = Doctor.objects.filter(id=doctor_id).first()
+                doctor = doctor_cards.get(doctor_id)
                 if doctor:
                     doctor_info = {
-                        'id': doctor.id,
-                        'fname': doctor.fname,
-                        'lname': doctor.lname,
-                        'image': doctor.image.url if doctor.image else None
+                        'id': doctor['id'],
+                        'fname': doctor['fname'],
+                        'lname': doctor['lname'],
+                        'image': doctor['image']
                     }
                     formatted_item = {
                         'id': prescription_id,
@@ -1297,34 +1336,28 @@ class ActivePrescriptionsForUserDoctorinfoView(APIView):
         # Retrieve the 'state' query parameter from the request, default to 'active' if not provided
         state = request.query_params.get('state', 'active')
         
-        # Retrieve all prescriptions for the user
-        prescriptions = Prescription.objects.filter(user_id=user_id)
-
-        # Filter prescriptions based on the specified state
-        filtered_prescriptions = []
-        for prescription in prescriptions:
-            drugs_data = prescription.drugs  # Assuming prescription.drugs is already a dictionary
-            for drug_name, drug_info in drugs_data.items():
-                if drug_info.get('state') == state:
-                    filtered_prescriptions.append(prescription)
-                    break  # Break out of the inner loop once a prescription is found
+        # Retrieve the prescriptions holding a drug in the specified state
+        filtered_prescriptions = prescriptions_with_state(user_id, state)
         
         # Serialize the filtered prescriptions
         prescription_serializer = PrescriptionSerializer(filtered_prescriptions, many=True)
         
+        # Resolve the doctors of all prescriptions at once
+        doctor_cards = resolve_doctor_cards(prescription_data.get('doctor_id') for prescription_data in prescription_serializer.data)
+
         # Extract doctor information for each prescription
         formatted_data = []
         for prescription_data in prescription_serializer.data:
             prescription_id = prescription_data['id']
             doctor_id = prescription_data.get('doctor_id')
             if doctor_id:
-                doctor = Doctor.objects.filter(id=doctor_id).first()
+                doctor = doctor_cards.get(doctor_id)
                 if doctor:
                     doctor_info = {
-                        'id': doctor.id,
-                        'fname': doctor.fname,
-                        'lname': doctor.lname,
-                        'image': doctor.image.url if doctor.image else None
+                        'id': doctor['id'],
+                        'fname': doctor['fname'],
+                        'lname': doctor['lname'],
+                        'image': doctor['image']
                     }
                     formatted_item = {
                         'id': prescription_id,
@@ -1346,6 +1379,8 @@ class HomePageinfoView(APIView):
     - Requires authentication using CustomTokenAuthentication.
     - Requires the user to be authenticated.
     - Handles GET requests to retrieve active prescriptions for the user.
+    - Serves the payload from a per-(user, state) cached document, with an ETag so that unchanged
+      payloads are answered with 304 Not Modified and no body.
 
     Attributes:
         permission_classes (list): List containing IsAuthenticated permission class.
@@ -1367,38 +1402,68 @@ class HomePageinfoView(APIView):
         """
         # Obtain the user ID from the authenticated user
         user_id = request.user.id
-        user_first_name = request.user.fname
 
         # Retrieve the 'state' query parameter from the URL, default to 'active' if not provided
         state = request.query_params.get('state', 'active')
 
-        # Retrieve all prescriptions for the user
-        prescriptions = Prescription.objects.filter(user_id=user_id)
+        # Serve the cached document, building and caching it if needed; the version is read first so a
+        # document built while the user's data changes is cached under the outdated version
+        version = home_page_version(user_id)
+        document = get_home_page(user_id, state, version)
+        if document is None:
+            data, status_code = self.build_payload(request.user, state)
+            document = set_home_page(user_id, state, version, data, status_code)
+
+        # Answer 304 with no body if the client already holds this version
+        etag = document['etag']
+        client_etags = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in client_etags or '*' in client_etags:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(document['data'], status=document['status'])
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def build_payload(self, user, state):
+        """
+        Build the home-page payload of a user for a drug state.
 
-        # Filter prescriptions based on the specified state
-        filtered_prescriptions = []
-        for prescription in prescriptions:
-            drugs_data = prescription.drugs  # Assuming prescription.drugs is already a dictionary
-            for drug_name, drug_info in drugs_data.items():
-                if drug_info.get('state') == state:
-                    filtered_prescriptions.append(prescription)
-                    break  # Break out of the inner loop once a prescription is found
+        Args:
+            user (User): The authenticated user.
+            state (str): The drug state requested.
+
+        Returns:
+            tuple: The response payload and its status code.
+        """
+        user_id = user.id
+        user_first_name = user.fname
+
+        # Retrieve the prescriptions holding a drug in the specified state
+        filtered_prescriptions = prescriptions_with_state(user_id, state)
         
         # Serialize the filtered prescriptions
         prescription_serializer = PrescriptionSerializer(filtered_prescriptions, many=True)
         
+        # Resolve the doctors of all prescriptions at once, bypassing the per-process card cache, which may
+        # still hold a card another process has invalidated, since the page is shared by every process
+        doctor_cards = resolve_doctor_cards(
+            (prescription_data.get('doctor_id') for prescription_data in prescription_serializer.data),
+            use_cache=False,
+        )
+
         # Create a dictionary to group user data by user ID
         user_data_dict = {}
         for prescription_data in prescription_serializer.data:
             doctor_id = prescription_data.get('doctor_id')
             if doctor_id:
-                doctor = Doctor.objects.filter(id=doctor_id).first()
+                doctor = doctor_cards.get(doctor_id)
                 if doctor:
                     # Format doctor information
                     doctor_info = {
-                        'id': doctor.id,
-                        'image': doctor.image.url if doctor.image else None,
-                        'username': doctor.username  # Assuming doctor has a username field
+                        'id': doctor['id'],
+                        'image': doctor['image'],
+                        'username': doctor['username']
                     }
 
                     # Extract drugs information for the prescription based on state
@@ -1423,9 +1488,9 @@ class HomePageinfoView(APIView):
         formatted_data = list(user_data_dict.values())
 
         if formatted_data:
-            return Response(formatted_data, status=status.HTTP_200_OK)
+            return formatted_data, status.HTTP_200_OK
         else:
-            return Response({'message': f'No {state} prescriptions found'}, status=status.HTTP_404_NOT_FOUND)
+            return {'message': f'No {state} prescriptions found'}, status.HTTP_404_NOT_FOUND
 
 # end session
 class EndSessionView(APIView):
@@ -1,13 +1,30 @@
 """
 The following class defines a custom token authentication mechanism.
+Authenticated (user, token) pairs are cached by access token for a short TTL in the shared cache named by
+AUTH_TOKEN_SHARED_CACHE, so repeated requests with the same token need no queries; User/signals.py drops
+entries on logout, refresh and password changes, for every process at once. Without a shared cache, tokens
+are not cached, as a revoked token would stay valid in the other processes until it expired.
 """
 
 # Import necessary modules and classes
+import copy
+
+from django.conf import settings
 from django.contrib.auth.backends import BaseBackend
 from rest_framework.authentication import BaseAuthentication, get_authorization_header
 from rest_framework.exceptions import AuthenticationFailed
 from .models import CustomToken
 from django.contrib.auth import get_user_model
+from PharmaLink.caching import TieredCache
+
+# Cache of access token -> (user, custom token) for authenticated patients
+token_cache = TieredCache(
+    'auth.patient',
+    ttl=getattr(settings, 'AUTH_TOKEN_CACHE_TTL', 30),
+    shared_alias=getattr(settings, 'AUTH_TOKEN_SHARED_CACHE', None),
+    # Tokens are revocable: keep them only where a logout or refresh in any process can drop them
+    shared_only=True,
+)
 
 # Custom token authentication class
 class CustomTokenAuthentication(BaseAuthentication):
@@ -20,6 +37,7 @@ class CustomTokenAuthentication(BaseAuthentication):
     - Checks the authorization header for the presence of the custom token keyword.
     - Decodes and retrieves the token from the header, then validates it against stored custom tokens.
     - Retrieves the associated user based on the token's email.
+    - Serves repeated authentications of the same token from a short-TTL cache without querying the database.
     - Raises AuthenticationFailed exceptions for various error scenarios, such as invalid token header, missing credentials, invalid token, or invalid user.
     - Implements the authenticate_header() method to specify the authentication header keyword.
     """
@@ -41,9 +59,22 @@ class CustomTokenAuthentication(BaseAuthentication):
             # Invalid token header. Token string should not contain spaces.
             raise AuthenticationFailed('Invalid token header. Token string should not contain spaces.')
 
+        # Decode the token from the header
+        token = auth_header[1].decode()
+        return self.authenticate_credentials(token)
+
+    def authenticate_credentials(self, token):
+        """
+        Method to resolve an access token to its user, e.g. from a request header or a socket handshake.
+        """
+        # Serve recently authenticated tokens from the cache, handing out copies so requests never share instances
+        cached = token_cache.get(token)
+        if cached is not None:
+            user, custom_token = cached
+            return (copy.copy(user), copy.copy(custom_token))
+
         try:
-            # Decode and retrieve the token from the header
-            token = auth_header[1].decode()
+            # Retrieve the token through the indexed access_token column
             custom_token = CustomToken.objects.get(access_token=token)
         except CustomToken.DoesNotExist:
             # Invalid token
@@ -58,7 +89,8 @@ class CustomTokenAuthentication(BaseAuthentication):
             # Invalid user
             raise AuthenticationFailed('Invalid user')
 
-        # Return the authenticated user and the custom token
+        # Cache copies of the authenticated user and the custom token, then return them
+        token_cache.set(token, (copy.copy(user), copy.copy(custom_token)))
         return (user, custom_token)
     
     def authenticate_header(self, request):
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0008_customtoken_access_token_customtoken_refresh_token'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customtoken',
+            name='access_token',
+            field=models.CharField(blank=True, db_index=True, max_length=255),
+        ),
+    ]
@@ -116,7 +116,7 @@ class CustomToken(models.Model):
     key = models.CharField(max_length=64, unique=True, blank=True)
     user = models.ForeignKey(User, related_name='custom_tokens', on_delete=models.CASCADE)
     email = models.EmailField()
-    access_token = models.CharField(max_length=255, blank=True)
+    access_token = models.CharField(max_length=255, blank=True, db_index=True)
     refresh_token = models.CharField(max_length=255, blank=True)
     created = models.DateTimeField(auto_now_add=True)
 
@@ -0,0 +1,45 @@
+"""
+Signal handlers that drop cached patient authentications when their token or their account changes,
+i.e. on login (token replaced), token refresh, logout (token deleted) and password reset.
+"""
+
+# Import necessary modules and classes
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import token_cache
+from .models import CustomToken, User
+
+
+@receiver(pre_save, sender=CustomToken)
+def remember_replaced_access_token(sender, instance, **kwargs):
+    """
+    Remember the access token a CustomToken had before it is saved, so that a replaced token is uncached too.
+    """
+    if instance.pk:
+        instance._previous_access_token = (
+            CustomToken.objects.filter(pk=instance.pk).values_list('access_token', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=CustomToken)
+@receiver(post_delete, sender=CustomToken)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """
+    Drop the cached authentication of a CustomToken's current and previous access tokens.
+    """
+    for access_token in (instance.access_token, getattr(instance, '_previous_access_token', None)):
+        if access_token:
+            token_cache.delete(access_token)
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user_tokens(sender, instance, created, **kwargs):
+    """
+    Drop the cached authentications of every token of a user whose account changed, e.g. after a password reset.
+    """
+    if created:
+        return
+    for access_token in CustomToken.objects.filter(user_id=instance.pk).values_list('access_token', flat=True):
+        if access_token:
+            token_cache.delete(access_token)
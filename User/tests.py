@@ -1,3 +1,73 @@
+"""
+Tests of the cached patient token authentication: cached tokens must stop authenticating as soon as they
+are revoked, and nothing is cached without a shared cache.
+"""
+
+from datetime import date
+from unittest import mock
+
+from django.core.cache import caches
 from django.test import TestCase
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CustomTokenAuthentication, token_cache
+from .models import CustomToken, User
+
+
+class TokenCacheTests(TestCase):
+    """
+    Logout, token refresh and account changes must drop cached authentications.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(
+            fname='Test', lname='Patient', username='patient', password='x', birthdate=date(1990, 1, 1),
+            email='patient@example.com', phone='1', gender='M',
+        )
+        self.token = CustomToken.objects.create(user=self.user, email=self.user.email, access_token='access-1')
+        self.authentication = CustomTokenAuthentication()
+
+        # The default cache stands in for the shared cache every process would see
+        caches['default'].clear()
+        patcher = mock.patch.object(token_cache, 'shared_alias', 'default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def assert_rejected(self, access_token):
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(access_token)
+
+    def test_repeated_authentication_is_served_from_the_cache(self):
+        user, token = self.authentication.authenticate_credentials('access-1')
+        self.assertEqual((user, token), (self.user, self.token))
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials('access-1')
+        self.assertEqual((user, token), (self.user, self.token))
+
+    def test_logout_revokes_cached_token(self):
+        self.authentication.authenticate_credentials('access-1')
+        self.token.delete()
+        self.assert_rejected('access-1')
+
+    def test_refresh_revokes_previous_cached_token(self):
+        self.authentication.authenticate_credentials('access-1')
+        self.token.access_token = 'access-2'
+        self.token.save()
+        self.assert_rejected('access-1')
+        self.assertEqual(self.authentication.authenticate_credentials('access-2')[1], self.token)
+
+    def test_account_change_drops_cached_tokens(self):
+        self.authentication.authenticate_credentials('access-1')
+        self.user.fname = 'Renamed'
+        self.user.save()
+        with self.assertNumQueries(2):
+            user, _ = self.authentication.authenticate_credentials('access-1')
+        self.assertEqual(user.fname, 'Renamed')
 
-# Create your tests here.
+    def test_nothing_is_cached_without_a_shared_cache(self):
+        with mock.patch.object(token_cache, 'shared_alias', None):
+            self.authentication.authenticate_credentials('access-1')
+            with self.assertNumQueries(2):
+                self.authentication.authenticate_credentials('access-1')
+            self.token.delete()
+            self.assert_rejected('access-1')
@@ -24,6 +24,7 @@ from django.core.mail import send_mail
 from rest_framework.generics import UpdateAPIView
 from django.core.exceptions import ObjectDoesNotExist
 from rest_framework_simplejwt.tokens import RefreshToken
+from Prescription.homepage import invalidate_home_page
 
 # View for user signup
 class UserSignupView(generics.CreateAPIView):
@@ -398,7 +399,10 @@ class UserUpdateView(generics.UpdateAPIView):
         """
         Saves the updated user data.
         """
-        serializer.save()
+        user = serializer.save()
+
+        # The home page shows the user's first name
+        invalidate_home_page(user.id)
 
 # View for password reset request
 class PasswordResetRequestView(GenericAPIView):
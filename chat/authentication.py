@@ -0,0 +1,62 @@
+"""
+This file authenticates chat sockets with the same PatientCustomToken/DoctorCustomToken scheme as the REST API.
+The credentials are read once, during the handshake, from the `Authorization` header or, for clients that
+cannot set headers on a WebSocket (e.g. browsers), from a `token` query string parameter holding the same value,
+and resolved through the authentication classes, so repeated connects are served from their token cache.
+"""
+
+# Import necessary modules and classes
+from urllib.parse import parse_qs
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from Doctor.authentication import DoctorCustomTokenAuthentication
+from User.authentication import CustomTokenAuthentication
+
+# Authentication classes tried for a socket, with the kind of principal each one resolves
+SOCKET_AUTHENTICATORS = (
+    ('user', CustomTokenAuthentication()),
+    ('doctor', DoctorCustomTokenAuthentication()),
+)
+
+
+def socket_credentials(scope):
+    """
+    Read the credentials of a socket handshake.
+
+    Parameters:
+        - scope (dict): The ASGI connection scope.
+
+    Returns:
+        - list: The credentials split on whitespace, e.g. ['PatientCustomToken', '<token>'], or an empty list.
+    """
+    for name, value in scope.get('headers', ()):
+        if name.lower() == b'authorization':
+            return value.decode('latin-1').split()
+    params = parse_qs(scope.get('query_string', b'').decode())
+    return params.get('token', [''])[0].split()
+
+
+def authenticate_socket(scope):
+    """
+    Authenticate a socket handshake.
+
+    Parameters:
+        - scope (dict): The ASGI connection scope.
+
+    Returns:
+        - tuple or None: The kind of principal ('user' or 'doctor') and the authenticated User or Doctor,
+          or None if the credentials are missing or invalid.
+    """
+    credentials = socket_credentials(scope)
+    if len(credentials) != 2:
+        return None
+    keyword, token = credentials
+    for kind, authenticator in SOCKET_AUTHENTICATORS:
+        if keyword.lower() == authenticator.keyword.lower():
+            try:
+                principal, _ = authenticator.authenticate_credentials(token)
+            except AuthenticationFailed:
+                return None
+            return kind, principal
+    return None
@@ -0,0 +1,247 @@
+"""
+This file contains the per-worker write-behind buffer of chat messages.
+Consumers enqueue validated, unsaved Chat rows and acknowledge them right away; the buffer writes the rows
+with a single bulk_create once CHAT_WRITE_BUFFER_SIZE messages are pending or CHAT_WRITE_BUFFER_FLUSH_MS
+milliseconds after the first pending message, updates the conversations of their participants in the same
+transaction, then delivers the saved messages (with their IDs) to the receivers' groups. On backends that do
+not return the IDs of bulk-inserted rows, the rows are saved one by one instead. Rows that cannot be written
+because of an unexpected error are put back at the head of the queue and retried on the next flush. Pending
+rows are flushed when a socket disconnects and when the process exits; rows still pending when the process is
+killed outright are lost.
+"""
+
+# Import necessary modules and classes
+import asyncio
+import atexit
+import logging
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+
+from chat.conversations import record_messages
+from chat.models import Chat
+
+logger = logging.getLogger(__name__)
+
+
+def message_payload(chat_message):
+    """
+    Return a saved message as a JSON-serializable dictionary.
+    """
+    return {
+        'id': chat_message.id,
+        'message': chat_message.message,
+        'sender_user_id': chat_message.sender_user_id,
+        'sender_doctor_id': chat_message.sender_doctor_id,
+        'receiver_user_id': chat_message.receiver_user_id,
+        'receiver_doctor_id': chat_message.receiver_doctor_id,
+        'timestamp': chat_message.timestamp.isoformat(),
+    }
+
+
+# Write-behind buffer of chat messages
+class ChatWriteBuffer:
+    """
+    Per-process write-behind buffer of chat messages.
+
+    - Collects unsaved Chat rows with the groups of their receiver and sender.
+    - Writes them with one bulk_create every `batch_size` messages or `flush_interval` seconds, whichever comes first,
+      and updates the Conversation rows of their participants in the same transaction.
+    - Falls back to row-by-row saves if a batch fails, so one bad row (e.g. a deleted receiver) does not drop the others,
+      and on backends whose bulk_create does not set the primary keys of the saved rows.
+    - Puts the rows it could not write back in the queue if the database fails unexpectedly, instead of dropping them.
+    - Delivers saved messages to their receivers and reports rows that could not be saved to their senders.
+    - Keeps queue depth and flush latency metrics, returned by `stats()`.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=0.05):
+        """
+        Initialize the buffer.
+
+        Parameters:
+            - batch_size (int): The number of pending messages that triggers a flush.
+            - flush_interval (float): The number of seconds a message waits at most before a flush.
+        """
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+        self._timer_loop = None
+        self._max_depth = 0
+        self._flushes = 0
+        self._flushed = 0
+        self._failed = 0
+        self._requeued = 0
+        self._flush_seconds = 0.0
+        self._last_flush_seconds = 0.0
+        self._max_flush_seconds = 0.0
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def add(self, chat_message, receiver_group, sender_group):
+        """
+        Enqueue an unsaved message, flushing the buffer if it is full or scheduling a flush otherwise.
+
+        Parameters:
+            - chat_message (Chat): The validated, unsaved message.
+            - receiver_group (str): The channel-layer group the saved message is delivered to.
+            - sender_group (str): The channel-layer group told if the message cannot be saved.
+        """
+        with self._lock:
+            self._pending.append((chat_message, receiver_group, sender_group))
+            depth = len(self._pending)
+            self._max_depth = max(self._max_depth, depth)
+
+        if depth >= self.batch_size:
+            # Flushing inline also slows down the senders while the database catches up
+            await self.flush()
+            return
+
+        loop = asyncio.get_running_loop()
+        if self._timer is None or self._timer_loop is not loop:
+            self._timer_loop = loop
+            self._timer = loop.call_later(self.flush_interval, lambda: loop.create_task(self.flush()))
+
+    async def flush(self):
+        """
+        Save every pending message and deliver the saved ones.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        saved, failed = await database_sync_to_async(self.flush_sync)()
+        if self._pending and self._timer is None:
+            # Retry the rows put back after a failed flush
+            loop = asyncio.get_running_loop()
+            self._timer_loop = loop
+            self._timer = loop.call_later(self.flush_interval, lambda: loop.create_task(self.flush()))
+
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        for chat_message, receiver_group, _ in saved:
+            await channel_layer.group_send(
+                receiver_group, {'type': 'chat.message', 'chat': message_payload(chat_message)}
+            )
+        for chat_message, _, sender_group in failed:
+            await channel_layer.group_send(sender_group, {
+                'type': 'chat.error',
+                'error': f'Message could not be saved: {chat_message.message}',
+            })
+
+    def flush_sync(self):
+        """
+        Save every pending message. Called from a worker thread, or directly at process exit.
+
+        Returns:
+            - tuple: The saved and the failed (message, receiver group, sender group) entries.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return [], []
+
+        start = time.perf_counter()
+        saved, failed = [], []
+        try:
+            if connection.features.can_return_rows_from_bulk_insert:
+                try:
+                    with transaction.atomic():
+                        messages = Chat.objects.bulk_create([chat_message for chat_message, _, _ in batch])
+                        record_messages(messages)
+                    saved = batch
+                except DatabaseError:
+                    self.save_each(batch, saved, failed)
+            else:
+                # Without the IDs of the new rows, neither the conversations nor the receivers can reference them
+                self.save_each(batch, saved, failed)
+        except Exception:
+            logger.exception('Chat write buffer flush failed; requeueing the unsaved messages')
+            self.requeue(batch, saved, failed)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._flushes += 1
+            self._flushed += len(saved)
+            self._failed += len(failed)
+            self._flush_seconds += elapsed
+            self._last_flush_seconds = elapsed
+            self._max_flush_seconds = max(self._max_flush_seconds, elapsed)
+        return saved, failed
+
+    @staticmethod
+    def save_each(batch, saved, failed):
+        """
+        Save the messages of a batch one by one, appending each entry to `saved` or `failed` as it is done.
+        Rows rejected by an integrity constraint are failed; any other error is raised, leaving the rest unsaved.
+        """
+        # Imported here because the consumers module imports this one
+        from chat.consumers import receiver_cache
+
+        for entry in batch:
+            chat_message = entry[0]
+            chat_message.pk = None
+            try:
+                with transaction.atomic():
+                    chat_message.save()
+                    record_messages([chat_message])
+                saved.append(entry)
+            except IntegrityError:
+                # The receiver was most likely deleted while cached
+                if chat_message.receiver_user_id:
+                    receiver_cache.delete(('user', chat_message.receiver_user_id))
+                else:
+                    receiver_cache.delete(('doctor', chat_message.receiver_doctor_id))
+                failed.append(entry)
+
+    def requeue(self, batch, saved, failed):
+        """
+        Put the entries of a batch that were neither saved nor failed back at the head of the queue.
+        """
+        done = {id(entry) for entry in saved} | {id(entry) for entry in failed}
+        unsaved = [entry for entry in batch if id(entry) not in done]
+        for chat_message, _, _ in unsaved:
+            chat_message.pk = None
+        with self._lock:
+            self._pending[:0] = unsaved
+            self._requeued += len(unsaved)
+
+    def stats(self):
+        """
+        Return the queue depth and flush metrics of this process.
+
+        Returns:
+            - dict: The current and maximum queue depth, the number of flushes, saved, failed and requeued
+              messages, and the last, mean and maximum flush latency in milliseconds.
+        """
+        with self._lock:
+            return {
+                'queue_depth': len(self._pending),
+                'max_queue_depth': self._max_depth,
+                'flushes': self._flushes,
+                'flushed_messages': self._flushed,
+                'failed_messages': self._failed,
+                'requeued_messages': self._requeued,
+                'last_flush_ms': self._last_flush_seconds * 1000,
+                'mean_flush_ms': self._flush_seconds * 1000 / self._flushes if self._flushes else 0.0,
+                'max_flush_ms': self._max_flush_seconds * 1000,
+            }
+
+
+# Process-wide buffer used by the chat consumers
+chat_buffer = ChatWriteBuffer(
+    batch_size=getattr(settings, 'CHAT_WRITE_BUFFER_SIZE', 100),
+    flush_interval=getattr(settings, 'CHAT_WRITE_BUFFER_FLUSH_MS', 50) / 1000,
+)
+
+# Save whatever is still pending when the worker shuts down
+atexit.register(chat_buffer.flush_sync)
@@ -1,74 +1,192 @@
+"""
+This file contains the WebSocket consumer of the chat.
+Every socket is authenticated once, during the handshake, and joins the channel-layer group of its principal
+(`chat.user.<id>` or `chat.doctor.<id>`). Each message is sent by that principal, validated, acknowledged to
+the sender once it is in the worker's write-behind buffer (see chat/buffer.py) and, after the buffer has saved
+it, fanned out through the channel layer to every open socket of the receiver, on any worker sharing the
+layer. Receivers are resolved through a short-TTL cache, so validation needs no query in the steady state.
+ORM calls run in a worker thread, off the event loop.
+"""
 
-from channels.generic.websocket import WebsocketConsumer
+# Import necessary modules and classes
 import json
-from django.core.exceptions import ObjectDoesNotExist
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from chat.authentication import authenticate_socket
+from chat.buffer import chat_buffer
 from chat.models import Chat
-from User.models import User
 from Doctor.models import Doctor
+from PharmaLink.caching import TTLCache
+from User.models import User
+
+# Cache of (kind, id) -> receiver, holding only the fields needed to address and describe a message
+receiver_cache = TTLCache(
+    maxsize=getattr(settings, 'CHAT_RECEIVER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'CHAT_RECEIVER_CACHE_TTL', 60),
+)
+
+
+def user_group(user_id):
+    """
+    Return the channel-layer group holding the open sockets of a patient.
+    """
+    return f'chat.user.{user_id}'
+
+
+def doctor_group(doctor_id):
+    """
+    Return the channel-layer group holding the open sockets of a doctor.
+    """
+    return f'chat.doctor.{doctor_id}'
+
+
+def principal_group(kind, principal_id):
+    """
+    Return the channel-layer group of a patient ('user') or doctor ('doctor').
+    """
+    return user_group(principal_id) if kind == 'user' else doctor_group(principal_id)
+
+
+def get_receiver(kind, receiver_id):
+    """
+    Return a message receiver, served from the receiver cache when possible.
+
+    Parameters:
+        - kind (str): 'user' for a patient or 'doctor' for a doctor.
+        - receiver_id (int): The ID of the receiver.
+
+    Returns:
+        - User, Doctor or None: The receiver, with only its ID, username and email loaded, or None if it does not exist.
+    """
+    key = (kind, receiver_id)
+    receiver = receiver_cache.get(key)
+    if receiver is None:
+        model = User if kind == 'user' else Doctor
+        receiver = model.objects.only('id', 'username', 'email').filter(id=receiver_id).first()
+        if receiver is not None:
+            receiver_cache.set(key, receiver)
+    return receiver
+
+
+# Asynchronous WebSocket consumer for chat messages
+class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Asynchronous WebSocket consumer for chat messages.
 
-class ChatConsumer(WebsocketConsumer):
-    def connect(self):
-        self.accept()
+    - Authenticates the socket during the handshake with a PatientCustomToken or DoctorCustomToken,
+      keeps the principal for the socket's lifetime and rejects the handshake if authentication fails.
+    - Joins the group of the principal on connect and leaves it on disconnect.
+    - Validates each received message as sent by the principal, enqueues it in the write-behind buffer and
+      acknowledges it; the buffer saves it and delivers it to the receiver's group.
+    - Flushes the buffer on disconnect, so no message of a closed socket waits for the next flush.
+    - Relays messages delivered to its group to the client as `chat.message` events, and messages that could
+      not be saved as `chat.error` events.
+    """
 
-    def disconnect(self, close_code):
-        pass
+    async def connect(self):
+        """
+        Authenticate the socket and join the group of its principal, or reject the handshake.
+        """
+        self.group_name = None
+        authenticated = await database_sync_to_async(authenticate_socket)(self.scope)
+        if authenticated is None:
+            await self.close()
+            return
 
-    def receive(self, text_data):
+        self.principal_kind, self.principal = authenticated
+        self.group_name = principal_group(self.principal_kind, self.principal.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        """
+        Leave the group of the socket's principal and flush the pending messages.
+        """
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await chat_buffer.flush()
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Validate a message, enqueue it for saving and delivery, and acknowledge it to the sender.
+        """
         try:
             data = json.loads(text_data)
-            message_text = data.get('message')
-            sender_user_id = data.get('sender_user_id')
-            sender_doctor_id = data.get('sender_doctor_id')
-            receiver_user_id = data.get('receiver_user_id')
-            receiver_doctor_id = data.get('receiver_doctor_id')
-
-            # Validate sender's role and ID
-            sender = None
-            if sender_user_id:
-                try:
-                    sender = User.objects.get(id=sender_user_id)
-                except ObjectDoesNotExist:
-                    raise ValueError("Sender user does not exist.")
-            elif sender_doctor_id:
-                try:
-                    sender = Doctor.objects.get(id=sender_doctor_id)
-                except ObjectDoesNotExist:
-                    raise ValueError("Sender doctor does not exist.")
-            else:
-                raise ValueError("Sender ID not provided.")
-
-            # Validate receiver's role and ID
-            receiver = None
-            if receiver_user_id:
-                try:
-                    receiver = User.objects.get(id=receiver_user_id)
-                except ObjectDoesNotExist:
-                    raise ValueError("Receiver user does not exist.")
-            elif receiver_doctor_id:
-                try:
-                    receiver = Doctor.objects.get(id=receiver_doctor_id)
-                except ObjectDoesNotExist:
-                    raise ValueError("Receiver doctor does not exist.")
-            else:
-                raise ValueError("Receiver ID not provided.")
-
-            if all([message_text, sender, receiver]):
-                # Create and save the chat message
-                chat_message = Chat.objects.create(
-                    sender_user=sender if isinstance(sender, User) else None,
-                    sender_doctor=sender if isinstance(sender, Doctor) else None,
-                    receiver_user=receiver if isinstance(receiver, User) else None,
-                    receiver_doctor=receiver if isinstance(receiver, Doctor) else None,
-                    message=message_text
-                )
-
-                # Send acknowledgment back to the sender
-                self.send(text_data=json.dumps({
-                    'message': f"Message saved: {chat_message}"
-                }))
-            else:
-                print("Missing required fields in the received JSON data.")
+            chat_message, receiver_group = await self.build_message(data)
         except json.JSONDecodeError as e:
-            print(f"Invalid JSON format: {e}")
+            await self.send(text_data=json.dumps({'error': f'Invalid JSON format: {e}'}))
+            return
         except ValueError as e:
-            print(f"Error: {e}")
+            await self.send(text_data=json.dumps({'error': str(e)}))
+            return
+
+        # The buffer saves the message and fans it out to every open socket of the receiver
+        await chat_buffer.add(chat_message, receiver_group, self.group_name)
+
+        # Send acknowledgment back to the sender
+        await self.send(text_data=json.dumps({'message': f"Message queued: {chat_message}"}))
+
+    async def chat_message(self, event):
+        """
+        Relay a message delivered to this socket's group to the client.
+        """
+        await self.send(text_data=json.dumps(event['chat']))
+
+    async def chat_error(self, event):
+        """
+        Tell the client that one of its acknowledged messages could not be saved.
+        """
+        await self.send(text_data=json.dumps({'error': event['error']}))
+
+    @database_sync_to_async
+    def build_message(self, data):
+        """
+        Validate a message from the socket's principal and build its unsaved Chat row.
+
+        - Sender IDs in the frame are optional; if present, they must match the authenticated principal.
+        - The receiver is resolved through the receiver cache, so no query hits the database in the steady state.
+
+        Parameters:
+            - data (dict): The decoded frame, with `message` and one of `receiver_user_id`/`receiver_doctor_id`.
+
+        Returns:
+            - tuple: The unsaved message and the receiver's group name.
+
+        Raises:
+            - ValueError: If a field is missing, the sender does not match or the receiver does not exist.
+        """
+        if not isinstance(data, dict) or not data.get('message'):
+            raise ValueError("Missing required fields in the received JSON data.")
+
+        # The sender is the authenticated principal
+        for kind, field in (('user', 'sender_user_id'), ('doctor', 'sender_doctor_id')):
+            sender_id = data.get(field)
+            if sender_id and (kind != self.principal_kind or str(sender_id) != str(self.principal.id)):
+                raise ValueError("Sender does not match the authenticated account.")
+
+        # Validate receiver's role and ID
+        if data.get('receiver_user_id'):
+            kind, receiver_id = 'user', data['receiver_user_id']
+        elif data.get('receiver_doctor_id'):
+            kind, receiver_id = 'doctor', data['receiver_doctor_id']
+        else:
+            raise ValueError("Receiver ID not provided.")
+        try:
+            receiver = get_receiver(kind, int(receiver_id))
+        except (TypeError, ValueError):
+            receiver = None
+        if receiver is None:
+            raise ValueError(f"Receiver {kind} does not exist.")
+
+        # Build the chat message; the write-behind buffer saves it
+        chat_message = Chat(
+            sender_user=self.principal if self.principal_kind == 'user' else None,
+            sender_doctor=self.principal if self.principal_kind == 'doctor' else None,
+            receiver_user=receiver if kind == 'user' else None,
+            receiver_doctor=receiver if kind == 'doctor' else None,
+            message=data['message']
+        )
+        return chat_message, principal_group(kind, receiver.id)
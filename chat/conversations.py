@@ -0,0 +1,80 @@
+"""
+This file keeps the denormalized Conversation rows in step with the saved chat messages.
+A participant is a (kind, id) pair, 'user' for a patient or 'doctor' for a doctor, matching the nullable
+user/doctor foreign key pairs of the Chat and Conversation models.
+"""
+
+# Import necessary modules and classes
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from chat.models import Conversation
+
+
+def participant(chat_message, role):
+    """
+    Return the sender or the receiver of a message.
+
+    Parameters:
+        - chat_message (Chat): The message.
+        - role (str): 'sender' or 'receiver'.
+
+    Returns:
+        - tuple: The (kind, id) of the participant.
+    """
+    user_id = getattr(chat_message, f'{role}_user_id')
+    if user_id:
+        return 'user', user_id
+    return 'doctor', getattr(chat_message, f'{role}_doctor_id')
+
+
+def participant_filter(prefix, participant):
+    """
+    Return the field lookup matching a participant, e.g. {'owner_doctor_id': 3}.
+
+    Parameters:
+        - prefix (str): The field prefix, e.g. 'owner', 'peer', 'sender' or 'receiver'.
+        - participant (tuple): The (kind, id) of the participant.
+    """
+    kind, participant_id = participant
+    return {f'{prefix}_{kind}_id': participant_id}
+
+
+def record_messages(messages):
+    """
+    Update the conversations of both participants of newly saved messages.
+
+    - Moves the last message of each conversation forward and adds the messages received by each owner
+      to its unread counter, with one UPDATE per (owner, peer) pair however many messages it got.
+    - Creates the conversation rows on the first message between two participants.
+
+    Parameters:
+        - messages (iterable): The saved Chat messages, with their IDs and timestamps.
+    """
+    # (owner, peer) -> [last message, number of messages received by the owner]
+    updates = {}
+    for chat_message in messages:
+        sender, receiver = participant(chat_message, 'sender'), participant(chat_message, 'receiver')
+        for owner, peer, received in ((sender, receiver, 0), (receiver, sender, 1)):
+            update = updates.setdefault((owner, peer), [chat_message, 0])
+            if (chat_message.timestamp, chat_message.id) > (update[0].timestamp, update[0].id):
+                update[0] = chat_message
+            update[1] += received
+
+    for (owner, peer), (last_message, unread) in updates.items():
+        fields = {**participant_filter('owner', owner), **participant_filter('peer', peer)}
+        changes = {
+            'last_message': last_message,
+            'last_message_at': last_message.timestamp,
+            'unread_count': F('unread_count') + unread,
+        }
+        if Conversation.objects.filter(**fields).update(**changes):
+            continue
+        try:
+            with transaction.atomic():
+                Conversation.objects.create(
+                    **fields, last_message=last_message, last_message_at=last_message.timestamp, unread_count=unread
+                )
+        except IntegrityError:
+            # Another worker created the row first
+            Conversation.objects.filter(**fields).update(**changes)
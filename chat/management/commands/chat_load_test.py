@@ -0,0 +1,165 @@
+"""
+Load test of the chat consumer with thousands of concurrent sockets on one worker.
+
+The command creates synthetic patients and doctors with access tokens, opens one token-authenticated socket
+per principal against the ASGI websocket router in this process, has every patient send messages to their
+doctor, and reports the connect time, the message throughput, the acknowledgment and delivery latencies and
+the queue depth and flush latency of the write-behind buffer.
+The synthetic principals, their tokens and the messages they exchanged are deleted afterwards.
+
+The consumers use the configured channel layer and database, so the numbers reflect the
+in-memory layer unless CHANNEL_LAYER_REDIS_URL is set.
+
+Usage:
+    python manage.py chat_load_test --sockets 2000 --messages 5
+"""
+
+# Import necessary modules and classes
+import asyncio
+import json
+import secrets
+import time
+from datetime import date
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.buffer import chat_buffer
+from chat.routing import ASGI_urlpatterns
+from Doctor.models import CustomToken as DoctorToken, Doctor
+from User.models import CustomToken as UserToken, User
+
+# Prefix for synthetic principals so they never collide with real accounts
+LOAD_TEST_PREFIX = 'chat-load-test-'
+
+
+class Command(BaseCommand):
+    help = 'Load test the chat consumer with many concurrent sockets on one worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=2000,
+                            help='Number of concurrent sockets, half patients and half doctors.')
+        parser.add_argument('--messages', type=int, default=5, help='Messages sent by every patient socket.')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait for any single frame.')
+
+    def handle(self, *args, **options):
+        pairs = options['sockets'] // 2
+        if pairs <= 0 or options['messages'] <= 0:
+            raise CommandError('--sockets must be at least 2 and --messages positive')
+
+        users, doctors = self.create_principals(pairs)
+        try:
+            asyncio.run(self.run(users, doctors, options['messages'], options['timeout']))
+        finally:
+            # Deleting the principals also deletes the messages they exchanged
+            User.objects.filter(username__startswith=LOAD_TEST_PREFIX).delete()
+            Doctor.objects.filter(username__startswith=LOAD_TEST_PREFIX).delete()
+
+    def create_principals(self, count):
+        """
+        Create `count` synthetic patients and doctors, each with an access token.
+
+        Returns:
+            - tuple: (ID, access token) tuples of the patients and of the doctors, pair by pair.
+        """
+        User.objects.bulk_create([
+            User(fname='Load', lname='Test', username=f'{LOAD_TEST_PREFIX}user-{index}', password='!',
+                 birthdate=date(1990, 1, 1), email=f'{LOAD_TEST_PREFIX}user-{index}@example.com',
+                 phone='0', gender='M')
+            for index in range(count)
+        ], batch_size=1000)
+        Doctor.objects.bulk_create([
+            Doctor(fname='Load', lname='Test', username=f'{LOAD_TEST_PREFIX}doctor-{index}', password='!',
+                   birthdate=date(1980, 1, 1), email=f'{LOAD_TEST_PREFIX}doctor-{index}@example.com',
+                   phone='0', gender='M', license_number='0', specialization='-', degree='-',
+                   graduation_date=date(2005, 1, 1), university='-')
+            for index in range(count)
+        ], batch_size=1000)
+        users = User.objects.filter(username__startswith=LOAD_TEST_PREFIX).order_by('id').values_list('id', 'email')
+        doctors = Doctor.objects.filter(username__startswith=LOAD_TEST_PREFIX).order_by('id').values_list('id', 'email')
+
+        # bulk_create skips CustomToken.save(), so the keys are generated here
+        user_tokens = [UserToken(key=secrets.token_hex(32), user_id=user_id, email=email, access_token=secrets.token_hex(32))
+                       for user_id, email in users]
+        doctor_tokens = [DoctorToken(key=secrets.token_hex(32), doctor_id=doctor_id, email=email, access_token=secrets.token_hex(32))
+                         for doctor_id, email in doctors]
+        UserToken.objects.bulk_create(user_tokens, batch_size=1000)
+        DoctorToken.objects.bulk_create(doctor_tokens, batch_size=1000)
+        return (
+            [(token.user_id, token.access_token) for token in user_tokens],
+            [(token.doctor_id, token.access_token) for token in doctor_tokens],
+        )
+
+    async def run(self, users, doctors, messages, timeout):
+        """
+        Connect every socket, exchange the messages and report the measurements.
+        """
+        application = URLRouter(ASGI_urlpatterns)
+        user_sockets = [
+            WebsocketCommunicator(application, '/websocket', headers=[(b'authorization', f'PatientCustomToken {token}'.encode())])
+            for _, token in users
+        ]
+        doctor_sockets = [
+            WebsocketCommunicator(application, '/websocket', headers=[(b'authorization', f'DoctorCustomToken {token}'.encode())])
+            for _, token in doctors
+        ]
+        sockets = user_sockets + doctor_sockets
+
+        start = time.perf_counter()
+        connected = await asyncio.gather(*(socket.connect(timeout=timeout) for socket in sockets))
+        connect_seconds = time.perf_counter() - start
+        if not all(accepted for accepted, _ in connected):
+            raise CommandError('Some sockets were rejected')
+        self.stdout.write(f'Connected {len(sockets)} sockets in {connect_seconds:.2f} s')
+
+        ack_latencies = []
+        delivery_latencies = []
+
+        async def patient(socket, doctor_id):
+            for _ in range(messages):
+                sent_at = time.perf_counter()
+                await socket.send_json_to({
+                    'message': json.dumps({'sent_at': sent_at}),
+                    'receiver_doctor_id': doctor_id,
+                })
+                ack = await socket.receive_json_from(timeout=timeout)
+                if 'error' in ack:
+                    raise CommandError(ack['error'])
+                ack_latencies.append((time.perf_counter() - sent_at) * 1000)
+
+        async def doctor(socket):
+            for _ in range(messages):
+                event = await socket.receive_json_from(timeout=timeout)
+                sent_at = json.loads(event['message'])['sent_at']
+                delivery_latencies.append((time.perf_counter() - sent_at) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(patient(socket, doctor_id) for socket, (doctor_id, _) in zip(user_sockets, doctors)),
+            *(doctor(socket) for socket in doctor_sockets),
+        )
+        elapsed = time.perf_counter() - start
+
+        await asyncio.gather(*(socket.disconnect() for socket in sockets))
+
+        total = len(user_sockets) * messages
+        self.stdout.write(f'Exchanged {total} messages in {elapsed:.2f} s ({total / elapsed:.0f} messages/s)')
+        self.stdout.write(f"{'':>10} {'p50 ms':>9} {'p99 ms':>9}")
+        for label, latencies in (('ack', ack_latencies), ('delivery', delivery_latencies)):
+            self.stdout.write(f'{label:>10} {self.percentile(latencies, 50):>9.1f} {self.percentile(latencies, 99):>9.1f}')
+
+        stats = chat_buffer.stats()
+        self.stdout.write(
+            f"Buffer: {stats['flushes']} flushes of {stats['flushed_messages']} messages "
+            f"({stats['failed_messages']} failed), max queue depth {stats['max_queue_depth']}, "
+            f"flush latency mean {stats['mean_flush_ms']:.1f} ms, max {stats['max_flush_ms']:.1f} ms"
+        )
+
+    @staticmethod
+    def percentile(values, percent):
+        """
+        Return the nearest-rank percentile of a list of latencies.
+        """
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))]
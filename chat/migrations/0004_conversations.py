@@ -0,0 +1,125 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def participant(row, role):
+    if row[f'{role}_user_id']:
+        return 'user', row[f'{role}_user_id']
+    return 'doctor', row[f'{role}_doctor_id']
+
+
+def populate_conversations(apps, schema_editor):
+    """
+    Create the conversation rows of both participants of every existing conversation, with its last message.
+    Existing messages are considered read.
+    """
+    Chat = apps.get_model('chat', 'Chat')
+    Conversation = apps.get_model('chat', 'Conversation')
+
+    last_messages = {}
+    rows = Chat.objects.order_by('timestamp', 'id').values(
+        'id', 'timestamp', 'sender_user_id', 'sender_doctor_id', 'receiver_user_id', 'receiver_doctor_id'
+    )
+    for row in rows.iterator():
+        sender, receiver = participant(row, 'sender'), participant(row, 'receiver')
+        if sender[1] is None or receiver[1] is None:
+            continue
+        last_messages[sender, receiver] = row
+        last_messages[receiver, sender] = row
+
+    Conversation.objects.bulk_create([
+        Conversation(
+            **{f'owner_{owner[0]}_id': owner[1], f'peer_{peer[0]}_id': peer[1]},
+            last_message_id=row['id'], last_message_at=row['timestamp'], unread_count=0,
+        )
+        for (owner, peer), row in last_messages.items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('Doctor', '0006_alter_customtoken_access_token'),
+        ('chat', '0003_alter_chat_sender_doctor_alter_chat_sender_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField()),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['sender_user', 'receiver_doctor', 'timestamp', 'id'], name='chat_user_to_doctor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['sender_doctor', 'receiver_user', 'timestamp', 'id'], name='chat_doctor_to_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['sender_user', 'receiver_user', 'timestamp', 'id'], name='chat_user_to_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chat',
+            index=models.Index(fields=['sender_doctor', 'receiver_doctor', 'timestamp', 'id'], name='chat_doctor_to_doctor_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chat'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='owner_doctor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='Doctor.doctor'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='owner_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='peer_doctor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='peer_conversations', to='Doctor.doctor'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='peer_user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='peer_conversations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['owner_user', 'last_message_at', 'id'], name='conversation_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['owner_doctor', 'last_message_at', 'id'], name='conversation_doctor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner_user__isnull', False), ('peer_user__isnull', False)), fields=('owner_user', 'peer_user'), name='conversation_user_user_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner_user__isnull', False), ('peer_doctor__isnull', False)), fields=('owner_user', 'peer_doctor'), name='conversation_user_doctor_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner_doctor__isnull', False), ('peer_user__isnull', False)), fields=('owner_doctor', 'peer_user'), name='conversation_doctor_user_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner_doctor__isnull', False), ('peer_doctor__isnull', False)), fields=('owner_doctor', 'peer_doctor'), name='conversation_doctor_doctor_uniq'),
+        ),
+        migrations.RunPython(populate_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:06
+
+from django.db import OperationalError, migrations
+
+# Participants of a chat_chat row as FTS5 tokens, e.g. 'u5 d3'
+SQLITE_PARTICIPANTS = (
+    "COALESCE('u' || {row}.sender_user_id, 'd' || {row}.sender_doctor_id) || ' ' || "
+    "COALESCE('u' || {row}.receiver_user_id, 'd' || {row}.receiver_doctor_id)"
+)
+
+SQLITE_FORWARD = [
+    'CREATE VIRTUAL TABLE chat_chat_fts USING fts5(message, participants, prefix=3)',
+    f'''CREATE TRIGGER chat_chat_fts_insert AFTER INSERT ON chat_chat BEGIN
+        INSERT INTO chat_chat_fts (rowid, message, participants)
+        VALUES (new.id, new.message, {SQLITE_PARTICIPANTS.format(row='new')});
+    END''',
+    '''CREATE TRIGGER chat_chat_fts_delete AFTER DELETE ON chat_chat BEGIN
+        DELETE FROM chat_chat_fts WHERE rowid = old.id;
+    END''',
+    f'''CREATE TRIGGER chat_chat_fts_update AFTER UPDATE ON chat_chat BEGIN
+        DELETE FROM chat_chat_fts WHERE rowid = old.id;
+        INSERT INTO chat_chat_fts (rowid, message, participants)
+        VALUES (new.id, new.message, {SQLITE_PARTICIPANTS.format(row='new')});
+    END''',
+    f'''INSERT INTO chat_chat_fts (rowid, message, participants)
+        SELECT id, message, {SQLITE_PARTICIPANTS.format(row='chat_chat')} FROM chat_chat''',
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS chat_chat_fts_insert',
+    'DROP TRIGGER IF EXISTS chat_chat_fts_delete',
+    'DROP TRIGGER IF EXISTS chat_chat_fts_update',
+    'DROP TABLE IF EXISTS chat_chat_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS chat_message_search_idx ON chat_chat USING GIN (to_tsvector('simple', message))",
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS chat_message_search_idx',
+]
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Create the full-text index of chat messages supported by the database, if any.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            for statement in SQLITE_FORWARD:
+                schema_editor.execute(statement)
+        except OperationalError:
+            # SQLite built without FTS5: the search falls back to icontains
+            for statement in SQLITE_BACKWARD:
+                schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        for statement in POSTGRESQL_FORWARD:
+            schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    """
+    Drop the full-text index of chat messages.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for statement in SQLITE_BACKWARD:
+            schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        for statement in POSTGRESQL_BACKWARD:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_conversations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from User.models import User
 from Doctor.models import Doctor
 
@@ -10,8 +11,57 @@ class Chat(models.Model):
     message = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serve the keyset-paginated history of a conversation: each direction of a conversation is one
+            # range scan on the index of its (sender, receiver) kinds, and the patient/doctor orderings
+            # have an index each
+            models.Index(fields=['sender_user', 'receiver_doctor', 'timestamp', 'id'], name='chat_user_to_doctor_idx'),
+            models.Index(fields=['sender_doctor', 'receiver_user', 'timestamp', 'id'], name='chat_doctor_to_user_idx'),
+            models.Index(fields=['sender_user', 'receiver_user', 'timestamp', 'id'], name='chat_user_to_user_idx'),
+            models.Index(fields=['sender_doctor', 'receiver_doctor', 'timestamp', 'id'], name='chat_doctor_to_doctor_idx'),
+        ]
+
     def __str__(self):
         sender = self.sender_user if self.sender_user else self.sender_doctor
         receiver = self.receiver_user if self.receiver_user else self.receiver_doctor
         receiver_name = receiver.username if receiver else '[No Receiver]'
         return f'{sender} -> {receiver_name}: {self.message}'
+
+
+class Conversation(models.Model):
+    """
+    A participant's view of a conversation, denormalized for the conversation list.
+
+    - Every conversation has one row per participant (its owner), pointing at the other participant (its peer),
+      so listing the conversations of a patient or doctor is a single index range scan.
+    - Stores the last message of the conversation and the number of messages the owner has not read yet,
+      both updated whenever messages are saved.
+    """
+
+    owner_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversations', null=True, blank=True)
+    owner_doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='conversations', null=True, blank=True)
+    peer_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='peer_conversations', null=True, blank=True)
+    peer_doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='peer_conversations', null=True, blank=True)
+    last_message = models.ForeignKey(Chat, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    last_message_at = models.DateTimeField()
+    unread_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Serve the keyset-paginated conversation list of a patient and of a doctor
+            models.Index(fields=['owner_user', 'last_message_at', 'id'], name='conversation_user_idx'),
+            models.Index(fields=['owner_doctor', 'last_message_at', 'id'], name='conversation_doctor_idx'),
+        ]
+        constraints = [
+            # One row per (owner, peer), whatever their kinds
+            models.UniqueConstraint(fields=['owner_user', 'peer_user'], condition=Q(owner_user__isnull=False, peer_user__isnull=False), name='conversation_user_user_uniq'),
+            models.UniqueConstraint(fields=['owner_user', 'peer_doctor'], condition=Q(owner_user__isnull=False, peer_doctor__isnull=False), name='conversation_user_doctor_uniq'),
+            models.UniqueConstraint(fields=['owner_doctor', 'peer_user'], condition=Q(owner_doctor__isnull=False, peer_user__isnull=False), name='conversation_doctor_user_uniq'),
+            models.UniqueConstraint(fields=['owner_doctor', 'peer_doctor'], condition=Q(owner_doctor__isnull=False, peer_doctor__isnull=False), name='conversation_doctor_doctor_uniq'),
+        ]
+
+    def __str__(self):
+        owner = self.owner_user if self.owner_user_id else self.owner_doctor
+        peer = self.peer_user if self.peer_user_id else self.peer_doctor
+        return f'{owner} <-> {peer} ({self.unread_count} unread)'
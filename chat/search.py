@@ -0,0 +1,154 @@
+"""
+This file contains the full-text search over chat messages.
+On SQLite, messages are indexed in the FTS5 table `chat_chat_fts`, kept in sync with `chat_chat` by triggers
+(see the chat 0005 migration), together with tokens naming the message's participants, so scoping a search
+to a patient or doctor is part of the same index lookup. On PostgreSQL, messages are indexed by a GIN index
+on their `simple` text search vector. On other backends, or if the FTS5 module is missing, the search falls
+back to a scoped `icontains` filter, newest first.
+MongoDB (djongo) is not supported by the indexed search: it takes the `icontains` fallback, which scans every
+message of the searcher, unranked.
+All terms must match as whole words, except the last one, which also matches as a prefix once it is
+MIN_PREFIX_LENGTH characters long (search as you type); the FTS5 table keeps a prefix index of that length.
+"""
+
+# Import necessary modules and classes
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from chat.conversations import participant_filter
+from chat.models import Chat
+
+# Name of the SQLite FTS5 table mirroring chat_chat
+FTS_TABLE = 'chat_chat_fts'
+
+# Shortest last term matched as a prefix; shorter prefixes would expand to too many terms
+MIN_PREFIX_LENGTH = 3
+
+# Whether the FTS5 table exists, per database alias, checked once per process
+_fts_available = {}
+
+
+def search_terms(query):
+    """
+    Split a search query into its terms, dropping anything that is not a word character.
+    """
+    return re.findall(r'\w+', query.lower())
+
+
+def is_prefix(terms, index):
+    """
+    Return whether the term at `index` matches as a prefix.
+    """
+    return index == len(terms) - 1 and len(terms[index]) >= MIN_PREFIX_LENGTH
+
+
+def participant_token(participant):
+    """
+    Return the FTS5 token naming a participant, e.g. 'u5' for patient 5 or 'd3' for doctor 3.
+    """
+    kind, participant_id = participant
+    return f"{'u' if kind == 'user' else 'd'}{participant_id}"
+
+
+def fts_available():
+    """
+    Return whether the SQLite FTS5 table of chat messages exists on the default database.
+    """
+    if connection.alias not in _fts_available:
+        _fts_available[connection.alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[connection.alias]
+
+
+def search_sqlite(terms, principal, peer, offset, limit):
+    """
+    Return the (id, score) of the matching messages from the FTS5 table, best first.
+    """
+    message_query = ' '.join(f'"{term}"' + ('*' if is_prefix(terms, index) else '') for index, term in enumerate(terms))
+    participants = ' AND '.join(f'"{participant_token(p)}"' for p in (principal, peer) if p is not None)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY rank, rowid DESC LIMIT %s OFFSET %s',
+            [f'message : ({message_query}) AND participants : ({participants})', limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def scope_sql(principal, peer):
+    """
+    Return the SQL condition, and its parameters, restricting chat_chat to the messages of a principal,
+    or to the messages exchanged between a principal and a peer.
+    """
+    def sent(sender, receiver):
+        (sender_kind, sender_id), (receiver_kind, receiver_id) = sender, receiver
+        return f'(sender_{sender_kind}_id = %s AND receiver_{receiver_kind}_id = %s)', [sender_id, receiver_id]
+
+    if peer is not None:
+        (sql1, params1), (sql2, params2) = sent(principal, peer), sent(peer, principal)
+        return f'({sql1} OR {sql2})', params1 + params2
+    kind, principal_id = principal
+    return f'(sender_{kind}_id = %s OR receiver_{kind}_id = %s)', [principal_id, principal_id]
+
+
+def search_postgresql(terms, principal, peer, offset, limit):
+    """
+    Return the (id, score) of the matching messages using the GIN text search index, best first.
+    """
+    scope, params = scope_sql(principal, peer)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id, ts_rank(to_tsvector('simple', message), query) AS score "
+            "FROM chat_chat, to_tsquery('simple', %s) AS query "
+            f"WHERE to_tsvector('simple', message) @@ query AND {scope} "
+            'ORDER BY score DESC, id DESC LIMIT %s OFFSET %s',
+            [' & '.join(term + (':*' if is_prefix(terms, index) else '') for index, term in enumerate(terms)), *params, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+def search_fallback(terms, principal, peer, offset, limit):
+    """
+    Return the (id, score) of the matching messages with a scoped `icontains` scan, newest first.
+    """
+    if peer is not None:
+        scope = Q(**participant_filter('sender', principal), **participant_filter('receiver', peer)) | Q(
+            **participant_filter('sender', peer), **participant_filter('receiver', principal)
+        )
+    else:
+        scope = Q(**participant_filter('sender', principal)) | Q(**participant_filter('receiver', principal))
+    messages = Chat.objects.filter(scope)
+    for term in terms:
+        messages = messages.filter(message__icontains=term)
+    ids = messages.order_by('-timestamp', '-id').values_list('id', flat=True)[offset:offset + limit]
+    return [(message_id, None) for message_id in ids]
+
+
+def search_messages(query, principal, peer=None, offset=0, limit=20):
+    """
+    Search the messages sent or received by a principal.
+
+    Parameters:
+        - query (str): The search text; every word must match, the last one possibly as a prefix.
+        - principal (tuple): The (kind, id) of the patient or doctor searching.
+        - peer (tuple): The (kind, id) of the other participant to restrict the search to, or None.
+        - offset (int): The number of hits to skip.
+        - limit (int): The maximum number of hits to return.
+
+    Returns:
+        - list: (Chat, score) tuples, best first; the score is None for the `icontains` fallback.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    if connection.vendor == 'sqlite' and fts_available():
+        hits = search_sqlite(terms, principal, peer, offset, limit)
+    elif connection.vendor == 'postgresql':
+        hits = search_postgresql(terms, principal, peer, offset, limit)
+    else:
+        hits = search_fallback(terms, principal, peer, offset, limit)
+
+    messages = Chat.objects.in_bulk([message_id for message_id, _ in hits])
+    return [(messages[message_id], score) for message_id, score in hits if message_id in messages]
@@ -1,3 +1,272 @@
-from django.test import TestCase
+"""
+Tests of the chat: socket authentication at connect, the write-behind buffer of messages, the
+keyset-paginated message history and the full-text search over messages.
+"""
 
-# Create your tests here.
+from datetime import date, timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from Doctor.models import CustomToken as DoctorToken, Doctor
+from User.models import CustomToken as UserToken, User
+
+from .authentication import authenticate_socket
+from .buffer import ChatWriteBuffer
+from .models import Chat, Conversation
+from .routing import ASGI_urlpatterns
+from .search import search_messages
+from .views import ChatHistoryView, ChatSearchView
+
+
+def create_user(username):
+    return User.objects.create(
+        fname='Test', lname='Patient', username=username, password='x', birthdate=date(1990, 1, 1),
+        email=f'{username}@example.com', phone='1', gender='M',
+    )
+
+
+def create_doctor(username):
+    return Doctor.objects.create(
+        fname='Test', lname='Doctor', username=username, password='x', birthdate=date(1980, 1, 1),
+        email=f'{username}@example.com', phone='1', gender='M', license_number='1', specialization='GP',
+        degree='MD', graduation_date=date(2005, 1, 1), university='Cairo',
+    )
+
+
+class SocketAuthenticationTests(TransactionTestCase):
+    """
+    Sockets must authenticate with a patient or doctor token during the handshake, from the Authorization
+    header or the `token` query parameter, and be rejected without valid credentials.
+    """
+
+    def setUp(self):
+        self.user = create_user('patient')
+        self.doctor = create_doctor('doctor')
+        UserToken.objects.create(user=self.user, email=self.user.email, access_token='patient-token')
+        DoctorToken.objects.create(doctor=self.doctor, email=self.doctor.email, access_token='doctor-token')
+
+    def scope(self, authorization=None, query_string=b''):
+        headers = [(b'authorization', authorization.encode())] if authorization else []
+        return {'type': 'websocket', 'headers': headers, 'query_string': query_string}
+
+    def connects(self, path='/websocket', headers=()):
+        async def connect():
+            communicator = WebsocketCommunicator(URLRouter(ASGI_urlpatterns), path, headers=list(headers))
+            connected, _ = await communicator.connect()
+            if connected:
+                await communicator.disconnect()
+            return connected
+        return async_to_sync(connect)()
+
+    def test_authenticate_socket(self):
+        self.assertEqual(authenticate_socket(self.scope('PatientCustomToken patient-token')), ('user', self.user))
+        self.assertEqual(
+            authenticate_socket(self.scope(query_string=b'token=DoctorCustomToken%20doctor-token')), ('doctor', self.doctor)
+        )
+        # The header wins over the query string
+        self.assertEqual(
+            authenticate_socket(self.scope('PatientCustomToken patient-token', b'token=DoctorCustomToken%20doctor-token')),
+            ('user', self.user),
+        )
+        for scope in [
+            self.scope(),
+            self.scope('PatientCustomToken'),
+            self.scope('PatientCustomToken doctor-token'),
+            self.scope('Bearer patient-token'),
+            self.scope('PatientCustomToken patient-token extra'),
+        ]:
+            self.assertIsNone(authenticate_socket(scope))
+
+    def test_connect_accepts_valid_credentials(self):
+        self.assertTrue(self.connects(headers=[(b'authorization', b'PatientCustomToken patient-token')]))
+        self.assertTrue(self.connects('/websocket?token=DoctorCustomToken%20doctor-token'))
+
+    def test_connect_rejects_invalid_credentials(self):
+        self.assertFalse(self.connects())
+        self.assertFalse(self.connects(headers=[(b'authorization', b'DoctorCustomToken patient-token')]))
+        self.assertFalse(self.connects('/websocket?token=PatientCustomToken%20revoked'))
+
+
+class ChatWriteBufferTests(TransactionTestCase):
+    """
+    The buffer must save every message once, report rows that cannot be saved, and keep rows it could
+    not write because of an unexpected error. Transactions are committed, so foreign keys are checked.
+    """
+
+    def setUp(self):
+        self.user = create_user('patient')
+        self.doctor = create_doctor('doctor')
+        self.buffer = ChatWriteBuffer(batch_size=100, flush_interval=60)
+
+    def enqueue(self, text, receiver=None):
+        chat_message = Chat(sender_user=self.user, receiver_doctor=receiver or self.doctor, message=text)
+        async_to_sync(self.buffer.add)(chat_message, 'receiver', 'sender')
+        return chat_message
+
+    def test_flush_saves_batch_and_updates_conversations(self):
+        for index in range(3):
+            self.enqueue(f'message {index}')
+
+        saved, failed = self.buffer.flush_sync()
+        self.assertEqual((len(saved), failed), (3, []))
+        self.assertTrue(all(chat_message.pk for chat_message, _, _ in saved))
+        self.assertEqual(sorted(Chat.objects.values_list('message', flat=True)), ['message 0', 'message 1', 'message 2'])
+
+        received = Conversation.objects.get(owner_doctor=self.doctor, peer_user=self.user)
+        sent = Conversation.objects.get(owner_user=self.user, peer_doctor=self.doctor)
+        self.assertEqual((received.unread_count, sent.unread_count), (3, 0))
+        self.assertEqual(received.last_message_id, Chat.objects.order_by('-id').first().id)
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_saves_row_by_row_without_bulk_returning(self):
+        self.enqueue('first')
+        self.enqueue('second')
+
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch.object(Chat.objects, 'bulk_create') as bulk_create:
+            saved, failed = self.buffer.flush_sync()
+        bulk_create.assert_not_called()
+        self.assertEqual((len(saved), failed), (2, []))
+        self.assertEqual(
+            sorted(chat_message.pk for chat_message, _, _ in saved), sorted(Chat.objects.values_list('id', flat=True))
+        )
+        self.assertEqual(Conversation.objects.get(owner_doctor=self.doctor).unread_count, 2)
+
+    def test_reports_rows_with_a_deleted_receiver(self):
+        ghost = create_doctor('ghost')
+        self.enqueue('kept')
+        lost = self.enqueue('lost', receiver=ghost)
+        Doctor.objects.filter(id=ghost.id).delete()
+
+        saved, failed = self.buffer.flush_sync()
+        self.assertEqual([entry[0].message for entry in saved], ['kept'])
+        self.assertEqual([entry[0] for entry in failed], [lost])
+        self.assertEqual(list(Chat.objects.values_list('message', flat=True)), ['kept'])
+        self.assertEqual(self.buffer.stats()['failed_messages'], 1)
+
+    def test_requeues_rows_after_an_unexpected_error(self):
+        for index in range(3):
+            self.enqueue(f'message {index}')
+
+        with mock.patch.object(Chat.objects, 'bulk_create', side_effect=OperationalError('database is down')), \
+                mock.patch.object(Chat, 'save', side_effect=OperationalError('database is down')), \
+                self.assertLogs('chat.buffer', 'ERROR'):
+            saved, failed = self.buffer.flush_sync()
+        self.assertEqual((saved, failed), ([], []))
+        self.assertEqual(len(self.buffer), 3)
+        self.assertEqual(self.buffer.stats()['requeued_messages'], 3)
+        self.assertFalse(Chat.objects.exists())
+
+        self.enqueue('message 3')
+        saved, failed = self.buffer.flush_sync()
+        self.assertEqual([entry[0].message for entry in saved], [f'message {index}' for index in range(4)])
+        self.assertEqual(Chat.objects.count(), 4)
+
+
+class ChatHistoryTests(TestCase):
+    """
+    Walking the pages of a conversation must return both directions, once each, newest first.
+    """
+
+    def setUp(self):
+        self.user = create_user('patient')
+        self.doctor = create_doctor('doctor')
+        other_user = create_user('other')
+
+        now = timezone.now()
+        # Several messages share a timestamp, so the id breaks ties across page boundaries
+        for index, offset in enumerate((0, 0, 1, 1, 1, 2, 3, 3, 4)):
+            if index % 2:
+                chat_message = Chat.objects.create(sender_doctor=self.doctor, receiver_user=self.user, message=f'{index}')
+            else:
+                chat_message = Chat.objects.create(sender_user=self.user, receiver_doctor=self.doctor, message=f'{index}')
+            Chat.objects.filter(id=chat_message.id).update(timestamp=now - timedelta(minutes=offset))
+        Chat.objects.create(sender_user=other_user, receiver_doctor=self.doctor, message='elsewhere')
+        self.factory = APIRequestFactory()
+
+    def get_page(self, **params):
+        request = self.factory.get('/Chat/messages/', params)
+        force_authenticate(request, user=self.user)
+        return ChatHistoryView.as_view()(request)
+
+    def test_pages_cover_the_conversation_in_order(self):
+        expected = list(
+            Chat.objects.exclude(message='elsewhere').order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+
+        seen = []
+        params = {'doctor_id': self.doctor.id, 'page_size': 2}
+        while True:
+            response = self.get_page(**params)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(chat_message['id'] for chat_message in response.data['results'])
+            if response.data['next'] is None:
+                break
+            params['cursor'] = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        self.assertEqual(seen, expected)
+
+    def test_requires_the_other_participant(self):
+        response = self.get_page()
+        self.assertEqual(response.status_code, 400)
+
+
+class ChatSearchTests(TestCase):
+    """
+    Search must find messages by every term, the last one also as a prefix, scoped to the searcher.
+    """
+
+    def setUp(self):
+        self.user = create_user('patient')
+        self.doctor = create_doctor('doctor')
+        self.other_doctor = create_doctor('other')
+        self.bleeding = Chat.objects.create(
+            sender_user=self.user, receiver_doctor=self.doctor, message='Is the warfarin dose causing bleeding?'
+        )
+        self.tonight = Chat.objects.create(
+            sender_doctor=self.doctor, receiver_user=self.user, message='Take the warfarin dose tonight'
+        )
+        self.elsewhere = Chat.objects.create(
+            sender_doctor=self.other_doctor, receiver_user=self.user, message='Stop the warfarin for now'
+        )
+        self.not_mine = Chat.objects.create(
+            sender_user=create_user('stranger'), receiver_doctor=self.doctor, message='My warfarin dose is low'
+        )
+
+    def found(self, query, principal=None, peer=None):
+        return {chat_message for chat_message, _ in search_messages(query, principal or ('user', self.user.id), peer)}
+
+    def test_matches_every_term(self):
+        self.assertEqual(self.found('warfarin dose'), {self.bleeding, self.tonight})
+        self.assertEqual(self.found('dose bleeding'), {self.bleeding})
+        self.assertEqual(self.found('aspirin'), set())
+
+    def test_last_term_matches_as_prefix(self):
+        self.assertEqual(self.found('dose warf'), {self.bleeding, self.tonight})
+        self.assertEqual(self.found('Warfarin TONIG'), {self.tonight})
+
+    def test_scoped_to_principal_and_peer(self):
+        self.assertEqual(self.found('warfarin'), {self.bleeding, self.tonight, self.elsewhere})
+        self.assertEqual(self.found('warfarin', peer=('doctor', self.other_doctor.id)), {self.elsewhere})
+        self.assertEqual(
+            self.found('warfarin', principal=('doctor', self.doctor.id)), {self.bleeding, self.tonight, self.not_mine}
+        )
+
+    def test_view_pages_by_offset(self):
+        factory = APIRequestFactory()
+        request = factory.get('/Chat/messages/search/', {'q': 'warfarin', 'limit': 2})
+        force_authenticate(request, user=self.user)
+        response = ChatSearchView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((len(response.data['results']), response.data['next_offset']), (2, 2))
+
+        request = factory.get('/Chat/messages/search/', {'q': '  '})
+        force_authenticate(request, user=self.user)
+        self.assertEqual(ChatSearchView.as_view()(request).status_code, 400)
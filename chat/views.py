@@ -1,3 +1,268 @@
-from django.shortcuts import render
+"""
+This file contains API views for reading the chat: the message history of a conversation, the list of
+conversations of the requesting patient or doctor, with their last message and unread counters, and the
+full-text search over their messages, and for marking a conversation as read.
+Both listings use keyset pagination, newest first, so every page is served by index range scans whatever
+the length of the history; search results are ranked and paginated by offset.
+"""
 
-# Create your views here.
+# Import necessary modules and classes
+import heapq
+
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from chat.buffer import message_payload
+from chat.conversations import participant_filter
+from chat.models import Chat, Conversation
+from chat.search import search_messages
+from Doctor.authentication import DoctorCustomTokenAuthentication
+from Doctor.models import Doctor
+from Prescription.pagination import TimestampCursorPagination
+from User.authentication import CustomTokenAuthentication
+
+
+def request_principal(request):
+    """
+    Return the authenticated patient or doctor of a request as a (kind, id) participant.
+    """
+    return ('doctor' if isinstance(request.user, Doctor) else 'user'), request.user.id
+
+
+def requested_peer(params):
+    """
+    Return the other participant of a conversation, given as `user_id` or `doctor_id`.
+
+    Parameters:
+        - params (dict): The query parameters or the request data.
+
+    Returns:
+        - tuple or None: The (kind, id) of the peer, or None if it is missing or invalid.
+    """
+    for kind in ('user', 'doctor'):
+        value = params.get(f'{kind}_id')
+        if value not in (None, ''):
+            try:
+                return kind, int(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+# Keyset pagination over (timestamp, id) of the two directions of a conversation
+class ChatCursorPagination(TimestampCursorPagination):
+    """
+    Keyset pagination of chat messages on (timestamp, id), newest first.
+
+    - Pages through the messages sent by each participant separately, each with one range scan on the
+      (sender, receiver, timestamp, id) index of its direction, and merges them.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    timestamp_field = 'timestamp'
+
+    def paginate_directions(self, querysets, request, view=None):
+        """
+        Return the page of messages following the request's cursor, merged from several querysets.
+
+        Raises:
+            ValueError: If the cursor or the page size is invalid.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        pages = [list(self.after_cursor(queryset, request)[:page_size + 1]) for queryset in querysets]
+        merged = heapq.merge(*pages, key=lambda chat_message: (chat_message.timestamp, chat_message.id), reverse=True)
+        return self.finish_page([chat_message for _, chat_message in zip(range(page_size + 1), merged)], page_size)
+
+
+# Keyset pagination over (last_message_at, id) of conversations
+class ConversationCursorPagination(TimestampCursorPagination):
+    """
+    Keyset pagination of conversations on (last_message_at, id), most recently active first.
+    """
+
+    timestamp_field = 'last_message_at'
+
+
+# View class for retrieving the message history of a conversation
+class ChatHistoryView(APIView):
+    """
+    API view to retrieve the messages exchanged between the requesting patient or doctor and another participant.
+
+    - Requires authentication using custom tokens for both patients and doctors.
+    - Requires the requesting user to be authenticated.
+    - Handles GET requests with `user_id` or `doctor_id`, the other participant, and optional `cursor` and
+      `page_size` query parameters.
+    - Returns one page at a time, newest first.
+    """
+
+    authentication_classes = [CustomTokenAuthentication, DoctorCustomTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Handles GET requests to retrieve a page of the history of a conversation.
+
+        Parameters:
+            - request (HttpRequest): The request object.
+
+        Returns:
+            - Response: The page as {'next': <url or None>, 'results': [...]}, or an error message.
+        """
+        peer = requested_peer(request.query_params)
+        if peer is None:
+            return Response({'error': 'Provide user_id or doctor_id of the other participant'}, status=status.HTTP_400_BAD_REQUEST)
+        principal = request_principal(request)
+
+        # Each direction of the conversation is served by its own index
+        sent = Chat.objects.filter(**participant_filter('sender', principal), **participant_filter('receiver', peer))
+        received = Chat.objects.filter(**participant_filter('sender', peer), **participant_filter('receiver', principal))
+
+        paginator = ChatCursorPagination()
+        try:
+            page = paginator.paginate_directions([sent, received], request, view=self)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return paginator.get_paginated_response([message_payload(chat_message) for chat_message in page])
+
+
+# View class for searching the messages of the requesting patient or doctor
+class ChatSearchView(APIView):
+    """
+    API view to search the messages sent or received by the requesting patient or doctor.
+
+    - Requires authentication using custom tokens for both patients and doctors.
+    - Requires the requesting user to be authenticated.
+    - Handles GET requests with `q`, and optional `user_id` or `doctor_id` (to search a single conversation),
+      `offset` and `limit` query parameters.
+    - Resolves hits from the full-text index of the database (see chat/search.py), best match first.
+
+    Attributes:
+        default_limit (int): Number of hits returned when no limit is given.
+        max_limit (int): Upper bound on the number of hits per page.
+    """
+
+    authentication_classes = [CustomTokenAuthentication, DoctorCustomTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        """
+        Handles GET requests to return a ranked page of matching messages.
+
+        Parameters:
+            - request (HttpRequest): The request object.
+
+        Returns:
+            - Response: The matching messages with their score, and the next offset, or an error message.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        peer = None
+        if request.query_params.get('user_id') or request.query_params.get('doctor_id'):
+            peer = requested_peer(request.query_params)
+            if peer is None:
+                return Response({'error': 'user_id and doctor_id must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response({'error': 'Offset and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Fetch one extra hit to know whether a next page exists
+        hits = search_messages(query, request_principal(request), peer, offset=offset, limit=limit + 1)
+        next_offset = offset + limit if len(hits) > limit else None
+
+        results = [{**message_payload(chat_message), 'score': score} for chat_message, score in hits[:limit]]
+        return Response({'results': results, 'next_offset': next_offset}, status=status.HTTP_200_OK)
+
+
+# View class for listing the conversations of the requesting patient or doctor
+class ConversationListView(APIView):
+    """
+    API view to list the conversations of the requesting patient or doctor.
+
+    - Requires authentication using custom tokens for both patients and doctors.
+    - Requires the requesting user to be authenticated.
+    - Handles GET requests with optional `cursor` and `page_size` query parameters.
+    - Returns one page at a time, most recently active first, with the other participant, the last message
+      and the number of unread messages of each conversation, read from the denormalized Conversation table.
+    """
+
+    authentication_classes = [CustomTokenAuthentication, DoctorCustomTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Handles GET requests to list a page of conversations.
+
+        Parameters:
+            - request (HttpRequest): The request object.
+
+        Returns:
+            - Response: The page as {'next': <url or None>, 'results': [...]}, or an error message.
+        """
+        conversations = Conversation.objects.filter(
+            **participant_filter('owner', request_principal(request))
+        ).select_related('peer_user', 'peer_doctor', 'last_message')
+
+        paginator = ConversationCursorPagination()
+        try:
+            page = paginator.paginate_queryset(conversations, request, view=self)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        for conversation in page:
+            peer = conversation.peer_user if conversation.peer_user_id else conversation.peer_doctor
+            results.append({
+                'peer_user_id': conversation.peer_user_id,
+                'peer_doctor_id': conversation.peer_doctor_id,
+                'peer_username': peer.username,
+                'last_message': message_payload(conversation.last_message) if conversation.last_message else None,
+                'last_message_at': conversation.last_message_at.isoformat(),
+                'unread_count': conversation.unread_count,
+            })
+        return paginator.get_paginated_response(results)
+
+
+# View class for marking a conversation as read
+class ConversationReadView(APIView):
+    """
+    API view to mark the conversation of the requesting patient or doctor with another participant as read.
+
+    - Requires authentication using custom tokens for both patients and doctors.
+    - Requires the requesting user to be authenticated.
+    - Handles POST requests with `user_id` or `doctor_id`, the other participant, and resets its unread counter.
+    """
+
+    authentication_classes = [CustomTokenAuthentication, DoctorCustomTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Handles POST requests to mark a conversation as read.
+
+        Parameters:
+            - request (HttpRequest): The request object.
+
+        Returns:
+            - Response: A success message, or an error message.
+        """
+        peer = requested_peer(request.data)
+        if peer is None:
+            return Response({'error': 'Provide user_id or doctor_id of the other participant'}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = Conversation.objects.filter(
+            **participant_filter('owner', request_principal(request)), **participant_filter('peer', peer)
+        ).update(unread_count=0)
+        if not updated:
+            return Response({'error': 'Conversation not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'message': 'Conversation marked as read'}, status=status.HTTP_200_OK)